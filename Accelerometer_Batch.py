@@ -0,0 +1,326 @@
+## Accelerometer Batch
+## Reprocess archived Accelerometer_DAQ.py captures in parallel and tabulate the results
+##
+## Usage:
+##   python Accelerometer_Batch.py [DIRECTORY] [--pattern "acc_data_[0-9]*.xlsx"] [--output batch_results.csv]
+##                                 [--inverse-gains 31.5 31.75 31 | --profile UNIT_42] [--noise-margin 0.5] [--workers 8]
+##
+## Captures hold calibrated data, so each one is first converted back to raw readings with the
+## constants it was recorded with (--old-offsets, --old-inverse-gains) and then processed again
+## with the new ones. Zeroing removes any constant offset, so zeroed captures convert back exactly
+## up to that offset. A noise margin that was already applied cannot be undone. Only single-device
+## captures can be reprocessed; combined multi-device tables ("acc_data_multi_*") are rejected.
+## The sample rate is taken from --sample-rate, then from the rate stored in the capture
+## (Accelerometer_Output.py), and only then estimated from the time column.
+##
+## Parsed xlsx/csv/parquet captures are cached in a "<file>.cache.v2.npy" sidecar, together with
+## their stored sample rate. Later runs read only the sidecar (memory-mapped) unless the capture
+## is newer than its cache. The "<file>_spectrum.<ext>" tables written next to captures are
+## never picked up as captures.
+
+import os
+import sys
+import csv
+import glob
+import time
+import argparse
+import numpy as np
+from multiprocessing import Pool
+from Accelerometer_Processing import processCapture
+from Accelerometer_Spectrum import analyze, AXIS_NAMES, BANDS, WELCH_SEGMENT
+from Accelerometer_Calibration import loadProfile
+from Accelerometer_Output import COLUMN_HEADERS, SAMPLE_RATE_PROPERTY
+
+##############################################################
+### BATCH SETTINGS ###
+##############################################################
+
+## Defaults (Must Match the Calibration Settings in Accelerometer_DAQ.py)
+DEFAULT_OFFSETS = (-1.25, -0.5, 0.125)
+DEFAULT_INVERSE_GAINS = (31.5, 31.75, 31)
+DEFAULT_NOISE_MARGIN = 1.0
+DEFAULT_ZERO_SETTING = 1
+
+DEFAULT_DIRECTORY = "Acceleration_Data"
+DEFAULT_PATTERN = "acc_data_[0-9]*.xlsx" 		# Single-Device Captures Only (Not acc_data_multi_* or acc_data_report_*)
+DEFAULT_OUTPUT = "batch_results.csv"
+CACHE_SUFFIX = ".cache.v2.npy" 					# Sidecar: Row 0 Holds the Stored Sample Rate (NaN if None), Then the Parsed (N, 4) Time/X/Y/Z Array
+CACHE_MARKER = ".cache." 						# In the Name of Every Sidecar, Including Older Versions
+
+##############################################################
+### CAPTURE LOADING ###
+##############################################################
+
+# Single-Device Captures Have Exactly the Time/X/Y/Z Columns; Combined Tables Have One Set per Device
+def _checkHeaders(headers):
+	headers = tuple(str(header).strip() for header in headers if header is not None)
+	if (headers != COLUMN_HEADERS):
+		raise ValueError("not a single-device capture (columns: " + ", ".join(headers) + ")")
+
+# Every "Data", "Data (2)", ... Sheet Written by writeXlsx, as One (N, 4) Array
+def loadXlsx(path):
+	try:
+		import openpyxl
+	except ImportError:
+		raise ImportError("Reading xlsx captures requires openpyxl (pip install openpyxl)")
+	workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+	try:
+		sheets = [sheet for sheet in workbook.worksheets if sheet.title.startswith("Data")]
+		if (sheets):
+			_checkHeaders(next(sheets[0].iter_rows(max_row=1, values_only=True), ()))
+		rows = [row for sheet in sheets for row in sheet.iter_rows(min_row=2, max_col=4, values_only=True)
+				if row[0] is not None]
+	finally:
+		workbook.close()
+	return np.array(rows, dtype=np.float64).reshape(-1, 4)
+
+def loadCsv(path):
+	with open(path) as capture_file:
+		_checkHeaders(capture_file.readline().strip().split(","))
+	return np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+
+def loadNpy(path):
+	return np.load(path, mmap_mode="r")
+
+def loadNpz(path):
+	with np.load(path) as arrays:
+		if (not {"time", "x", "y", "z"} <= set(arrays.files)):
+			raise ValueError("not a single-device capture (arrays: " + ", ".join(arrays.files) + ")")
+		return np.column_stack((arrays["time"], arrays["x"], arrays["y"], arrays["z"]))
+
+def loadParquet(path):
+	try:
+		import pyarrow.parquet
+	except ImportError:
+		raise ImportError("Reading parquet captures requires pyarrow (pip install pyarrow)")
+	table = pyarrow.parquet.read_table(path)
+	_checkHeaders(table.column_names)
+	return np.column_stack([table.column(i).to_numpy() for i in range(4)])
+
+LOADERS = {
+	".xlsx": loadXlsx,
+	".csv": loadCsv,
+	".npy": loadNpy,
+	".npz": loadNpz,
+	".parquet": loadParquet,
+}
+CACHED = (".xlsx", ".csv", ".parquet") 			# Text and Workbook Formats Worth Caching
+
+# Sample Rate Written With the Capture by Accelerometer_Output.py (xlsx, npz, parquet), or None
+def storedSampleRate(path):
+	extension = os.path.splitext(path)[1].lower()
+	if (extension == ".xlsx"):
+		import openpyxl
+		workbook = openpyxl.load_workbook(path, read_only=True)
+		try:
+			for prop in workbook.custom_doc_props.props:
+				if (prop.name == SAMPLE_RATE_PROPERTY):
+					return float(prop.value)
+		finally:
+			workbook.close()
+	elif (extension == ".npz"):
+		with np.load(path) as arrays:
+			if ("sample_rate" in arrays.files):
+				return float(arrays["sample_rate"])
+	elif (extension == ".parquet"):
+		import pyarrow.parquet
+		metadata = pyarrow.parquet.read_schema(path).metadata or {}
+		if (b"sample_rate" in metadata):
+			return float(metadata[b"sample_rate"])
+	return None
+
+# Returns ((N, 4) Array, Stored Sample Rate or None, True if it Came From the Sidecar Cache)
+def loadCapture(path, use_cache=True):
+	extension = os.path.splitext(path)[1].lower()
+	if (extension not in LOADERS):
+		raise ValueError("Unknown capture format \"" + extension + "\"")
+	cache_path = path + CACHE_SUFFIX
+	if (extension in CACHED and use_cache and os.path.exists(cache_path)
+		and os.path.getmtime(cache_path) >= os.path.getmtime(path)):
+		cache = np.load(cache_path, mmap_mode="r")
+		sample_rate = float(cache[0, 0])
+		return cache[1:], (None if np.isnan(sample_rate) else sample_rate), True
+	data = LOADERS[extension](path)
+	sample_rate = storedSampleRate(path)
+	if (extension in CACHED and use_cache):
+		header = np.array([[np.nan if sample_rate is None else sample_rate, 0.0, 0.0, 0.0]])
+		partial_path = cache_path + ".{}.tmp".format(os.getpid())
+		with open(partial_path, "wb") as cache_file: # np.save Would Append .npy to the Temporary Name
+			np.save(cache_file, np.concatenate((header, data)))
+		os.replace(partial_path, cache_path) # Readers Never See a Half-Written Cache
+	return data, sample_rate, False
+
+# Captures Among the Matched Files: Not Cache Sidecars, Nor the Spectrum Tables Written Next to Captures
+def isCapture(path):
+	name = os.path.basename(path)
+	return CACHE_MARKER not in name and not os.path.splitext(name)[0].endswith("_spectrum")
+
+##############################################################
+### REPROCESSING ###
+##############################################################
+
+# Reprocess One Capture and Return its Row of the Results Table
+def processFile(args):
+	path, settings = args
+	row = {"file": os.path.basename(path)}
+	try:
+		start = time.perf_counter()
+		data, stored_rate, cached = loadCapture(path, settings["cache"])
+		row["load_s"] = round(time.perf_counter() - start, 4)
+		row["cached"] = cached
+		time_arr = np.asarray(data[:, 0])
+		sample_num = len(time_arr)
+		if (sample_num < 2):
+			raise ValueError("capture has fewer than 2 samples")
+		sample_rate = settings["sample_rate"] or stored_rate or round((sample_num - 1)/(time_arr[-1] - time_arr[0]))
+
+		# Back to Raw Readings, Then Forward With the New Constants
+		old_coefs = 9.81/np.asarray(settings["old_inverse_gains"], dtype=np.float64)
+		raw = np.asarray(data[:, 1:4]).T/old_coefs[:, None] - np.asarray(settings["old_offsets"])[:, None]
+		x, y, z, time_arr = processCapture(raw[0], raw[1], raw[2], settings["offsets"],
+										   tuple(9.81/np.asarray(settings["inverse_gains"], dtype=np.float64)),
+										   sample_num/sample_rate,
+										   zero_enabled=settings["zero_enabled"], zero_setting=settings["zero_setting"],
+										   noise_enabled=settings["noise_enabled"], noise_margin=settings["noise_margin"],
+										   cross_axis=settings["cross_axis"])
+		values = np.array((x, y, z))
+
+		# Summary Metrics
+		row["samples"] = sample_num
+		row["sample_rate_hz"] = sample_rate
+		row["duration_s"] = round(sample_num/sample_rate, 4)
+		means = values.mean(axis=1)
+		for axis, name in enumerate(AXIS_NAMES):
+			row[name + "_mean"] = means[axis]
+			row[name + "_std"] = values[axis].std()
+			row[name + "_peak"] = np.abs(values[axis]).max()
+		row["magnitude"] = float(np.sqrt(np.sum(means**2)))
+
+		# Spectral Metrics
+		spectrum = analyze(values, sample_rate, settings["segment"])
+		for axis, name in enumerate(AXIS_NAMES):
+			row[name + "_dominant_hz"] = spectrum["peak_freqs"][axis][0]
+			row[name + "_rms"] = spectrum["rms"][axis]
+			for band, (low, high) in enumerate(spectrum["bands"]):
+				row["{}_rms_{}_{}hz".format(name, low, high)] = spectrum["band_rms"][axis][band]
+		row["error"] = ""
+	except Exception as e: # One bad file should not stop the batch
+		row["error"] = "{}: {}".format(type(e).__name__, e)
+	return row
+
+##############################################################
+### RESULTS TABLE ###
+##############################################################
+
+def resultColumns():
+	columns = ["file", "samples", "sample_rate_hz", "duration_s"]
+	for name in AXIS_NAMES:
+		columns += [name + "_mean", name + "_std", name + "_peak"]
+	columns += ["magnitude"]
+	for name in AXIS_NAMES:
+		columns += [name + "_dominant_hz", name + "_rms"]
+		columns += ["{}_rms_{}_{}hz".format(name, low, high) for low, high in BANDS]
+	return columns + ["load_s", "cached", "error"]
+
+def writeResults(path, rows):
+	columns = resultColumns()
+	if (path.lower().endswith(".xlsx")):
+		import xlsxwriter
+		workbook = xlsxwriter.Workbook(path)
+		results_sheet = workbook.add_worksheet("Results")
+		results_sheet.write_row(0, 0, columns, workbook.add_format({'bold': True}))
+		for i, row in enumerate(rows):
+			results_sheet.write_row(i+1, 0, [_cell(row.get(column, "")) for column in columns])
+		workbook.close()
+		return
+	with open(path, "w", newline="") as results_file:
+		writer = csv.writer(results_file)
+		writer.writerow(columns)
+		for row in rows:
+			writer.writerow([_cell(row.get(column, "")) for column in columns])
+
+def _cell(value):
+	if (isinstance(value, (float, np.floating))):
+		return "" if np.isnan(value) else float(value)
+	if (isinstance(value, np.integer)):
+		return int(value)
+	return value
+
+##############################################################
+### BATCH RUN ###
+##############################################################
+
+def runBatch(files, settings, workers=None):
+	rows = []
+	start = time.perf_counter()
+	with Pool(workers) as pool:
+		for row in pool.imap_unordered(processFile, [(path, settings) for path in files]):
+			rows.append(row)
+			elapsed = time.perf_counter() - start
+			print("\r{}/{} Files ({:.1f} Files/s)".format(len(rows), len(files), len(rows)/elapsed), end="", flush=True)
+	print()
+	return sorted(rows, key=lambda row: row["file"]), time.perf_counter() - start
+
+##############################################################
+### MAIN FUNCTION ###
+##############################################################
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Reprocess archived accelerometer captures in parallel")
+	parser.add_argument("directory", nargs="?", default=DEFAULT_DIRECTORY, help="folder holding the captures")
+	parser.add_argument("--pattern", default=DEFAULT_PATTERN, help="capture filename pattern (xlsx, csv, npy, npz or parquet)")
+	parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results table (.csv or .xlsx)")
+	parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+	parser.add_argument("--sample-rate", type=float, default=None, help="sample rate in Hz (default: stored in the capture, else from the time column)")
+	parser.add_argument("--old-offsets", type=float, nargs=3, default=DEFAULT_OFFSETS, metavar=("X", "Y", "Z"),
+						help="offsets the captures were recorded with")
+	parser.add_argument("--old-inverse-gains", type=float, nargs=3, default=DEFAULT_INVERSE_GAINS, metavar=("X", "Y", "Z"),
+						help="inverse gains the captures were recorded with")
+	parser.add_argument("--offsets", type=float, nargs=3, default=None, metavar=("X", "Y", "Z"),
+						help="new offsets (default: the old ones)")
+	parser.add_argument("--inverse-gains", type=float, nargs=3, default=None, metavar=("X", "Y", "Z"),
+						help="new inverse gains (default: the old ones)")
+	parser.add_argument("--profile", default=None, help="calibration profile for the new constants (overrides --offsets/--inverse-gains)")
+	parser.add_argument("--no-zero", action="store_true", help="disable zeroing")
+	parser.add_argument("--zero-setting", type=int, choices=[0, 1], default=DEFAULT_ZERO_SETTING,
+						help="0 = zero on the first sample, 1 = zero on the average")
+	parser.add_argument("--noise-margin", type=float, default=DEFAULT_NOISE_MARGIN, help="noise margin (m/s^2), 0 to disable")
+	parser.add_argument("--segment", type=int, default=WELCH_SEGMENT, help="Welch segment length (samples)")
+	parser.add_argument("--no-cache", action="store_true", help="parse every capture and skip the sidecar cache")
+	args = parser.parse_args()
+
+	files = sorted(glob.glob(os.path.join(args.directory, args.pattern)))
+	files = [path for path in files if isCapture(path)]
+	if (len(files) == 0):
+		print("No captures matching " + os.path.join(args.directory, args.pattern))
+		sys.exit(1)
+	settings = {
+		"sample_rate": args.sample_rate,
+		"old_offsets": args.old_offsets,
+		"old_inverse_gains": args.old_inverse_gains,
+		"offsets": args.offsets or args.old_offsets,
+		"inverse_gains": args.inverse_gains or args.old_inverse_gains,
+		"zero_enabled": not args.no_zero,
+		"zero_setting": args.zero_setting,
+		"noise_enabled": args.noise_margin > 0,
+		"noise_margin": args.noise_margin,
+		"cross_axis": None,
+		"segment": args.segment,
+		"cache": not args.no_cache,
+	}
+
+	if (args.profile):
+		profile = loadProfile(args.profile)
+		settings.update(offsets=profile["offsets"], inverse_gains=profile["inverse_gains"],
+						cross_axis=profile.get("cross_axis"))
+
+	print("Processing {} Capture(s) From {}...".format(len(files), args.directory))
+	rows, elapsed = runBatch(files, settings, args.workers)
+	writeResults(args.output, rows)
+
+	failed = [row for row in rows if row["error"]]
+	print("Done!")
+	print("Time Elapsed:", round(elapsed, 4), "Seconds ({:.1f} Files/s)".format(len(rows)/elapsed))
+	print("Loaded From Cache: {} of {}".format(sum(1 for row in rows if row.get("cached")), len(rows)))
+	for row in failed:
+		print("FAILED: " + row["file"] + " (" + row["error"] + ")")
+	print("Results Saved to " + args.output)
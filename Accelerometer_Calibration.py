@@ -0,0 +1,210 @@
+## Accelerometer Calibration
+## Offset, inverse gain and cross-axis calibration from still orientations, saved as named profiles
+##
+## Usage:
+##   python Accelerometer_Calibration.py capture --name UNIT_42 [--cross-axis] [--seconds 1.0] [--port COM5]
+##   python Accelerometer_Calibration.py verify
+##
+## The unit is held still in each orientation of ORIENTATIONS (the six faces by default, the
+## same +1g/-1g positions as the manual procedure in Accelerometer_DAQ.py). The mean raw
+## reading of each window is fitted to
+##
+##   raw = W @ gravity + bias        (gravity in g, W in ADC counts per g)
+##
+## by linear least squares: diagonal W gives one offset and inverse gain per axis, full W
+## adds a 3x3 cross-axis correction. The result is written to PROFILE_DIR/<name>.json, which
+## Accelerometer_DAQ.py loads at startup when CALIBRATION_PROFILE is set.
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import numpy as np
+
+##############################################################
+### CALIBRATION SETTINGS ###
+##############################################################
+
+PROFILE_DIR = "Calibration_Profiles" 			# Folder Holding <name>.json Profiles
+SAMPLE_RATE_HZ = 3200 							# Teensy Sample Rate (Must Match Accelerometer_DAQ.py)
+WINDOW_SEC = 1.0 								# Still Window Averaged per Orientation
+STILL_MAX_STD = 3.0 							# Largest Per-Axis Standard Deviation (ADC Counts) Accepted as Still
+RESIDUAL_MAX_G = 0.05 							# Profiles Fitting Worse Than This (g RMS) Are Not Saved
+TEENSY_SER_FILENAME = "COM_PORT_2.txt"			# Filename for Manual Connection
+TEENSY_BAUD_RATES = (921600, 460800, 230400, 115200, 57600, 9600) # Rates Tried, Fastest First
+
+## Orientations: Gravity Direction in the Sensor Frame (g) for Each Still Window
+ORIENTATIONS = (
+	("+Z up", (0, 0, 1)),
+	("Z down (upside down)", (0, 0, -1)),
+	("+X up", (1, 0, 0)),
+	("X down", (-1, 0, 0)),
+	("+Y up", (0, 1, 0)),
+	("Y down", (0, -1, 0)),
+)
+
+##############################################################
+### LEAST-SQUARES SOLVER ###
+##############################################################
+
+# Fit raw = W @ gravity + bias to (n, 3) Window Means; Returns a Profile Dictionary
+#
+# Without cross-axis terms each axis only sees its own gravity component, so the three
+# 2-parameter fits are solved together as one batch of 2x2 normal equations. With cross-axis
+# terms one (n, 4) design matrix covers all three axes in a single lstsq call.
+def solveCalibration(means, orientations, cross_axis=False):
+	means = np.asarray(means, dtype=np.float64)
+	orientations = np.asarray(orientations, dtype=np.float64)
+	count = len(means)
+	if (cross_axis):
+		if (count < 4 or np.linalg.matrix_rank(orientations) < 3):
+			raise ValueError("Cross-axis calibration needs at least 4 windows spanning all three axes")
+		solution = np.linalg.lstsq(np.column_stack((orientations, np.ones(count))), means, rcond=None)[0]
+		gains, bias = solution[:3].T, solution[3]
+	else:
+		design = np.stack((orientations.T, np.ones((3, count))), axis=-1)			# (3, n, 2)
+		normal = design.transpose(0, 2, 1) @ design
+		if (np.any(np.abs(np.linalg.det(normal)) < 1e-12)):
+			raise ValueError("Every axis needs windows with at least two different gravity components")
+		solution = np.linalg.solve(normal, design.transpose(0, 2, 1) @ means.T[:, :, None])[:, :, 0]
+		gains, bias = np.diag(solution[:, 0]), solution[:, 1]
+	inverse_gains = np.diag(gains)
+	residuals = (means - (orientations @ gains.T + bias)) / inverse_gains
+	return {
+		"offsets": (-bias).tolist(),
+		"inverse_gains": inverse_gains.tolist(),
+		# calibrate() Applies This After the Per-Axis Gains: W^-1 @ diag(W)
+		"cross_axis": (np.linalg.inv(gains) @ np.diag(inverse_gains)).tolist() if cross_axis else None,
+		"residual_rms_g": float(np.sqrt(np.mean(residuals**2))),
+		"windows": count,
+	}
+
+##############################################################
+### PROFILES ###
+##############################################################
+
+def profilePath(name, directory=PROFILE_DIR):
+	return os.path.join(directory, name + ".json")
+
+def saveProfile(name, profile, directory=PROFILE_DIR):
+	os.makedirs(directory, exist_ok=True)
+	profile = dict(profile, name=name, created=datetime.datetime.now().isoformat())
+	with open(profilePath(name, directory), "w") as profile_file:
+		json.dump(profile, profile_file, indent=1)
+	return profilePath(name, directory)
+
+def loadProfile(name, directory=PROFILE_DIR):
+	try:
+		with open(profilePath(name, directory)) as profile_file:
+			return json.load(profile_file)
+	except FileNotFoundError:
+		raise FileNotFoundError("Calibration profile \"" + name + "\" not found (" + profilePath(name, directory) + ")")
+
+def printProfile(profile):
+	for axis, name in enumerate(("X", "Y", "Z")):
+		print("\t{}: Offset {:.4f}, Inverse Gain {:.4f}".format(name, profile["offsets"][axis], profile["inverse_gains"][axis]))
+	if (profile.get("cross_axis") is not None):
+		print("\tCross-Axis Correction:")
+		for row in profile["cross_axis"]:
+			print("\t\t" + "  ".join("{:+.5f}".format(value) for value in row))
+	print("\tResidual: {:.5f} g RMS over {} Windows".format(profile["residual_rms_g"], profile["windows"]))
+
+##############################################################
+### CAPTURE ###
+##############################################################
+
+# Mean and Standard Deviation (ADC Counts) of a Still Window
+def captureWindow(ser, seconds=WINDOW_SEC, sample_rate=SAMPLE_RATE_HZ):
+	from Accelerometer_Stream import StreamDecoder
+	decoder = StreamDecoder()
+	ser.reset_input_buffer()
+	sample_num = int(seconds*sample_rate)
+	blocks = []
+	received = 0
+	while (received < sample_num):
+		block = decoder.read(ser)
+		blocks.append(block[:, :3])
+		received += len(block)
+	samples = np.concatenate(blocks)[:sample_num]
+	return samples.mean(axis=0), samples.std(axis=0)
+
+def captureProfile(ser, cross_axis=False, seconds=WINDOW_SEC, orientations=ORIENTATIONS):
+	means = []
+	for label, gravity in orientations:
+		while True:
+			input("Place the unit with " + label + " and hold it still, then press Enter...")
+			mean, std = captureWindow(ser, seconds)
+			if (np.all(std <= STILL_MAX_STD)):
+				break
+			print("Unit moved (Std Dev {} Counts). Repeating this orientation.".format(np.round(std, 2).tolist()))
+		print("\tMean: {}".format(np.round(mean, 3).tolist()))
+		means.append(mean)
+	start = time.perf_counter()
+	profile = solveCalibration(means, [gravity for label, gravity in orientations], cross_axis)
+	print("Solved in {:.3f} ms".format((time.perf_counter() - start)*1000))
+	profile["means"] = np.asarray(means).tolist()
+	profile["orientations"] = [list(gravity) for label, gravity in orientations]
+	return profile
+
+##############################################################
+### SELF CHECK ###
+##############################################################
+
+# Recover a Known Calibration From Noisy Synthetic Windows and Time the Solver
+def verify(repeats=1000, seed=0):
+	from Accelerometer_Processing import calibrate
+	rng = np.random.default_rng(seed)
+	gains = np.array([[31.5, 0.4, -0.2], [0.3, 31.75, 0.5], [-0.6, 0.2, 31.0]])
+	bias = np.array([1.25, 0.5, -0.125])
+	orientations = np.array([gravity for label, gravity in ORIENTATIONS], dtype=np.float64)
+	means = orientations @ gains.T + bias + rng.normal(0.0, 0.01, (len(orientations), 3))
+	ok = True
+	for cross_axis in (False, True):
+		start = time.perf_counter()
+		for repeat in range(repeats):
+			profile = solveCalibration(means, orientations, cross_axis)
+		elapsed = (time.perf_counter() - start)/repeats
+		coefs = 9.81/np.asarray(profile["inverse_gains"])
+		measured = calibrate(means.T, profile["offsets"], coefs, cross_axis=profile["cross_axis"]).T
+		error = np.abs(measured - 9.81*orientations).max()
+		print("{}: Solve {:.3f} ms, Offsets {}, Inverse Gains {}, Max Error {:.4f} m/s^2".format(
+			  "Cross-Axis" if cross_axis else "Diagonal", elapsed*1000, np.round(profile["offsets"], 3).tolist(),
+			  np.round(profile["inverse_gains"], 3).tolist(), error))
+		ok = ok and (error < 0.01 if cross_axis else error < 0.3)
+	print("Calibration Recovered:", ok)
+	return ok
+
+##############################################################
+### MAIN FUNCTION ###
+##############################################################
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Fit accelerometer offsets and inverse gains from still orientations")
+	parser.add_argument("mode", choices=["capture", "verify"])
+	parser.add_argument("--name", help="profile name (saved as " + PROFILE_DIR + "/<name>.json)")
+	parser.add_argument("--cross-axis", action="store_true", help="also fit a 3x3 cross-axis correction")
+	parser.add_argument("--seconds", type=float, default=WINDOW_SEC, help="still window per orientation")
+	parser.add_argument("--port", default="", help="serial port (default: " + TEENSY_SER_FILENAME + ", then automatic)")
+	args = parser.parse_args()
+
+	if (args.mode == "verify"):
+		sys.exit(0 if verify() else 1)
+	if (not args.name):
+		parser.error("capture needs --name")
+
+	from Teensy_Connection import connectTeensy, accelerometerHandshake
+	teensy, port_name = connectTeensy(TEENSY_SER_FILENAME, TEENSY_BAUD_RATES, accelerometerHandshake, manual_port=args.port)
+	if (teensy is None):
+		print("Teensy not connected.\nPlease reconnect USB and restart program.\n")
+		sys.exit(1)
+	print("----------------------------------------------------")
+	profile = captureProfile(teensy, args.cross_axis, args.seconds)
+	teensy.close()
+	profile["port"] = port_name
+	print("Calibration:")
+	printProfile(profile)
+	if (profile["residual_rms_g"] > RESIDUAL_MAX_G or min(profile["inverse_gains"]) <= 0):
+		print("WARNING: Fit is inconsistent with the orientations (check the unit was placed as prompted). Profile not saved.")
+		sys.exit(1)
+	print("Profile Saved to " + saveProfile(args.name, profile))
@@ -0,0 +1,375 @@
+## Accelerometer Compact
+## Compressed raw capture format (.acz) holding ADC readings plus the constants to calibrate them
+##
+## File layout:
+##   bytes 0-7      magic (b"ACCPACK1")
+##   bytes 8-11     metadata length (uint32, little endian)
+##   bytes 12-...   metadata (JSON: sample rate, calibration constants, ...)
+##   then blocks, each a BLOCK_HEADER (sample count, payload length, scale, delta width, codec)
+##   followed by its compressed payload
+##
+## Readings are integers at a fixed resolution (the accelerometer Teensy reports quarter
+## counts), so each block stores them as integers (reading*scale): the first row as int32,
+## then the row-to-row differences of each axis in the narrowest of int8/int16/int32 that
+## holds them, byte-planes split so zlib (or lz4) sees the near-constant high bytes together.
+## A scale is used only if every reading decodes back to exactly the same double
+## (round(reading*scale)/scale == reading); blocks whose readings do not round-trip at any
+## SCALES resolution, or whose row-to-row differences do not fit in int32, are stored as
+## float64, so decoding always returns the readings that were written. A block is only complete once fully written, so a file cut short by a
+## crash reopens at its last complete block.
+##
+## CompactCapture reads the block index without decompressing anything; samples are decoded
+## and calibrated only for the range asked for. Run this file directly to benchmark encode and
+## decode speed and the file size against xlsx, csv and the .acc store.
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import argparse
+import numpy as np
+from Accelerometer_Processing import calibrate
+
+##############################################################
+### COMPACT SETTINGS ###
+##############################################################
+
+COMPACT_MAGIC = b"ACCPACK1"
+BLOCK_SAMPLES = 16384 							# Samples per Compressed Block (Granularity of Partial Reads)
+COMPACT_CODEC = "zlib" 							# "zlib" (Standard Library) or "lz4" (Faster, Needs lz4)
+ZLIB_LEVEL = 6 									# 1 = Fastest, 9 = Smallest
+SCALES = (1, 2, 4, 8, 10, 16, 100) 				# Reading Resolutions Tried (1/scale Counts), Coarsest First
+BLOCK_HEADER = struct.Struct("<IIHBB") 			# Samples, Payload Bytes, Scale (0 = float64), Delta Width, Codec
+CODECS = ("zlib", "lz4")
+AXES = 3
+
+##############################################################
+### BLOCK CODEC ###
+##############################################################
+
+def _compress(payload, codec):
+	if (codec == "lz4"):
+		try:
+			import lz4.block
+		except ImportError:
+			raise ImportError("The lz4 codec requires lz4 (pip install lz4)")
+		return lz4.block.compress(payload)
+	return zlib.compress(payload, ZLIB_LEVEL)
+
+def _decompress(payload, codec):
+	if (codec == "lz4"):
+		try:
+			import lz4.block
+		except ImportError:
+			raise ImportError("Reading lz4 blocks requires lz4 (pip install lz4)")
+		return lz4.block.decompress(payload)
+	return zlib.decompress(payload)
+
+# Coarsest Scale at Which Every Reading Round-Trips Exactly Through a Whole Number (0 if None Does)
+#
+# Checking that reading*scale is whole is not enough: a reading one ulp away from n/10 can
+# still scale to exactly n, and would then decode to n/10 instead of itself.
+def _findScale(samples):
+	if (samples.size == 0):
+		return 0
+	for scale in SCALES:
+		counts = np.round(samples*scale)
+		if (np.abs(counts).max() < 2**31 and np.array_equal(counts/scale, samples)):
+			return scale
+	return 0
+
+# (N, 3) Raw Readings --> Header + Payload Bytes
+def encodeBlock(samples, codec=COMPACT_CODEC):
+	samples = np.asarray(samples, dtype=np.float64).reshape(-1, AXES)
+	scale = _findScale(samples)
+	if (scale != 0):
+		counts = np.round(samples*scale).astype(np.int64).T			# (3, N)
+		deltas = np.diff(counts, axis=1)
+		span = max(-deltas.min(initial=0), deltas.max(initial=0))
+		if (span >= 2**31):
+			scale = 0							# Differences Would Wrap in int32
+	if (scale == 0):
+		width = 8
+		planes = np.ascontiguousarray(samples.T).tobytes()
+	else:
+		width = 1 if span < 2**7 else 2 if span < 2**15 else 4
+		planes = (counts[:, 0].astype("<i4").tobytes()
+				  + deltas.astype("<i{}".format(width), order="C").view(np.uint8).reshape(AXES, -1, width)
+						  .transpose(0, 2, 1).tobytes())						# Low Bytes of Every Delta, Then High Bytes
+	payload = _compress(planes, codec)
+	return BLOCK_HEADER.pack(len(samples), len(payload), scale, width, CODECS.index(codec)) + payload
+
+def decodeBlock(count, scale, width, codec, payload):
+	planes = _decompress(payload, CODECS[codec])
+	if (scale == 0):
+		return np.frombuffer(planes, dtype="<f8").reshape(AXES, count).T
+	first = np.frombuffer(planes, dtype="<i4", count=AXES).astype(np.int64)
+	deltas = (np.frombuffer(planes, dtype=np.uint8, offset=4*AXES).reshape(AXES, width, count - 1)
+			  .transpose(0, 2, 1).copy().view("<i{}".format(width))[:, :, 0])
+	counts = np.empty((AXES, count), dtype=np.int64)
+	counts[:, 0] = first
+	np.cumsum(deltas, axis=1, dtype=np.int64, out=counts[:, 1:])
+	counts[:, 1:] += first[:, None]
+	return (counts / scale).T
+
+##############################################################
+### WRITER ###
+##############################################################
+
+# Appends Raw Samples Block by Block (Same append/flush/close Interface as CaptureStore)
+class CompactWriter:
+	def __init__(self, path, compact_file, metadata, codec):
+		self.path = path
+		self.metadata = metadata
+		self.codec = codec
+		self.count = 0							# Samples Appended (Written or Pending)
+		self.bytes_written = compact_file.tell()
+		self._file = compact_file
+		self._pending = []
+		self._pending_count = 0
+
+	@classmethod
+	def create(cls, path, sample_rate, metadata=None, codec=COMPACT_CODEC):
+		metadata = dict(metadata or {})
+		metadata["sample_rate"] = sample_rate
+		encoded = json.dumps(metadata).encode()
+		compact_file = open(path, "wb")
+		compact_file.write(COMPACT_MAGIC)
+		compact_file.write(struct.pack("<I", len(encoded)))
+		compact_file.write(encoded)
+		return cls(path, compact_file, metadata, codec)
+
+	def __len__(self):
+		return self.count
+
+	def append(self, block):
+		block = np.asarray(block, dtype=np.float64)[:, :AXES]
+		self._pending.append(block)
+		self._pending_count += len(block)
+		self.count += len(block)
+		if (self._pending_count >= BLOCK_SAMPLES):
+			self._writePending(full_only=True)
+
+	def _writePending(self, full_only=False):
+		if (self._pending_count == 0):
+			return
+		samples = np.concatenate(self._pending)
+		stop = len(samples) - len(samples) % BLOCK_SAMPLES if full_only else len(samples)
+		for start in range(0, stop, BLOCK_SAMPLES):
+			encoded = encodeBlock(samples[start:min(start+BLOCK_SAMPLES, stop)], self.codec)
+			self._file.write(encoded)
+			self.bytes_written += len(encoded)
+		self._pending = [samples[stop:]]
+		self._pending_count = len(samples) - stop
+
+	# Write Pending Samples as a (Possibly Short) Block and Push Them to Disk
+	def flush(self):
+		self._writePending()
+		self._file.flush()
+
+	def close(self):
+		self.flush()
+		self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+##############################################################
+### READER ###
+##############################################################
+
+class CompactCapture:
+	def __init__(self, path, metadata, index):
+		self.path = path
+		self.metadata = metadata
+		self._index = index						# (Payload Offset, Samples, Payload Bytes, Scale, Width, Codec) per Block
+		self._starts = np.concatenate(([0], np.cumsum([entry[1] for entry in index], dtype=np.int64)))
+		self._cached = (None, None)				# Last Decoded (Block Number, Samples)
+
+	# Read the Metadata and Block Headers Only (Stops at a Block Cut Short by a Crash)
+	@classmethod
+	def open(cls, path):
+		size = os.path.getsize(path)
+		with open(path, "rb") as compact_file:
+			if (compact_file.read(8) != COMPACT_MAGIC):
+				raise ValueError(path + " is not a compact capture")
+			length = struct.unpack("<I", compact_file.read(4))[0]
+			metadata = json.loads(compact_file.read(length).decode())
+			index = []
+			position = 12 + length
+			while (position + BLOCK_HEADER.size <= size):
+				count, payload_bytes, scale, width, codec = BLOCK_HEADER.unpack(compact_file.read(BLOCK_HEADER.size))
+				position += BLOCK_HEADER.size
+				if (position + payload_bytes > size):
+					break
+				index.append((position, count, payload_bytes, scale, width, codec))
+				position += payload_bytes
+				compact_file.seek(position)
+		return cls(path, metadata, index)
+
+	def __len__(self):
+		return int(self._starts[-1])
+
+	@property
+	def sample_rate(self):
+		return self.metadata["sample_rate"]
+
+	@property
+	def compressed_bytes(self):
+		return os.path.getsize(self.path)
+
+	def _block(self, number):
+		if (self._cached[0] != number):
+			offset, count, payload_bytes, scale, width, codec = self._index[number]
+			with open(self.path, "rb") as compact_file:
+				compact_file.seek(offset)
+				self._cached = (number, decodeBlock(count, scale, width, codec, compact_file.read(payload_bytes)))
+		return self._cached[1]
+
+	# Raw (N, 3) Readings for Samples start..stop, Decoding Only the Blocks That Overlap Them
+	def read(self, start=0, stop=None):
+		stop = len(self) if stop is None else min(stop, len(self))
+		if (start >= stop):
+			return np.empty((0, AXES))
+		first = int(np.searchsorted(self._starts, start, side="right")) - 1
+		last = int(np.searchsorted(self._starts, stop, side="left"))
+		blocks = [self._block(number) for number in range(first, last)]
+		samples = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+		return samples[start - self._starts[first]:stop - self._starts[first]]
+
+	@property
+	def samples(self):
+		return self.read()
+
+	# Time Axis (Seconds) for Samples start..stop
+	def time(self, start=0, stop=None):
+		stop = len(self) if stop is None else min(stop, len(self))
+		return np.arange(start, stop) / self.sample_rate
+
+	# Calibrated (3, N) Data for Samples start..stop, Using the Calibration Constants in the Metadata
+	def calibrated(self, start=0, stop=None):
+		return calibrate(self.read(start, stop).T, self.metadata["offsets"], self.metadata["coefs"],
+						 cross_axis=self.metadata.get("cross_axis"))
+
+# Re-Encode a .acc Capture Store as a .acz File Next to It; Returns the New Path
+def convertStore(path, codec=COMPACT_CODEC):
+	from Accelerometer_Store import CaptureStore
+	compact_path = os.path.splitext(path)[0] + ".acz"
+	with CaptureStore.open(path) as store:
+		metadata = {key: value for key, value in store.metadata.items() if key != "sample_rate"}
+		with CompactWriter.create(compact_path, store.sample_rate, metadata, codec) as writer:
+			for start in range(0, len(store), BLOCK_SAMPLES):
+				writer.append(store.samples[start:start+BLOCK_SAMPLES])
+	return compact_path
+
+##############################################################
+### BENCHMARK ###
+##############################################################
+
+# Raw Readings Like the Accelerometer Teensy's: Quarter Counts, 120 Hz Vibration, Gaussian Noise
+def _syntheticReadings(sample_num, sample_rate=3200, seed=0):
+	rng = np.random.default_rng(seed)
+	t = np.arange(sample_num) / sample_rate
+	readings = (np.array([1.25, 0.5, 31.0])[:, None] + np.array([4.0, 2.0, 6.0])[:, None]*np.sin(2*np.pi*120.0*t)
+				+ rng.normal(0.0, 0.75, (3, sample_num)))
+	return (np.round(readings*4)/4).T
+
+# Blocks That Must Not Lose Anything: Readings Next to a Scale's Grid, Differences Beyond int32,
+# Empty and Single-Row Blocks, NaN and Infinity
+def verifyBlocks(seed=0):
+	rng = np.random.default_rng(seed)
+	near_grid = np.round(rng.uniform(-100, 100, (100000, AXES))*10)/10
+	near_grid = np.nextafter(near_grid, np.where(rng.random(near_grid.shape) < 0.5, -np.inf, np.inf))
+	cases = {
+		"Quarter Counts": _syntheticReadings(BLOCK_SAMPLES),
+		"One Ulp From Tenths": near_grid,
+		"Tenths": np.round(near_grid*10)/10,
+		"Differences Beyond int32": np.array([[-2**31 + 1, 0, 0], [2**31 - 1, 0, 0]], dtype=np.float64),
+		"Empty": np.empty((0, AXES)),
+		"Single Row": np.array([[1.25, -0.5, 31.0]]),
+		"NaN and Infinity": np.array([[np.nan, np.inf, -np.inf], [0.25, 0.5, 0.75]]),
+	}
+	ok = True
+	for name, samples in cases.items():
+		block = encodeBlock(samples)
+		count, length, scale, width, codec = BLOCK_HEADER.unpack_from(block)
+		decoded = decodeBlock(count, scale, width, codec, block[BLOCK_HEADER.size:])
+		same = decoded.shape == samples.shape and np.array_equal(decoded, samples, equal_nan=True)
+		print("\t{:<26} {:<24} --> {}".format(name, "float64" if scale == 0 else "Scale {}, {}-Byte Deltas".format(scale, width),
+			  "Lossless" if same else "CHANGED"))
+		ok = ok and same
+	print("Block Round-Trips Verified:", ok)
+	return ok
+
+def benchmark(seconds=300, sample_rate=3200, repeats=3):
+	import tempfile
+	from Accelerometer_Store import CaptureStore
+	from Accelerometer_Output import writeXlsx, writeCsv
+	sample_num = int(seconds*sample_rate)
+	samples = _syntheticReadings(sample_num, sample_rate)
+	metadata = {"offsets": [-1.25, -0.5, 0.125], "coefs": [9.81/31.5, 9.81/31.75, 9.81/31], "cross_axis": None}
+	print("Compact Format Benchmark: {} Samples ({} s at {} Hz)".format(sample_num, seconds, sample_rate))
+	with tempfile.TemporaryDirectory() as directory:
+		sizes = {}
+		compact_path = os.path.join(directory, "capture.acz")
+		encode = []
+		for repeat in range(repeats):
+			start = time.perf_counter()
+			with CompactWriter.create(compact_path, sample_rate, metadata) as writer:
+				for first in range(0, sample_num, 1600): # Stream-Sized Appends
+					writer.append(samples[first:first+1600])
+			encode.append(time.perf_counter() - start)
+		sizes["acz (" + COMPACT_CODEC + ")"] = os.path.getsize(compact_path)
+		decode = []
+		for repeat in range(repeats):
+			start = time.perf_counter()
+			decoded = CompactCapture.open(compact_path).read()
+			decode.append(time.perf_counter() - start)
+		lossless = np.array_equal(decoded, samples)
+		capture = CompactCapture.open(compact_path)
+		start = time.perf_counter()
+		window = capture.calibrated(sample_num//2, sample_num//2 + sample_rate)
+		window_sec = time.perf_counter() - start
+		matches = np.allclose(window, calibrate(samples[sample_num//2:sample_num//2 + sample_rate].T,
+												metadata["offsets"], metadata["coefs"]), rtol=0, atol=0)
+
+		with CaptureStore.create(os.path.join(directory, "capture.acc"), sample_rate, metadata, capacity=sample_num) as store:
+			store.append(samples)
+		sizes["acc (float64 store)"] = os.path.getsize(store.path)
+		calibrated = calibrate(samples.T, metadata["offsets"], metadata["coefs"])
+		columns = (np.arange(sample_num)/sample_rate, *calibrated)
+		writeCsv(os.path.join(directory, "capture.csv"), columns)
+		sizes["csv (calibrated)"] = os.path.getsize(os.path.join(directory, "capture.csv"))
+		writeXlsx(os.path.join(directory, "capture.xlsx"), columns)
+		sizes["xlsx (calibrated)"] = os.path.getsize(os.path.join(directory, "capture.xlsx"))
+
+	raw_mb = samples.nbytes/1e6
+	print("Encode: {:.3f} s ({:.0f} MB/s of float64 Readings)".format(min(encode), raw_mb/min(encode)))
+	print("Decode: {:.3f} s ({:.0f} MB/s), Lossless: {}".format(min(decode), raw_mb/min(decode), lossless))
+	print("Lazy Calibrated Read of 1 s Mid-Capture: {:.2f} ms, Matches: {}".format(window_sec*1000, matches))
+	print("{:<22}{:>14}{:>16}".format("Format", "Size (MB)", "vs acz"))
+	for name, size in sizes.items():
+		print("{:<22}{:>14.2f}{:>15.1f}x".format(name, size/1e6, size/sizes["acz (" + COMPACT_CODEC + ")"]))
+	return lossless and matches
+
+##############################################################
+### MAIN FUNCTION ###
+##############################################################
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Compressed raw accelerometer captures")
+	parser.add_argument("mode", choices=["benchmark", "convert"])
+	parser.add_argument("paths", nargs="*", help=".acc capture stores to convert")
+	parser.add_argument("--seconds", type=float, default=300, help="benchmark capture length")
+	args = parser.parse_args()
+
+	if (args.mode == "benchmark"):
+		sys.exit(0 if verifyBlocks() and benchmark(args.seconds) else 1)
+	for path in args.paths:
+		compact_path = convertStore(path)
+		print("{} ({:.2f} MB) --> {} ({:.2f} MB)".format(path, os.path.getsize(path)/1e6,
+			  compact_path, os.path.getsize(compact_path)/1e6))
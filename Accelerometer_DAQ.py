@@ -8,9 +8,21 @@
 SAMPLE_RATE_HZ = 3200							# Samples to Gather per Second (This should match Teensy rate)
 SAMPLE_TIME_SEC = 2 							# Number of Seconds to Run Data Acquisition
 
+## Timing Settings
+TIMING_ENABLED = True 							# Timestamp Received Blocks and Report Effective Rate, Gaps and Drift
+SEQUENCE_ENABLED = False 						# Teensy Appends a Sequence Counter to Each Line ("<x>y<y>z<z>n<count>")
+
+## Streaming Settings
+STREAM_ENABLED = False 							# Stream Continuously Until Ctrl+C Instead of Capturing SAMPLE_TIME_SEC
+STREAM_BLOCK_SEC = 0.5 							# Seconds of Data Calibrated, Filtered and Saved per Block
+STREAM_BUFFER_SEC = 10 							# Ring Buffer Length (Seconds). Samples Arriving While Full are Dropped (Overrun)
+
 ## Zeroing Settings
 ZERO_ENABLED = True 							# Enable or Disable Zeroing during Data Acquisition
 ZERO_SETTING = 1 								# 0 = Zeroing while still, 1 = Zeroing while shaking (e.g. on actuator)
+ZERO_ONLINE_MODE = "warmup" 					# Streaming with Setting 1: "warmup" (Running Mean of the First ZERO_WINDOW_SEC, Then Fixed),
+												# "ewma" (Exponentially Weighted, Follows Drift) or "" (Mean of the First Block Only)
+ZERO_WINDOW_SEC = 2 							# Warm-Up Length or EWMA Time Constant (Seconds)
 
 ## Noise Settings
 NOISE_FILTER_ENABLED = True 					# Enable or Disabling Noise Margin
@@ -23,19 +35,45 @@ Y_OFFSET = -0.5 								#	 taking the difference, then dividing by 2 to get the
 Y_INVERSE_GAIN = 31.75							# 2) Adding the absolute value of the ADC values at +1 and -1g,
 Z_OFFSET = 0.125 								#    then dividing by 2 to get the inverse gain value, then tweaking
 Z_INVERSE_GAIN = 31								# ----> 2g Settings: -10.5, 254, -4.1, 254, 1.0, 249.5
+CALIBRATION_PROFILE = "" 						# Saved Profile Replacing the Values Above (from Accelerometer_Calibration.py), "" to Use Them
+
+## Spectrum Settings
+SPECTRUM_ENABLED = True 						# Compute FFT, Welch PSD, Peaks and Band RMS and Save Them With the Data
+SPECTRUM_SEGMENT = 4096 						# Welch Segment Length (Samples). Resolution = SAMPLE_RATE_HZ/SPECTRUM_SEGMENT
+
+## Decimation Settings
+DECIMATE_FACTOR = 1 							# Anti-Alias Filter and Keep Every Nth Sample of the Output (1 = Off). 8 --> 400 Hz Output,
+												# Content Kept Up to 0.8x its Nyquist (160 Hz). The Capture Store Still Holds Every Raw Sample
 
 ## Teensy Connection Settings
 TEENSY_SER_FILENAME = "COM_PORT_2.txt"			# Filename for Manual Connection
 TEENSY_SERIAL_PORT = ""  						# Serial Port for Manual Serial Connection (Leave as "" for filename)
 
+## Multi-Device Settings
+MULTI_DEVICES = [] 								# Capture Several Accelerometers at Once Into One Combined Table, e.g.
+												# [{"name": "Bracket", "port": "COM5", "profile": "UNIT_42"},
+												#  {"name": "Housing", "port": "COM7", "offsets": (-1.0, -0.5, 0.0), "inverse_gains": (31.5, 31.5, 31)}]
+												# Devices Without "profile" or "offsets"/"inverse_gains" Use the Calibration Settings Above,
+												# but a Cross-Axis Correction Only Comes From the Device's Own Profile or "cross_axis"
+
 ## Workbook Settings
 WORKBOOK_ENABLED = True			   		 		# Enable or Disable Writing Data to Workbook
 WORKBOOK_PATH = ".\\Acceleration_Data/"			# Workbook File Path
 WORKBOOK_FILENAME = "acc_data"					# Workbook File Name (without timestamp)
+WORKBOOK_FORMAT = "xlsx" 						# Output Format: "xlsx", "csv", "npy", "npz" or "parquet" (Needs pyarrow)
+
+## Capture Store Settings
+STORE_ENABLED = True 							# Append Raw Samples to a Memory-Mapped .acc File as They Arrive (Survives Crashes)
+STORE_FLUSH_SEC = 1.0 							# Seconds Between Flushes to Disk (Data Since the Last Flush is Lost on a Crash)
+STORE_FORMAT = "acc" 							# "acc" (Memory-Mapped float64) or "acz" (Compressed Integer Readings, ~13x Smaller)
 
 ## Plot Settings
 PLOT_ENABLED = True								# Enable or Disable Plot Visualization
 PLOT_TITLE = "Actuator Bracket Acceleration"	# Set Plot Title
+PLOT_BACKEND = "matplotlib" 					# "matplotlib" or "pyqtgraph" (Both Draw a Decimated Envelope of Long Captures)
+
+## Run Report Settings
+REPORT_ENABLED = False 							# Time Each Stage (Serial Read, Parsing, Calibration, Writing, Plotting) and Save a JSON Run Report
 
 # ---------------------------------------------------------- #
 
@@ -45,104 +83,319 @@ PLOT_TITLE = "Actuator Bracket Acceleration"	# Set Plot Title
 
 import sys
 import os
-import serial
-import serial.tools.list_ports
 import time
 import math
 import numpy as np
-import matplotlib.pyplot as plt
-import xlsxwriter
 import datetime
+from Accelerometer_Stream import StreamDecoder, RingBuffer, StreamReader, TimingMonitor
+from Accelerometer_Processing import processCapture, StreamProcessor, OnlineZero
+from Accelerometer_Output import writeCapture, writeCsv, writeSpectrum, writeTable
+from Accelerometer_Spectrum import analyze, StreamAnalyzer, printSpectrum
+from Accelerometer_Decimate import decimate, Decimator
+from Accelerometer_Store import CaptureStore
+from Accelerometer_Compact import CompactWriter
+from Accelerometer_Plot import plotCapture, showPlot
+from Accelerometer_Multi import DeviceStream, MultiCapture
+from Accelerometer_Calibration import loadProfile
+from Teensy_Connection import connectTeensy, accelerometerHandshake, probePort
+from Run_Report import RunReport
 
 ##############################################################
 ### GENERAL SETTINGS ###
 ##############################################################
 
+## Calibration Profile
+CROSS_AXIS = None 					# 3x3 Cross-Axis Correction (Profiles Fitted With --cross-axis Only)
+if (CALIBRATION_PROFILE):
+	profile = loadProfile(CALIBRATION_PROFILE)
+	X_OFFSET, Y_OFFSET, Z_OFFSET = profile["offsets"]
+	X_INVERSE_GAIN, Y_INVERSE_GAIN, Z_INVERSE_GAIN = profile["inverse_gains"]
+	CROSS_AXIS = profile.get("cross_axis")
+	print("Calibration Profile: " + CALIBRATION_PROFILE + " (" + profile.get("created", "") + ")")
+
 ## Data Acquisition Parameters
 SAMPLE_NUM = int(SAMPLE_RATE_HZ*SAMPLE_TIME_SEC)
+OUTPUT_RATE_HZ = SAMPLE_RATE_HZ/max(DECIMATE_FACTOR, 1)
 X_COEF = (9.81/X_INVERSE_GAIN)
 Y_COEF = (9.81/Y_INVERSE_GAIN)
 Z_COEF = (9.81/Z_INVERSE_GAIN)
+REPORT = RunReport("Accelerometer_DAQ", enabled=REPORT_ENABLED)
 
 ## Teensy Connection Parameters
-MANUAL_ATTEMPT = True				# Manual Connection Flag
 TEENSY_CONNECTED = False            # Connection Indicator
-TEENSY_BAUD_RATE = 921600           # Serial Baud Rate
+TEENSY_BAUD_RATE = 921600           # Serial Baud Rate (Updated to the Negotiated Rate on Connection)
+TEENSY_BAUD_RATES = (921600, 460800, 230400, 115200, 57600, 9600) # Rates Tried, Fastest First
 TEENSY = None 						# Initialize Serial.serial() Variable
 
 ############################+##################################
 ### TEENSY CONNECTION ###
 ##############################################################
 
-MANUAL_ATTEMPT = True
-TEENSY_CONNECTED = False
-TEENSY_SERIAL_PORT = ""
-TEENSY_BAUD_RATE = 9600
-try:
-	TEENSY_SERIAL_PORT = open(TEENSY_SER_FILENAME).readline()
-except:
-	TEENSY_SERIAL_PORT = "<NO PORT SELECTED>"
-	print("COM_PORT.txt file not found --> No serial port will be selected.")
-	MANUAL_ATTEMPT = False
-
-try: # Manual Connection
-	if (not MANUAL_ATTEMPT or TEENSY_SERIAL_PORT == ""):
-		TEENSY = serial.Serial(
-			port="ERROR", # Intentionally send error if manual attempt is skipped
-			baudrate="ERROR"
-		)
-	print("Attempting manual connection to serial port " + TEENSY_SERIAL_PORT + "...")
-	TEENSY = serial.Serial(
-		port=TEENSY_SERIAL_PORT,
-		baudrate=TEENSY_BAUD_RATE
-	)
-	TEENSY_CONNECTED = True
-	print("Successfully connected to serial device at " + TEENSY_SERIAL_PORT + ".")
-except: # Automatic Connection
-	if (not MANUAL_ATTEMPT or TEENSY_SERIAL_PORT == ""):
-		print("No serial port selected. Ignoring manual connection attempt.")
-	else:
-		print("Manual connection attempt failed.")
-	print("\nAttempting automatic connection...")
-	myports = [tuple(p) for p in list(serial.tools.list_ports.comports())]
-	if (len(myports) == 0):
-		print("No serial ports detected.")
-		print("Automatic connection attempt failed.")
-	else:
-		print(str(len(myports)) + " serial port(s) detected:")
-		for port in myports:
-			print("\t", port)
-		port_index = 0
-		for port in myports:
-			print("\nAttempting connection to " + port[1] + "...")
-			port_index += 1
-			try:
-				TEENSY = serial.Serial(
-					port=port[0],
-					baudrate=TEENSY_BAUD_RATE
-				)
-				#line = TEENSY.readline().decode().rstrip()
-				if (True): #if (line.__contains__("")): # Use this for specific programs
-					TEENSY_CONNECTED = True
-					TEENSY_SERIAL_PORT = port[1]
-					print("Connection to " + port[1] + " succeeded.")
-					break
-				else:
-					print("Connection to " + port[1] + " failed.")
-					if (port_index >= len(myports)-1):
-						print("Automatic connection attempts failed.")
-			except:
-				print("Connection to " + port[1] + " failed.")
-				if (port_index >= len(myports)-1):
-					print("Automatic connection attempts failed.")
+# Startup: Open the Accelerometer Port (Multi-Device Captures Open Their Own Ports Instead)
+def connectAccelerometer():
+	global TEENSY, TEENSY_SERIAL_PORT, TEENSY_CONNECTED, TEENSY_BAUD_RATE
+	with REPORT.stage("connect"):
+		TEENSY, TEENSY_SERIAL_PORT = connectTeensy(TEENSY_SER_FILENAME, TEENSY_BAUD_RATES, accelerometerHandshake,
+												   manual_port=TEENSY_SERIAL_PORT)
+	TEENSY_CONNECTED = (TEENSY is not None)
+	if (TEENSY_CONNECTED):
+		TEENSY_BAUD_RATE = TEENSY.baudrate
+	return TEENSY_CONNECTED
+
+##############################################################
+### CAPTURE STORE ###
+##############################################################
+def createCaptureStore():
+	if (not STORE_ENABLED):
+		return None
+	try:
+		os.mkdir(WORKBOOK_PATH, 0o666)
+	except:
+		pass
+	store_dir = WORKBOOK_PATH + WORKBOOK_FILENAME + '_{}.{}'\
+				.format(str(datetime.datetime.now().strftime("%H_%M_%S")), STORE_FORMAT)
+	metadata = {
+		"port": TEENSY_SERIAL_PORT,
+		"baud_rate": TEENSY_BAUD_RATE,
+		"offsets": [X_OFFSET, Y_OFFSET, Z_OFFSET],
+		"inverse_gains": [X_INVERSE_GAIN, Y_INVERSE_GAIN, Z_INVERSE_GAIN],
+		"coefs": [X_COEF, Y_COEF, Z_COEF],
+		"calibration_profile": CALIBRATION_PROFILE,
+		"cross_axis": CROSS_AXIS,
+		"zero_enabled": ZERO_ENABLED,
+		"zero_setting": ZERO_SETTING,
+		"noise_filter_enabled": NOISE_FILTER_ENABLED,
+		"noise_margin": NOISE_MARGIN,
+		"start_time": datetime.datetime.now().isoformat(),
+	}
+	if (STORE_FORMAT == "acz"):
+		return CompactWriter.create(store_dir, SAMPLE_RATE_HZ, metadata)
+	return CaptureStore.create(store_dir, SAMPLE_RATE_HZ, metadata,
+							   capacity=SAMPLE_NUM if not STREAM_ENABLED else int(SAMPLE_RATE_HZ*60))
+
+##############################################################
+### RUN REPORT ###
+##############################################################
+def writeRunReport(mode):
+	if (not REPORT_ENABLED):
+		return
+	try:
+		os.mkdir(WORKBOOK_PATH, 0o666)
+	except:
+		pass
+	REPORT.set("mode", mode)
+	REPORT.set("sample_rate_hz", SAMPLE_RATE_HZ)
+	REPORT.set("baud_rate", TEENSY_BAUD_RATE)
+	REPORT.set("workbook_format", WORKBOOK_FORMAT if WORKBOOK_ENABLED else None)
+	REPORT.set("store_format", STORE_FORMAT if STORE_ENABLED else None)
+	REPORT.set("decimate_factor", DECIMATE_FACTOR)
+	REPORT.printSummary()
+	report_dir = REPORT.write(WORKBOOK_PATH + WORKBOOK_FILENAME + '_report_{}.json'\
+							  .format(str(datetime.datetime.now().strftime("%H_%M_%S"))))
+	print("Run Report Saved to " + report_dir)
+
+##############################################################
+### STREAMING ACQUISITION ###
+##############################################################
+def streamAcquisition():
+	print("Streaming Data (Press Ctrl+C to Stop)...")
+	block_size = max(1, int(SAMPLE_RATE_HZ*STREAM_BLOCK_SEC))
+	ring = RingBuffer(max(block_size, int(SAMPLE_RATE_HZ*STREAM_BUFFER_SEC)))
+	monitor = TimingMonitor(SAMPLE_RATE_HZ) if (TIMING_ENABLED or SEQUENCE_ENABLED) else None
+	reader = StreamReader(TEENSY, ring, StreamDecoder(sequence=SEQUENCE_ENABLED), monitor)
+	processor = StreamProcessor((X_OFFSET, Y_OFFSET, Z_OFFSET), (X_COEF, Y_COEF, Z_COEF), SAMPLE_RATE_HZ,
+								zero_enabled=ZERO_ENABLED, zero_setting=ZERO_SETTING,
+								noise_enabled=NOISE_FILTER_ENABLED, noise_margin=NOISE_MARGIN,
+								online_zero=OnlineZero(ZERO_ONLINE_MODE, int(SAMPLE_RATE_HZ*ZERO_WINDOW_SEC))
+											if ZERO_ONLINE_MODE else None,
+								cross_axis=CROSS_AXIS)
+	decimator = Decimator(DECIMATE_FACTOR) if (DECIMATE_FACTOR > 1) else None
+	analyzer = StreamAnalyzer(OUTPUT_RATE_HZ, SPECTRUM_SEGMENT) if SPECTRUM_ENABLED else None
+
+	# Open Output File (Rows are Appended Block by Block, so Memory Stays Bounded)
+	stream_file = None
+	if (WORKBOOK_ENABLED):
+		try:
+			os.mkdir(WORKBOOK_PATH, 0o666)
+		except:
+			pass
+		stream_dir = WORKBOOK_PATH + WORKBOOK_FILENAME + '_stream_{}.csv'\
+					 .format(str(datetime.datetime.now().strftime("%H_%M_%S")))
+		stream_file = open(stream_dir, "w")
+		stream_file.write("Time (s),X (m/s^2),Y (m/s^2),Z (m/s^2)\n")
+
+	store = createCaptureStore()
+	last_flush = time.time()
+
+	def saveBlock(block):
+		if (store is not None):
+			with REPORT.stage("store_write"):
+				store.append(block)
+		with REPORT.stage("calibration"):
+			time_arr, data = processor.process(block)
+		if (decimator is not None):
+			with REPORT.stage("decimation"):
+				data = decimator.process(data)
+				time_arr = decimator.times(data.shape[1], SAMPLE_RATE_HZ)
+		if (analyzer is not None):
+			with REPORT.stage("spectrum"):
+				analyzer.update(data)
+		if (stream_file is not None and len(time_arr) > 0):
+			with REPORT.stage("workbook_write"):
+				np.savetxt(stream_file, np.column_stack((time_arr, data.T)), delimiter=",", fmt="%.6g")
+		REPORT.count("samples_written", len(time_arr))
+
+	start = time.time()
+	reader.start()
+	try:
+		while (reader.is_alive()):
+			saveBlock(ring.read(block_size, min_count=block_size, timeout=STREAM_BLOCK_SEC))
+			if (store is not None and time.time() - last_flush >= STORE_FLUSH_SEC):
+				store.flush()
+				last_flush = time.time()
+			print("\r{:.1f} s streamed, {} overrun(s)".format(processor.sample_count/SAMPLE_RATE_HZ, ring.overruns),
+				  end="", flush=True)
+	except KeyboardInterrupt:
+		pass
+	reader.stop()
+	saveBlock(ring.read(timeout=0))
+	end = time.time()
+
+	# Summary
+	print("\nDone!")
+	if (reader.error is not None):
+		print("ERROR: TEENSY DISCONNECTED (" + str(reader.error) + ")")
+	print("Time Elapsed:", round(end - start, 4), "Seconds")
+	print("Samples Processed:", processor.sample_count)
+	if (decimator is not None):
+		print("Samples Written: {} ({:g} Hz, {:.3f} s Filter Delay Removed From the Timestamps)".format(
+			  decimator.output_count, OUTPUT_RATE_HZ, decimator.delay/SAMPLE_RATE_HZ))
+	print("Overruns (Samples Dropped):", ring.overruns)
+	print("Malformed Lines:", reader.decoder.malformed)
+	if (monitor is not None):
+		monitor.printSummary()
+	if (processor.online_zero is not None):
+		processor.online_zero.printConvergence((X_COEF, Y_COEF, Z_COEF))
+	if (analyzer is not None):
+		printSpectrum(analyzer.result())
+	if (stream_file is not None):
+		stream_file.close()
+		print("Stream Saved to " + stream_dir)
+		if (analyzer is not None and analyzer.segments > 0):
+			writeSpectrum(stream_dir, analyzer.result(), writeCsv)
+	if (store is not None):
+		store.close()
+		print("Capture Store Saved to " + store.path)
+
+	# Reader Thread Work (Serial Read and Parsing Overlap the Stages Above)
+	REPORT.add("reader_thread_cpu", reader.cpu_time)
+	REPORT.count("bytes_read", reader.decoder.bytes_read)
+	REPORT.count("lines_parsed", reader.decoder.lines_parsed)
+	REPORT.count("parse_errors", reader.decoder.malformed)
+	REPORT.count("overruns", ring.overruns)
+	writeRunReport("stream")
+
+##############################################################
+### MULTI-DEVICE ACQUISITION ###
+##############################################################
+def multiAcquisition():
+	# Connect to Every Device (No Automatic Search, so Devices Cannot Swap Ports)
+	devices = []
+	for config in MULTI_DEVICES:
+		print("Connecting to " + config["name"] + " at " + config["port"] + "...")
+		ser = probePort(config["port"], TEENSY_BAUD_RATES, accelerometerHandshake)
+		if (ser is None):
+			print("Connection to " + config["name"] + " failed.\nPlease reconnect USB and restart program.\n")
+			for device in devices:
+				device.ser.close()
+			return
+		ser.timeout = None
+		ser.write_timeout = None
+		print("Connected at " + str(ser.baudrate) + " baud.")
+		calibration = {"offsets": (X_OFFSET, Y_OFFSET, Z_OFFSET),
+					   "inverse_gains": (X_INVERSE_GAIN, Y_INVERSE_GAIN, Z_INVERSE_GAIN), "cross_axis": None}
+		if ("profile" in config): # Per-Device Profile, Then Any Values Given Directly
+			calibration.update(loadProfile(config["profile"]))
+		calibration.update(config)
+		devices.append(DeviceStream(config["name"], ser, calibration, SAMPLE_RATE_HZ, SAMPLE_NUM, sequence=SEQUENCE_ENABLED))
+
+	# Capture All Devices Against the Same Clock
+	multi = MultiCapture(devices, SAMPLE_RATE_HZ)
+	print("----------------------------------------------------")
+	print("Sample Time: {} Second(s)".format(SAMPLE_TIME_SEC))
+	print("Acquiring Data from {} Devices...".format(len(devices)), end = " ")
+	start = time.time()
+	with REPORT.stage("capture"):
+		raw = multi.capture(SAMPLE_NUM)
+	end = time.time()
+	for device in devices:
+		device.ser.close()
+	print("Done!")
+	print("Time Elapsed:", round(end - start, 4), "Seconds")
+
+	# Devices That Sent Nothing are Left Out, so One Unplugged Device Does Not Lose the Others
+	empty = multi.emptyDevices(raw)
+	if (empty):
+		print("No Samples From " + ", ".join(empty) + " (Left Out of the Combined Table)")
+	if (len(empty) == len(devices)):
+		multi.printSummary(raw)
+		print("No Data Acquired.\nPlease reconnect USB and restart program.\n")
+		return
+
+	# Calibrate Each Device, Align Onto One Time Axis
+	with REPORT.stage("calibration"):
+		calibrated = multi.calibrate(raw, zero_enabled=ZERO_ENABLED, zero_setting=ZERO_SETTING,
+									 noise_enabled=NOISE_FILTER_ENABLED, noise_margin=NOISE_MARGIN)
+	with REPORT.stage("combine"):
+		time_arr, columns, headers, starts = multi.combine(calibrated)
+	multi.printSummary(raw, starts)
+	print("\nCombined: {} Samples per Device ({:.4f} s Overlap)".format(len(time_arr), len(time_arr)/SAMPLE_RATE_HZ))
+	if (DECIMATE_FACTOR > 1):
+		with REPORT.stage("decimation"):
+			time_arr = time_arr[::DECIMATE_FACTOR]
+			columns = [time_arr] + list(decimate(np.array(columns[1:]), DECIMATE_FACTOR))
+		print("Decimated to {} Samples per Device ({:g} Hz)".format(len(time_arr), OUTPUT_RATE_HZ))
+	for name, data in calibrated.items():
+		print("{}: X {} Y {} Z {}".format(name, *[round(np.average(row), 2) for row in data]))
+
+	## Print to Workbook
+	if (WORKBOOK_ENABLED):
+		try:
+			os.mkdir(WORKBOOK_PATH, 0o666)
+		except:
+			pass
+		with REPORT.stage("workbook_write"):
+			workbook_dir = writeTable(WORKBOOK_PATH + WORKBOOK_FILENAME + '_multi_{}'\
+									  .format(str(datetime.datetime.now().strftime("%H_%M_%S"))),
+									  WORKBOOK_FORMAT, columns, headers, sample_rate=OUTPUT_RATE_HZ)
+		print("Workbook Saved to " + workbook_dir)
+
+	for device in devices:
+		REPORT.add("reader_thread_cpu", device.reader.cpu_time)
+		REPORT.count("bytes_read", device.reader.decoder.bytes_read)
+		REPORT.count("lines_parsed", device.reader.decoder.lines_parsed)
+		REPORT.count("parse_errors", device.reader.decoder.malformed)
+	REPORT.count("samples_written", len(time_arr))
+	writeRunReport("multi")
 
 ##############################################################
 ### MAIN FUNCTION ###	
 ##############################################################
 if __name__ == '__main__':
+    if (not MULTI_DEVICES):
+    	connectAccelerometer()
     print("----------------------------------------------------")
+    ## Multi-Device Acquisition
+    if (MULTI_DEVICES):
+    	multiAcquisition()
+
+    ## Streaming Acquisition
+    elif (TEENSY_CONNECTED and STREAM_ENABLED):
+    	streamAcquisition()
+
     ## Data Acquisition
-    if (TEENSY_CONNECTED):
+    elif (TEENSY_CONNECTED):
+    	print("Baud Rate:", TEENSY_BAUD_RATE)
     	print("Sample Time: {} Second(s)".format(SAMPLE_TIME_SEC))
     	print("Acquiring Data...", end = " ")
 
@@ -154,59 +407,59 @@ if __name__ == '__main__':
     	x = np.empty(SAMPLE_NUM)
     	y = np.empty(SAMPLE_NUM)
     	z = np.empty(SAMPLE_NUM)
-    	time_arr = np.empty(SAMPLE_NUM)
-    	index_y = index_z = 0
+    	decoder = StreamDecoder(skip_partial=False, sequence=SEQUENCE_ENABLED) # First (partial) line was already discarded above
+    	monitor = TimingMonitor(SAMPLE_RATE_HZ) if (TIMING_ENABLED or SEQUENCE_ENABLED) else None
+    	store = createCaptureStore()
 
-    	# Read Serial Data, Add to Arrays
-    	start = time.time()
-    	for i in range(SAMPLE_NUM):
-    		incoming_str = TEENSY.readline().decode()
-    		index_y = incoming_str.index("y")
-    		index_z = incoming_str.index("z")
-    		x[i] = float(incoming_str[:index_y])
-    		y[i] = float(incoming_str[index_y+1:index_z])
-    		z[i] = float(incoming_str[index_z+1:])
+    	# Read Serial Data in Bulk, Add to Arrays (and to the Capture Store)
+    	start = last_flush = time.time()
+    	i = 0
+    	while (i < SAMPLE_NUM):
+    		with REPORT.stage("serial_read"):
+    			data = decoder.receive(TEENSY)
+    		with REPORT.stage("parse"):
+    			block = decoder.feed(data)
+    		if (monitor is not None):
+    			monitor.record(block)
+    		count = min(len(block), SAMPLE_NUM - i)
+    		x[i:i+count] = block[:count, 0]
+    		y[i:i+count] = block[:count, 1]
+    		z[i:i+count] = block[:count, 2]
+    		i += count
+    		if (store is not None and count > 0):
+    			with REPORT.stage("store_write"):
+    				store.append(block[:count, :3])
+    				if (time.time() - last_flush >= STORE_FLUSH_SEC):
+    					store.flush()
+    					last_flush = time.time()
+    	if (store is not None):
+    		store.close()
 
     	# Print Time Elapsed
     	end = time.time()
     	print("Done!")
     	print("Time Elapsed:", round(end - start, 4), "Seconds")
+    	if (decoder.malformed > 0):
+    		print("WARNING:", decoder.malformed, "malformed line(s) skipped")
+    	if (store is not None):
+    		print("Capture Store Saved to " + store.path)
+    	if (monitor is not None):
+    		monitor.printSummary()
+
+    	# Apply Gains, Offsets, Zeroing and Filters to Readings, and Populate Time Array
+    	with REPORT.stage("calibration"):
+    		x, y, z, time_arr = processCapture(x, y, z,
+    										   (X_OFFSET, Y_OFFSET, Z_OFFSET), (X_COEF, Y_COEF, Z_COEF), SAMPLE_TIME_SEC,
+    										   zero_enabled=ZERO_ENABLED, zero_setting=ZERO_SETTING,
+    										   noise_enabled=NOISE_FILTER_ENABLED, noise_margin=NOISE_MARGIN,
+    										   cross_axis=CROSS_AXIS)
 
-    	# Obtain Zeroing Offset
-    	x_zero_offset = y_zero_offset = z_zero_offset = 0
-    	if (ZERO_ENABLED):
-    		# Zeroing while standing still
-    		if (ZERO_SETTING == 0):
-    			x_zero_offset = -(x[0] + X_OFFSET)
-		    	y_zero_offset = -(y[0] + Y_OFFSET)
-		    	z_zero_offset = -(z[0] + Z_OFFSET)
-		    # Zeroing while shaking
-    		if (ZERO_SETTING == 1):
-		    	x_zero_offset = -(np.average(x) + X_OFFSET)
-		    	y_zero_offset = -(np.average(y) + Y_OFFSET)
-		    	z_zero_offset = -(np.average(z) + Z_OFFSET)
-
-    	# Apply Gains, Offsets, and Filters to Readings, and Populate Time Array
-    	for i in range(SAMPLE_NUM):
-    		x[i] += X_OFFSET
-    		y[i] += Y_OFFSET
-    		z[i] += Z_OFFSET
-    		if (ZERO_ENABLED):
-    			x[i] += x_zero_offset
-    			y[i] += y_zero_offset
-    			z[i] += z_zero_offset
-    		x[i] *= X_COEF
-    		y[i] *= Y_COEF
-    		z[i] *= Z_COEF
-    		if (NOISE_FILTER_ENABLED and i > 0):
-    			if (abs(x[i] - x[i-1]) <= NOISE_MARGIN):
-    				x[i] = x[i-1]
-    			if (abs(y[i] - y[i-1]) <= NOISE_MARGIN):
-    				y[i] = y[i-1]
-    			if (abs(z[i] - z[i-1]) <= NOISE_MARGIN):
-    				z[i] = z[i-1]
-    		time_arr[i] = round(i/SAMPLE_NUM*SAMPLE_TIME_SEC, 4)
-    	time_arr[-1] = SAMPLE_TIME_SEC
+    	## Anti-Alias Filter and Decimate (Output, Spectrum and Plot All Use the Reduced Rate)
+    	if (DECIMATE_FACTOR > 1):
+    		with REPORT.stage("decimation"):
+    			x, y, z = decimate(np.array((x, y, z)), DECIMATE_FACTOR)
+    			time_arr = time_arr[::DECIMATE_FACTOR]
+    		print("Decimated to {} Samples ({:g} Hz)".format(len(time_arr), OUTPUT_RATE_HZ))
 
     	## Print Average Readings (for calibration purposes)
     	print("\nX:", round(np.average(x), 2))
@@ -214,6 +467,14 @@ if __name__ == '__main__':
     	print("Z:", round(np.average(z), 2))
     	print("Magnitude:", round(math.sqrt(np.average(x)**2 + np.average(y)**2 + np.average(z)**2), 2), end="\n\n")
 
+    	## Vibration Spectrum (All Three Axes in One Batch)
+    	spectrum = None
+    	if (SPECTRUM_ENABLED):
+    		with REPORT.stage("spectrum"):
+    			spectrum = analyze(np.array((x, y, z)), OUTPUT_RATE_HZ, SPECTRUM_SEGMENT)
+    		printSpectrum(spectrum)
+    		print()
+
     	## Print to Workbook
     	if (WORKBOOK_ENABLED):
     		# Create Directory (if it doesn't exist)
@@ -222,39 +483,29 @@ if __name__ == '__main__':
 	        except:
 	       		pass
 
-	    	# Create Headers
-	        workbook_dir = WORKBOOK_PATH + WORKBOOK_FILENAME +'_{}.xlsx'\
-	        			   .format(str(datetime.datetime.now().strftime("%H_%M_%S")))
-	        workbook = xlsxwriter.Workbook(workbook_dir)
-	        data_sheet = workbook.add_worksheet("Data")
-	        bold_format = workbook.add_format({'bold': True})
-	        data_sheet.write(0, 0, 'Time (s)', bold_format)
-	        data_sheet.write(0, 1, 'X (m/s^2)', bold_format)
-	        data_sheet.write(0, 2, 'Y (m/s^2)', bold_format)
-	        data_sheet.write(0, 3, 'Z (m/s^2)', bold_format)
-
-	        # Write Data
-	        for i in range(SAMPLE_NUM):
-		        data_sheet.write(i+1, 0, time_arr[i])
-		        data_sheet.write(i+1, 1, x[i])
-		        data_sheet.write(i+1, 2, y[i])
-		        data_sheet.write(i+1, 3, z[i])
-
-			# Close the Workbook
+	        # Write Capture in the Selected Format
+	        with REPORT.stage("workbook_write"):
+	        	workbook_dir = writeCapture(WORKBOOK_PATH + WORKBOOK_FILENAME + '_{}'\
+	        								.format(str(datetime.datetime.now().strftime("%H_%M_%S"))),
+	        								WORKBOOK_FORMAT, time_arr, x, y, z, spectrum=spectrum, sample_rate=OUTPUT_RATE_HZ)
 	        print("Workbook Saved to " + workbook_dir)
-	        workbook.close()
 
-	    ## Display Accelerometer Graph
+	    ## Build the Accelerometer Graph (Shown After the Run Report is Saved)
+    	plot = None
     	if (PLOT_ENABLED):
-	        plt.plot(time_arr, x, "r", label="x")
-	        plt.plot(time_arr, y, "g", label="y")
-	        plt.plot(time_arr, z, "b", label="z")
-	        plt.title(PLOT_TITLE)
-	        plt.xlabel("Time (s)")
-	        plt.ylabel("Accleration (m/s^2)")
-	        plt.legend()
+	        with REPORT.stage("plot"):
+	        	plot = plotCapture(time_arr, (x, y, z), PLOT_TITLE, backend=PLOT_BACKEND, show=False)
+
+    	REPORT.count("bytes_read", decoder.bytes_read)
+    	REPORT.count("lines_parsed", decoder.lines_parsed)
+    	REPORT.count("parse_errors", decoder.malformed)
+    	REPORT.count("samples_written", len(time_arr))
+    	writeRunReport("capture")
+
+	    ## Display Accelerometer Graph
+    	if (plot is not None):
 	        print("Showing Plot...")
-	        plt.show()
+	        showPlot(plot, PLOT_BACKEND)
 
     ## Connection Check
     else:
@@ -0,0 +1,150 @@
+## Accelerometer Decimate
+## Anti-alias FIR filtering and decimation of calibrated accelerometer data
+##
+## The lowpass is a Kaiser-windowed sinc whose stopband starts at the output Nyquist
+## frequency, so nothing above it can alias. Only every factor-th filter output is ever
+## computed (the polyphase form): each kept output is one dot product of the taps with the
+## input window ending at it, done as a strided matrix product over blocks of outputs.
+## decimate() handles a finished capture with zero delay; Decimator carries the filter
+## history and output phase across blocks for streaming, at a delay of half the filter
+## length. Run this file directly to check the frequency response and the streaming state.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+##############################################################
+### DECIMATION SETTINGS ###
+##############################################################
+
+DECIMATE_PASSBAND = 0.8 						# Passband Edge as a Fraction of the Output Nyquist Frequency
+DECIMATE_ATTEN_DB = 80.0 						# Stopband Attenuation (dB) From the Output Nyquist Frequency Up
+OUTPUT_CHUNK = 1024 							# Outputs Computed per Matrix Product (Bounds Temporary Memory)
+
+##############################################################
+### FILTER DESIGN ###
+##############################################################
+
+# Kaiser-Window Lowpass for Decimation by factor (Odd Length, Linear Phase, Unity DC Gain)
+def designLowpass(factor, passband=DECIMATE_PASSBAND, attenuation=DECIMATE_ATTEN_DB):
+	stop = 0.5/factor							# Frequencies as a Fraction of the Input Sample Rate
+	edge = passband*stop
+	transition = 2*np.pi*(stop - edge)
+	numtaps = int(np.ceil((attenuation - 7.95)/(2.285*transition))) + 1
+	numtaps += (numtaps + 1) % 2
+	if (attenuation > 50):
+		beta = 0.1102*(attenuation - 8.7)
+	else:
+		beta = 0.5842*(attenuation - 21)**0.4 + 0.07886*(attenuation - 21)
+	n = np.arange(numtaps) - (numtaps - 1)/2
+	taps = (edge + stop)*np.sinc((edge + stop)*n)*np.kaiser(numtaps, beta)	# Cutoff Midway Through the Transition
+	return taps / taps.sum()
+
+# Gain (dB) of the Filter at Frequencies up to the Input Nyquist
+def frequencyResponse(taps, sample_rate, points=8192):
+	gain = np.abs(np.fft.rfft(taps, 2*points))
+	return np.fft.rfftfreq(2*points, 1.0/sample_rate), 20*np.log10(np.maximum(gain, 1e-12))
+
+##############################################################
+### DECIMATION ###
+##############################################################
+
+# Filter Outputs for Windows buffer[:, start + i*step : start + i*step + len(taps)], i < count
+def _filterAt(buffer, taps, start, count, step):
+	windows = sliding_window_view(buffer, len(taps), axis=-1)[:, start::step][:, :count]
+	out = np.empty((len(buffer), windows.shape[1]))
+	reversed_taps = taps[::-1]
+	for first in range(0, windows.shape[1], OUTPUT_CHUNK):
+		out[:, first:first+OUTPUT_CHUNK] = windows[:, first:first+OUTPUT_CHUNK] @ reversed_taps
+	return out
+
+# Decimate a Finished (channels, N) Capture; Output i is Centred on Input i*factor (No Delay)
+#
+# The ends are padded with the first and last samples, so a constant stays constant.
+def decimate(data, factor, taps=None):
+	data = np.asarray(data, dtype=np.float64)
+	if (factor <= 1):
+		return data
+	taps = designLowpass(factor) if taps is None else taps
+	half = (len(taps) - 1)//2
+	padded = np.concatenate((np.repeat(data[:, :1], half, axis=1), data,
+							 np.repeat(data[:, -1:], len(taps) - 1 - half, axis=1)), axis=1)
+	return _filterAt(padded, taps, 0, -(-data.shape[1]//factor), factor)
+
+# Streaming Decimation of (channels, N) Blocks of Any Size
+#
+# Output i corresponds to input sample i*factor - delay; the history is primed with the
+# first sample so the start of a stream does not ring.
+class Decimator:
+	def __init__(self, factor, taps=None, channels=3):
+		self.factor = factor
+		self.taps = designLowpass(factor) if taps is None else taps
+		self.delay = (len(self.taps) - 1)//2	# Input Samples Between a Sample and the Output Centred on It
+		self.history = None						# Last len(taps)-1 Input Samples
+		self.phase = 0							# Start of the Next Output's Window in the Next Buffer
+		self.channels = channels
+		self.output_count = 0
+
+	def process(self, data):
+		data = np.asarray(data, dtype=np.float64)
+		if (data.shape[1] == 0):
+			return np.empty((self.channels, 0))
+		if (self.history is None):
+			self.history = np.repeat(data[:, :1], len(self.taps) - 1, axis=1)
+		buffer = np.concatenate((self.history, data), axis=1)
+		count = len(range(self.phase, data.shape[1], self.factor))
+		out = _filterAt(buffer, self.taps, self.phase, count, self.factor)
+		self.phase += count*self.factor - data.shape[1]
+		self.history = buffer[:, buffer.shape[1] - (len(self.taps) - 1):]
+		self.output_count += count
+		return out
+
+	# Time (s) of the Last count Outputs, Corrected for the Filter Delay
+	def times(self, count, sample_rate):
+		first = self.output_count - count
+		return (np.arange(first, self.output_count)*self.factor - self.delay) / sample_rate
+
+##############################################################
+### SELF CHECK ###
+##############################################################
+
+def verify(sample_rate=3200, factors=(2, 4, 8, 16)):
+	ok = True
+	rng = np.random.default_rng(0)
+	for factor in factors:
+		taps = designLowpass(factor)
+		output_nyquist = sample_rate/factor/2
+		freqs, gain = frequencyResponse(taps, sample_rate)
+		passband = freqs <= DECIMATE_PASSBAND*output_nyquist
+		stopband = freqs >= output_nyquist
+		ripple = np.abs(gain[passband]).max()
+		rejection = -gain[stopband].max()
+
+		# Tones: One in the Passband (Kept), One Above the Output Nyquist (Would Alias)
+		t = np.arange(sample_rate*4) / sample_rate
+		low, high = 0.5*output_nyquist, 1.3*output_nyquist
+		tones = np.array([np.sin(2*np.pi*low*t), np.sin(2*np.pi*high*t), np.sin(2*np.pi*low*t) + 2.0])
+		out = decimate(tones, factor)
+		middle = slice(len(taps)//factor, -len(taps)//factor) # Away From the Padded Ends
+		kept = np.abs(out[0, middle]).max()
+		aliased = np.abs(out[1, middle]).max()
+
+		# Streaming in Uneven Blocks Matches One Call Over the Whole Signal
+		whole = Decimator(factor).process(tones)
+		streaming = Decimator(factor)
+		edges = np.sort(rng.integers(0, tones.shape[1], 40))
+		pieces = [streaming.process(block) for block in np.split(tones, edges, axis=1)]
+		streamed = np.concatenate(pieces, axis=1)
+		matches = streamed.shape == whole.shape and np.allclose(streamed, whole, rtol=0, atol=1e-12)
+		aligned = np.allclose(streamed[0, -50:], np.sin(2*np.pi*low*streaming.times(50, sample_rate)), atol=1e-3)
+
+		passed = (ripple < 0.01 and rejection >= DECIMATE_ATTEN_DB - 1 and abs(kept - 1) < 1e-3
+				  and aliased < 10**(-(DECIMATE_ATTEN_DB - 1)/20) and matches and aligned)
+		print("Factor {:>2}: {:>4} Taps, Passband Ripple {:.4f} dB, Stopband {:.1f} dB, "
+			  "Tone Kept {:.4f}, Alias {:.1e}, Streaming Matches: {}, Delay Corrected: {} --> {}".format(
+			  factor, len(taps), ripple, rejection, kept, aliased, matches, aligned, "OK" if passed else "FAIL"))
+		ok = ok and passed
+	print("Decimation Verified:", ok)
+	return ok
+
+if __name__ == '__main__':
+	verify()
@@ -0,0 +1,251 @@
+## Accelerometer Multi
+## Synchronized capture from several accelerometer Teensys for Accelerometer_DAQ.py
+##
+## Each device gets its own serial port, StreamReader thread, ring buffer and calibration set.
+## Every reader timestamps its blocks with the same process-wide monotonic clock
+## (time.perf_counter), which is used to estimate when each device's first sample was taken.
+## The calibrated streams are then interpolated onto one shared time grid and written as a
+## single combined table.
+##
+## Run this file directly to benchmark 1, 2, 4 and 8 simulated devices (needs Teensy_Simulator.py
+## and a POSIX pseudo-terminal).
+
+import os
+import sys
+import time
+import numpy as np
+from Accelerometer_Stream import StreamDecoder, RingBuffer, StreamReader, TimingMonitor
+from Accelerometer_Processing import processCapture
+
+##############################################################
+### MULTI-DEVICE SETTINGS ###
+##############################################################
+
+POLL_SEC = 0.05 								# Longest Wait on One Device's Ring Buffer per Pass
+CAPTURE_MARGIN_SEC = 5.0 						# Extra Time Allowed Before a Slow Device Ends the Capture
+GRID_TOLERANCE = 1e-6 							# Fraction of a Sample Period Allowed for Floating-Point Error in combine()
+AXIS_NAMES = ("X", "Y", "Z")
+
+##############################################################
+### DEVICE STREAMS ###
+##############################################################
+
+# One Accelerometer: Open Serial Port, Reader Thread and the Calibration Set it Is Processed With
+#
+# calibration holds "offsets" and "inverse_gains" (3 values each), optionally a 3x3
+# "cross_axis" correction, and may override "zero_enabled", "zero_setting", "noise_enabled"
+# and "noise_margin".
+class DeviceStream:
+	def __init__(self, name, ser, calibration, sample_rate, capacity, sequence=False):
+		self.name = name
+		self.ser = ser
+		self.calibration = calibration
+		self.sample_rate = sample_rate
+		self.ring = RingBuffer(capacity)
+		self.monitor = TimingMonitor(sample_rate)
+		self.reader = StreamReader(ser, self.ring, StreamDecoder(sequence=sequence), self.monitor)
+
+	@property
+	def coefs(self):
+		return tuple(9.81/np.asarray(self.calibration["inverse_gains"], dtype=np.float64))
+
+	# Shared-Clock Time (Seconds After start_time) of This Device's First Sample
+	#
+	# The latest time the first sample can have been taken, from the tightest of the per-block
+	# bounds the timing monitor keeps (see TimingMonitor).
+	def firstSampleTime(self, start_time):
+		return float(self.monitor.first_sample_bound - start_time)
+
+	# Samples Arrived and Were Timed (an Unplugged or Silent Device Has Neither)
+	def recorded(self, raw):
+		return len(raw[self.name]) > 0 and self.monitor.blocks > 0
+
+class MultiCapture:
+	def __init__(self, devices, sample_rate):
+		self.devices = devices					# List of DeviceStream
+		self.sample_rate = sample_rate
+		self.start_time = None
+
+	# Start Every Reader, Collect sample_num Raw Samples per Device; Returns {Name: (N, 3) Array}
+	#
+	# A device that falls behind by more than CAPTURE_MARGIN_SEC ends the capture early, with
+	# fewer samples for that device.
+	def capture(self, sample_num, progress=None):
+		raw = {device.name: np.empty((sample_num, 3)) for device in self.devices}
+		filled = {device.name: 0 for device in self.devices}
+		self.start_time = time.perf_counter()
+		for device in self.devices:
+			device.reader.start()
+		deadline = self.start_time + sample_num/self.sample_rate + CAPTURE_MARGIN_SEC
+		try:
+			while (any(filled[device.name] < sample_num for device in self.devices) and time.perf_counter() < deadline):
+				for device in self.devices:
+					done = filled[device.name]
+					if (done >= sample_num or not device.reader.is_alive()):
+						continue
+					block = device.ring.read(sample_num - done, timeout=POLL_SEC/len(self.devices))
+					raw[device.name][done:done+len(block)] = block
+					filled[device.name] = done + len(block)
+				if (progress is not None):
+					progress(min(filled.values()))
+		finally:
+			for device in self.devices:
+				device.reader.stop()
+		return {name: samples[:filled[name]] for name, samples in raw.items()}
+
+	# Devices That Recorded Nothing (Left Out of calibrate() and combine())
+	def emptyDevices(self, raw):
+		return [device.name for device in self.devices if (not device.recorded(raw))]
+
+	# Calibrate Each Device With its Own Set; Returns {Name: (3, N) Array} for Devices With Samples
+	def calibrate(self, raw, zero_enabled=False, zero_setting=0, noise_enabled=False, noise_margin=0.0):
+		calibrated = {}
+		for device in self.devices:
+			if (not device.recorded(raw)):
+				continue
+			settings = dict(zero_enabled=zero_enabled, zero_setting=zero_setting,
+							noise_enabled=noise_enabled, noise_margin=noise_margin)
+			settings.update({key: device.calibration[key] for key in settings if key in device.calibration})
+			samples = raw[device.name]
+			x, y, z, time_arr = processCapture(samples[:, 0], samples[:, 1], samples[:, 2],
+											   device.calibration["offsets"], device.coefs,
+											   len(samples)/self.sample_rate, cross_axis=device.calibration.get("cross_axis"),
+											   **settings)
+			calibrated[device.name] = np.array((x, y, z))
+		return calibrated
+
+	# Interpolate Every Device Onto One Time Grid Covering the Span All Devices Recorded
+	#
+	# Returns (time_arr, columns, headers, first sample times); time 0 is the latest first
+	# sample, so every device has data at every grid point. Only devices in calibrated are
+	# included, and with none the table has no rows.
+	def combine(self, calibrated):
+		devices = [device for device in self.devices if device.name in calibrated]
+		if (not devices):
+			return np.empty(0), [np.empty(0)], ["Time (s)"], {}
+		starts = {device.name: device.firstSampleTime(self.start_time) for device in devices}
+		begin = max(starts.values())
+		end = min(starts[name] + (data.shape[1] - 1)/self.sample_rate for name, data in calibrated.items())
+		span = (end - begin)*self.sample_rate + GRID_TOLERANCE	# Rounding Must Not Drop the Last Shared Sample
+		grid = begin + np.arange(max(int(np.floor(span)) + 1, 0)) / self.sample_rate
+		columns = [grid - begin]
+		headers = ["Time (s)"]
+		for device in devices:
+			data = calibrated[device.name]
+			device_times = starts[device.name] + np.arange(data.shape[1]) / self.sample_rate
+			for axis, name in enumerate(AXIS_NAMES):
+				columns.append(np.interp(grid, device_times, data[axis]))
+				headers.append("{} {} (m/s^2)".format(device.name, name))
+		return columns[0], columns, headers, starts
+
+	def printSummary(self, raw, starts=None):
+		print("\nDevice Summary:")
+		for device in self.devices:
+			summary = device.monitor.summary()
+			line = "\t{}: {} Samples".format(device.name, len(raw[device.name]))
+			if ("effective_rate_hz" in summary):
+				line += ", {:.1f} Hz Effective".format(summary["effective_rate_hz"])
+			line += ", {} Overrun(s), {} Malformed".format(device.ring.overruns, device.reader.decoder.malformed)
+			if (starts is not None and device.name in starts):
+				line += ", First Sample at {:+.4f} s".format(starts[device.name])
+			elif (not device.recorded(raw)):
+				line += ", Left Out of the Combined Table"
+			if (device.reader.error is not None):
+				line += " (ERROR: " + str(device.reader.error) + ")"
+			print(line)
+
+##############################################################
+### BENCHMARK ###
+##############################################################
+
+BENCHMARK_CALIBRATION = {"offsets": (-1.25, -0.5, 0.125), "inverse_gains": (31.5, 31.75, 31)}
+
+# One Simulator Process per Port File, Returned Once Every Port File Names its Port
+def _startSimulators(port_files, rate):
+	import subprocess
+	simulator_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Teensy_Simulator.py")
+	simulators = [subprocess.Popen([sys.executable, simulator_path, "accelerometer", "--rate", str(rate),
+									"--port-file", port_file], stdout=subprocess.DEVNULL)
+				  for port_file in port_files]
+	while (not all(os.path.exists(port_file) and os.path.getsize(port_file) > 0 for port_file in port_files)):
+		time.sleep(0.05)
+	return simulators
+
+def _stopSimulators(simulators):
+	for simulator in simulators:
+		simulator.terminate()
+		simulator.wait()
+
+# Capture From n Simulated Devices (Each Simulator in its Own Process); Returns Timing Figures
+def _benchmarkDevices(device_num, rate, seconds, directory):
+	import serial
+	port_files = [os.path.join(directory, "device_{}.txt".format(i)) for i in range(device_num)]
+	simulators = _startSimulators(port_files, rate)
+	try:
+		calibration = BENCHMARK_CALIBRATION
+		sample_num = int(rate*seconds)
+		devices = [DeviceStream("dev{}".format(i), serial.Serial(open(port_file).read().strip(), 921600),
+								calibration, rate, sample_num)
+				   for i, port_file in enumerate(port_files)]
+		multi = MultiCapture(devices, rate)
+		cpu_start = time.process_time()
+		raw = multi.capture(sample_num)
+		wall = time.perf_counter() - multi.start_time
+		cpu = time.process_time() - cpu_start
+		start = time.perf_counter()
+		multi.combine(multi.calibrate(raw))
+		combine_sec = time.perf_counter() - start
+		for device in devices:
+			device.ser.close()
+		received = sum(len(samples) for samples in raw.values())
+		reader_cpu = sum(device.reader.cpu_time for device in devices)
+		return wall, received, cpu, reader_cpu, combine_sec
+	finally:
+		_stopSimulators(simulators)
+
+# A Simulated Device Next to a Silent Port (an Unplugged Accelerometer): the Silent One is
+# Reported and Left Out, and the Other Device is Still Calibrated (Zero Setting 0) and Written
+def verifyEmptyDevice(rate=3200, seconds=1.0):
+	import tempfile
+	import serial
+	with tempfile.TemporaryDirectory() as directory:
+		simulators = _startSimulators([os.path.join(directory, "device_0.txt")], rate)
+		master, slave = os.openpty()
+		try:
+			sample_num = int(rate*seconds)
+			devices = [DeviceStream("dev0", serial.Serial(open(os.path.join(directory, "device_0.txt")).read().strip(), 921600),
+									BENCHMARK_CALIBRATION, rate, sample_num),
+					   DeviceStream("silent", serial.Serial(os.ttyname(slave), 921600), BENCHMARK_CALIBRATION, rate, sample_num)]
+			multi = MultiCapture(devices, rate)
+			raw = multi.capture(sample_num)
+			for device in devices:
+				device.ser.close()
+			empty = multi.emptyDevices(raw)
+			time_arr, columns, headers, starts = multi.combine(multi.calibrate(raw, zero_enabled=True, zero_setting=0))
+			multi.printSummary(raw, starts)
+			nothing = multi.combine({})
+		finally:
+			os.close(master)
+			os.close(slave)
+			_stopSimulators(simulators)
+	passed = (empty == ["silent"] and headers == ["Time (s)"] + ["dev0 {} (m/s^2)".format(name) for name in AXIS_NAMES]
+			  and len(time_arr) == len(raw["dev0"]) > 0 and len(nothing[0]) == 0 and nothing[3] == {})
+	print("Silent Device --> Left Out: {}, dev0 Combined: {} of {} Samples, No Devices: {} Rows --> {}".format(
+		  empty, len(time_arr), len(raw["dev0"]), len(nothing[0]), "OK" if passed else "FAIL"))
+	return passed
+
+def benchmark(counts=(1, 2, 4, 8), rate=3200, seconds=5.0):
+	import tempfile
+	print("Multi-Device Benchmark: {} Hz per Device, {:.0f} s Capture".format(rate, seconds))
+	print("{:>8}{:>12}{:>16}{:>18}{:>22}{:>14}".format("Devices", "Wall (s)", "Samples/s", "Process CPU (%)",
+		  "Reader CPU/Device (%)", "Combine (s)"))
+	with tempfile.TemporaryDirectory() as directory:
+		for device_num in counts:
+			wall, received, cpu, reader_cpu, combine_sec = _benchmarkDevices(device_num, rate, seconds, directory)
+			print("{:>8}{:>12.3f}{:>16.0f}{:>18.1f}{:>22.2f}{:>14.3f}".format(device_num, wall, received/wall,
+				  cpu/wall*100, reader_cpu/wall/device_num*100, combine_sec))
+
+if __name__ == '__main__':
+	ok = verifyEmptyDevice()
+	benchmark()
+	sys.exit(0 if ok else 1)
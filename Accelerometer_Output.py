@@ -0,0 +1,221 @@
+## Accelerometer Output
+## Capture writers (xlsx, csv, npy, npz, parquet) for Accelerometer_DAQ.py
+##
+## A spectrum (see Accelerometer_Spectrum.analyze) is saved with the time series: as
+## "Spectrum" and "Peaks" sheets in xlsx, as extra arrays in npz, and for the single-table
+## formats as a "<name>_spectrum" file in the same format plus a "<name>_spectrum.json" summary.
+## The sample rate, when given, is stored with the capture where the format has room for it:
+## a "Sample Rate (Hz)" custom property in xlsx, a "sample_rate" array in npz and "sample_rate"
+## schema metadata in parquet (Accelerometer_Batch.py reads it back).
+##
+## Run this file directly to benchmark every format (seconds and peak RSS) at 1M samples.
+
+import os
+import sys
+import json
+import time
+import numpy as np
+
+##############################################################
+### OUTPUT SETTINGS ###
+##############################################################
+
+COLUMN_HEADERS = ("Time (s)", "X (m/s^2)", "Y (m/s^2)", "Z (m/s^2)")
+EXCEL_MAX_ROWS = 1048576 						# Excel Row Limit per Worksheet (Including Header)
+CSV_FORMAT = "%.10g" 							# Number Format for CSV Output
+SAMPLE_RATE_PROPERTY = "Sample Rate (Hz)" 		# xlsx Custom Property Holding the Sample Rate
+SPECTRUM_HEADERS = ("Frequency (Hz)", "X PSD ((m/s^2)^2/Hz)", "Y PSD ((m/s^2)^2/Hz)", "Z PSD ((m/s^2)^2/Hz)")
+AXIS_NAMES = ("X", "Y", "Z")
+
+##############################################################
+### SPECTRUM TABLES ###
+##############################################################
+
+def _spectrumColumns(spectrum):
+	return (spectrum["freqs"], *spectrum["psd"])
+
+# NaN (No Peak, or an Empty Spectrum) Becomes None: null in JSON, a Blank Cell in xlsx
+def _clean(values):
+	return [None if np.isnan(value) else value for value in values]
+
+# Peaks and Band RMS as Plain Python Values (No Resolution for an Empty Spectrum)
+def _spectrumSummary(spectrum):
+	clean = _clean
+	return {
+		"segments": spectrum["segments"],
+		"resolution_hz": float(spectrum["freqs"][1] - spectrum["freqs"][0]) if (len(spectrum["freqs"]) > 1) else None,
+		"rms": dict(zip(AXIS_NAMES, clean(spectrum["rms"].tolist()))),
+		"peak_freqs": dict(zip(AXIS_NAMES, [clean(row) for row in spectrum["peak_freqs"].tolist()])),
+		"peak_psd": dict(zip(AXIS_NAMES, [clean(row) for row in spectrum["peak_psd"].tolist()])),
+		"bands": [list(band) for band in spectrum["bands"]],
+		"band_rms": dict(zip(AXIS_NAMES, [clean(row) for row in spectrum["band_rms"].tolist()])),
+	}
+
+def _writePeaksSheet(workbook, spectrum, bold_format):
+	peaks_sheet = workbook.add_worksheet("Peaks")
+	peaks_sheet.write_row(0, 0, ("Axis", "Rank", "Frequency (Hz)", "PSD ((m/s^2)^2/Hz)"), bold_format)
+	row = 1
+	for axis, name in enumerate(AXIS_NAMES):
+		for rank, (freq, psd) in enumerate(zip(spectrum["peak_freqs"][axis], spectrum["peak_psd"][axis])):
+			if (not np.isnan(freq)):
+				peaks_sheet.write_row(row, 0, (name, rank+1, freq, psd))
+				row += 1
+	row += 1
+	peaks_sheet.write_row(row, 0, ("Band (Hz)", "X RMS (m/s^2)", "Y RMS (m/s^2)", "Z RMS (m/s^2)"), bold_format)
+	for band, (low, high) in enumerate(spectrum["bands"]):
+		peaks_sheet.write_row(row+band+1, 0, ["{}-{}".format(low, high)] + _clean(spectrum["band_rms"][:, band].tolist()))
+	peaks_sheet.write_row(row+len(spectrum["bands"])+1, 0, ["Total"] + _clean(spectrum["rms"].tolist()))
+
+# Spectrum Next to a Single-Table Capture: "<name>_spectrum.<ext>" (PSD Table) and "<name>_spectrum.json"
+def writeSpectrum(path, spectrum, writer=None):
+	base, extension = os.path.splitext(path)
+	if (writer is not None):
+		writer(base + "_spectrum" + extension, _spectrumColumns(spectrum), headers=SPECTRUM_HEADERS)
+	with open(base + "_spectrum.json", "w") as summary_file:
+		json.dump(_spectrumSummary(spectrum), summary_file, indent=1)
+
+##############################################################
+### WRITERS ###
+##############################################################
+
+# Excel Workbook in Constant-Memory Mode
+#
+# Constant-memory mode flushes each row as soon as the next one starts, so rows are written
+# whole with write_row() (one call per sample instead of four). Captures longer than the
+# Excel row limit continue on "Data (2)", "Data (3)", ... sheets.
+def writeXlsx(path, columns, spectrum=None, headers=COLUMN_HEADERS, sample_rate=None):
+	import xlsxwriter
+	workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+	if (sample_rate is not None):
+		workbook.set_custom_property(SAMPLE_RATE_PROPERTY, float(sample_rate))
+	bold_format = workbook.add_format({'bold': True})
+	rows = np.column_stack(columns)
+	sheet_rows = EXCEL_MAX_ROWS - 1
+	for sheet_num, start in enumerate(range(0, max(len(rows), 1), sheet_rows)):
+		data_sheet = workbook.add_worksheet("Data" if sheet_num == 0 else "Data ({})".format(sheet_num+1))
+		data_sheet.write_row(0, 0, headers, bold_format)
+		write_row = data_sheet.write_row
+		for i, row in enumerate(rows[start:start+sheet_rows].tolist()):
+			write_row(i+1, 0, row)
+	if (spectrum is not None):
+		spectrum_sheet = workbook.add_worksheet("Spectrum")
+		spectrum_sheet.write_row(0, 0, SPECTRUM_HEADERS, bold_format)
+		for i, row in enumerate(np.column_stack(_spectrumColumns(spectrum)).tolist()):
+			spectrum_sheet.write_row(i+1, 0, row)
+		_writePeaksSheet(workbook, spectrum, bold_format)
+	workbook.close()
+
+def writeCsv(path, columns, spectrum=None, headers=COLUMN_HEADERS, sample_rate=None):
+	np.savetxt(path, np.column_stack(columns), delimiter=",", fmt=CSV_FORMAT,
+			   header=",".join(headers), comments="")
+	if (spectrum is not None):
+		writeSpectrum(path, spectrum, writeCsv)
+
+# Single (N, Columns) float64 Array; Column Order Matches the Headers
+def writeNpy(path, columns, spectrum=None, headers=COLUMN_HEADERS, sample_rate=None):
+	np.save(path, np.column_stack(columns))
+	if (spectrum is not None):
+		writeSpectrum(path, spectrum, writeNpy)
+
+# One Array per Column, Named After its Header ("Time (s)" --> "time", "Bracket X (m/s^2)" --> "bracket_x")
+def writeNpz(path, columns, spectrum=None, headers=COLUMN_HEADERS, sample_rate=None):
+	arrays = {header.split(" (")[0].lower().replace(" ", "_"): column for header, column in zip(headers, columns)}
+	if (sample_rate is not None):
+		arrays["sample_rate"] = np.float64(sample_rate)
+	if (spectrum is not None):
+		arrays.update({"spectrum_" + key: np.asarray(value) for key, value in spectrum.items()})
+	np.savez(path, **arrays)
+
+def writeParquet(path, columns, spectrum=None, headers=COLUMN_HEADERS, sample_rate=None):
+	try:
+		import pyarrow
+		import pyarrow.parquet
+	except ImportError:
+		raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+	table = pyarrow.table({name: np.asarray(column) for name, column in zip(headers, columns)})
+	if (sample_rate is not None):
+		table = table.replace_schema_metadata({"sample_rate": repr(float(sample_rate))})
+	pyarrow.parquet.write_table(table, path)
+	if (spectrum is not None):
+		writeSpectrum(path, spectrum, writeParquet)
+
+WRITERS = {
+	"xlsx": writeXlsx,
+	"csv": writeCsv,
+	"npy": writeNpy,
+	"npz": writeNpz,
+	"parquet": writeParquet,
+}
+
+# Write Any Set of Equal-Length Columns to base_path + "." + output_format, Return the Full Path
+def writeTable(base_path, output_format, columns, headers, spectrum=None, sample_rate=None):
+	output_format = output_format.lower().lstrip(".")
+	if (output_format not in WRITERS):
+		raise ValueError("Unknown output format \"" + output_format + "\" (choose from " + ", ".join(WRITERS) + ")")
+	path = base_path + "." + output_format
+	WRITERS[output_format](path, columns, spectrum, headers=headers, sample_rate=sample_rate)
+	return path
+
+# Write a Capture (and Optionally its Spectrum) to base_path + "." + output_format, Return the Full Path
+def writeCapture(base_path, output_format, time_arr, x, y, z, spectrum=None, sample_rate=None):
+	return writeTable(base_path, output_format, (time_arr, x, y, z), COLUMN_HEADERS, spectrum, sample_rate)
+
+##############################################################
+### BENCHMARK ###
+##############################################################
+
+# Original Accelerometer_DAQ.py Workbook Export (Four write() Calls per Sample, In-Memory Sheet)
+def writeXlsxLegacy(path, columns):
+	import xlsxwriter
+	time_arr, x, y, z = columns
+	workbook = xlsxwriter.Workbook(path)
+	data_sheet = workbook.add_worksheet("Data")
+	bold_format = workbook.add_format({'bold': True})
+	for col, header in enumerate(COLUMN_HEADERS):
+		data_sheet.write(0, col, header, bold_format)
+	for i in range(len(time_arr)):
+		data_sheet.write(i+1, 0, time_arr[i])
+		data_sheet.write(i+1, 1, x[i])
+		data_sheet.write(i+1, 2, y[i])
+		data_sheet.write(i+1, 3, z[i])
+	workbook.close()
+
+def _peakRss():
+	try:
+		import resource
+	except ImportError: # Not available on Windows
+		return float("nan")
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+# Runs in a Fresh Process so Each Format Reports its Own Peak RSS
+def _benchmarkFormat(args):
+	output_format, sample_num, directory = args
+	rng = np.random.default_rng(0)
+	columns = (np.arange(sample_num) / 3200, *rng.normal(0.0, 3.0, (3, sample_num)))
+	start = time.perf_counter()
+	try:
+		if (output_format == "xlsx (original)"):
+			writeXlsxLegacy(directory + "/legacy.xlsx", columns)
+		else:
+			writeCapture(directory + "/bench", output_format, *columns)
+	except ImportError as e:
+		return output_format, None, None, str(e)
+	return output_format, time.perf_counter() - start, _peakRss(), ""
+
+def benchmark(sample_num=1000000):
+	import multiprocessing
+	import tempfile
+	print("Output Benchmark: {} Samples".format(sample_num))
+	print("{:<16}{:>12}{:>16}".format("Format", "Seconds", "Peak RSS (MB)"))
+	with tempfile.TemporaryDirectory() as directory:
+		for output_format in ["xlsx (original)"] + list(WRITERS):
+			with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+				name, seconds, rss, error = pool.map(_benchmarkFormat, [(output_format, sample_num, directory)])[0]
+			if (seconds is None):
+				print("{:<16}{:>12}".format(name, "skipped") + "  (" + error + ")")
+			else:
+				print("{:<16}{:>12.3f}{:>16.1f}".format(name, seconds, rss))
+
+if __name__ == '__main__':
+	benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
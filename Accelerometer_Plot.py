@@ -0,0 +1,156 @@
+## Accelerometer Plot
+## Decimated plotting of large captures for Accelerometer_DAQ.py
+##
+## Each axis is reduced to a per-pixel min/max envelope before drawing, and the visible
+## range is reduced again whenever the view is zoomed or panned, so the number of points
+## drawn depends on the plot width rather than on the capture length. Run this file
+## directly to compare time-to-first-plot against plotting every sample.
+
+import time
+import numpy as np
+
+##############################################################
+### PLOT SETTINGS ###
+##############################################################
+
+DEFAULT_BINS = 2000 							# Envelope Bins When the Plot Width is Not Known Yet
+SERIES_STYLE = (("r", "x"), ("g", "y"), ("b", "z"))
+
+##############################################################
+### DECIMATION ###
+##############################################################
+
+# Min/Max Envelope: Two Points (In Time Order) per Bin, So Peaks Survive Decimation
+def minMaxDecimate(t, values, bins):
+	n = len(values)
+	if (n <= 2*bins):
+		return np.asarray(t), np.asarray(values)
+	size = -(-n // bins)
+	usable = (n // size) * size
+	blocks = np.asarray(values[:usable]).reshape(-1, size)
+	low = blocks.argmin(axis=1)
+	high = blocks.argmax(axis=1)
+	base = np.arange(len(blocks)) * size
+	index = np.column_stack((base + np.minimum(low, high), base + np.maximum(low, high))).ravel()
+	if (usable < n):
+		tail = np.asarray(values[usable:])
+		index = np.concatenate((index, usable + np.sort([tail.argmin(), tail.argmax()])))
+	return np.asarray(t)[index], np.asarray(values)[index]
+
+##############################################################
+### MATPLOTLIB BACKEND ###
+##############################################################
+
+# Lines on a Matplotlib Axes That Re-Decimate the Visible Range on Every Zoom or Pan
+class DecimatedPlot:
+	def __init__(self, ax, time_arr, series, styles=SERIES_STYLE):
+		self.ax = ax
+		self.time_arr = time_arr
+		self.series = series
+		self.lines = [ax.plot([], [], color, label=label)[0] for (color, label), values in zip(styles, series)]
+		low = min(np.min(values) for values in series)
+		high = max(np.max(values) for values in series)
+		margin = (high - low)*0.05 or 1.0
+		ax.set_xlim(time_arr[0], time_arr[-1])
+		ax.set_ylim(low - margin, high + margin)
+		ax.set_autoscale_on(False)
+		self.update()
+		ax.callbacks.connect("xlim_changed", self._onXlimChanged)
+
+	def update(self):
+		low, high = self.ax.get_xlim()
+		start = max(np.searchsorted(self.time_arr, low) - 1, 0)
+		stop = np.searchsorted(self.time_arr, high) + 1
+		bins = int(self.ax.bbox.width) or DEFAULT_BINS
+		for line, values in zip(self.lines, self.series):
+			line.set_data(*minMaxDecimate(self.time_arr[start:stop], values[start:stop], bins))
+
+	def _onXlimChanged(self, ax):
+		self.update()
+		ax.figure.canvas.draw_idle()
+
+def _plotMatplotlib(time_arr, series, title, show):
+	import matplotlib.pyplot as plt
+	figure, ax = plt.subplots()
+	plot = DecimatedPlot(ax, time_arr, series)
+	ax.set_title(title)
+	ax.set_xlabel("Time (s)")
+	ax.set_ylabel("Accleration (m/s^2)")
+	ax.legend()
+	if (show):
+		showPlot(plot, "matplotlib")
+	return plot
+
+##############################################################
+### PYQTGRAPH BACKEND ###
+##############################################################
+
+# pyqtgraph Does the Same Peak (Min/Max) Decimation Natively, Clipped to the Visible Range
+def _plotPyqtgraph(time_arr, series, title, show):
+	import pyqtgraph as pg
+	app = pg.mkQApp()
+	widget = pg.PlotWidget(title=title)
+	widget.addLegend()
+	widget.setLabel("bottom", "Time (s)")
+	widget.setLabel("left", "Acceleration (m/s^2)")
+	for values, (color, label) in zip(series, SERIES_STYLE):
+		item = widget.plot(time_arr, values, pen=color, name=label)
+		item.setDownsampling(auto=True, method="peak")
+		item.setClipToView(True)
+	if (show):
+		showPlot(widget, "pyqtgraph")
+	return widget
+
+##############################################################
+### PLOT ENTRY POINT ###
+##############################################################
+
+def plotCapture(time_arr, series, title, backend="matplotlib", show=True):
+	if (backend == "pyqtgraph"):
+		return _plotPyqtgraph(time_arr, series, title, show)
+	if (backend == "matplotlib"):
+		return _plotMatplotlib(time_arr, series, title, show)
+	raise ValueError("Unknown plot backend \"" + backend + "\" (choose matplotlib or pyqtgraph)")
+
+# Show a Plot Built With show=False; Blocks Until the Window is Closed
+def showPlot(plot, backend="matplotlib"):
+	if (backend == "pyqtgraph"):
+		import pyqtgraph as pg
+		plot.show()
+		pg.mkQApp().exec_()
+	else:
+		import matplotlib.pyplot as plt
+		plt.show()
+
+##############################################################
+### BENCHMARK ###
+##############################################################
+
+def benchmark(lengths=(100000, 1000000, 10000000)):
+	import matplotlib
+	matplotlib.use("Agg")
+	import matplotlib.pyplot as plt
+	rng = np.random.default_rng(0)
+	print("{:>12}{:>20}{:>20}".format("Samples", "Decimated (s)", "All Samples (s)"))
+	for sample_num in lengths:
+		time_arr = np.arange(sample_num) / 3200
+		series = rng.normal(0.0, 3.0, (3, sample_num))
+
+		start = time.perf_counter()
+		plotCapture(time_arr, series, "Benchmark", show=False)
+		plt.gcf().canvas.draw()
+		decimated = time.perf_counter() - start
+		plt.close("all")
+
+		full = float("nan")
+		if (sample_num <= 1000000): # Plotting every sample beyond this takes minutes
+			start = time.perf_counter()
+			for values, (color, label) in zip(series, SERIES_STYLE):
+				plt.plot(time_arr, values, color, label=label)
+			plt.gcf().canvas.draw()
+			full = time.perf_counter() - start
+			plt.close("all")
+		print("{:>12}{:>20.3f}{:>20.3f}".format(sample_num, decimated, full))
+
+if __name__ == '__main__':
+	benchmark()
@@ -0,0 +1,369 @@
+## Accelerometer Processing
+## Calibration, zeroing, noise filtering and time axis for Accelerometer_DAQ.py captures
+##
+## Run this file directly to check the output against the original per-sample loop
+## and to time both on a large synthetic capture.
+
+import sys
+import time
+import collections
+import numpy as np
+
+##############################################################
+### PROCESSING SETTINGS ###
+##############################################################
+
+HOLD_CHUNK = 65536 								# Samples Converted per Chunk by the Noise Hold Filter
+TIME_DECIMALS = 4 								# Time Axis Rounding (Matches Original round(..., 4))
+ZERO_WARMUP_SAMPLES = 3200*2 					# Samples Averaged by the "warmup" Online Zero Estimate
+ZERO_EWMA_SAMPLES = 3200*10 					# Time Constant (Samples) of the "ewma" Online Zero Estimate
+ZERO_HISTORY = 4096 							# Latest "ewma" Estimates Kept for the Convergence Report (Blocks)
+ZERO_TOLERANCE = 0.01 							# Online Zero Counts as Converged Within +- this Value (m/s^2)
+
+##############################################################
+### PROCESSING FUNCTIONS ###
+##############################################################
+
+# Zeroing Offsets for Each Row of a (3, N) Raw Array
+def zeroOffsets(raw, offsets, zero_setting):
+	zero = np.zeros(len(raw))
+	# Zeroing while standing still
+	if (zero_setting == 0):
+		zero = np.array([-(row[0] + offset) for row, offset in zip(raw, offsets)])
+	# Zeroing while shaking
+	if (zero_setting == 1):
+		zero = np.array([-(np.average(row) + offset) for row, offset in zip(raw, offsets)])
+	return zero
+
+# Affine Calibration of a (3, N) Raw Array (Same Operation Order as the Original Loop)
+#
+# cross_axis is an optional 3x3 correction (from a calibration profile) applied to the
+# per-axis result, so each output axis can remove what leaks in from the other two.
+def calibrate(raw, offsets, coefs, zero_offsets=None, cross_axis=None):
+	out = raw + np.asarray(offsets, dtype=np.float64)[:, None]
+	if (zero_offsets is not None):
+		out += np.asarray(zero_offsets, dtype=np.float64)[:, None]
+	out *= np.asarray(coefs, dtype=np.float64)[:, None]
+	if (cross_axis is not None):
+		out = np.asarray(cross_axis, dtype=np.float64) @ out
+	return out
+
+# Noise Hold Filter: Each Sample Within +- margin of the Previous Output Repeats the Previous Output
+#
+# The filter is inherently sequential, so it runs as a tight loop over plain Python floats
+# (same IEEE arithmetic as the original loop) one chunk at a time, which keeps NumPy
+# element indexing out of the hot path and bounds the temporary list size.
+def holdFilter(values, margin, chunk=HOLD_CHUNK):
+	out = np.array(values, dtype=np.float64)
+	if (len(out) < 2):
+		return out
+	held = float(out[0])
+	for start in range(0, len(out), chunk):
+		block = out[start:start+chunk].tolist()
+		for i, value in enumerate(block):
+			if (abs(value - held) <= margin):
+				block[i] = held
+			else:
+				held = value
+		out[start:start+chunk] = block
+	return out
+
+# Time Axis Matching round(i/sample_num*sample_time, 4), with time[-1] = sample_time
+def timeAxis(sample_num, sample_time):
+	time_arr = np.arange(sample_num) / sample_num * sample_time
+	if (sample_num == 0):
+		return time_arr
+	rounded = np.round(time_arr, TIME_DECIMALS)
+
+	# np.round can differ from Python's round() only next to a halfway point; redo those exactly
+	scaled = time_arr * 10**TIME_DECIMALS
+	tolerance = 1e-9 + np.abs(scaled)*1e-12
+	for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < tolerance):
+		rounded[i] = round(float(time_arr[i]), TIME_DECIMALS)
+	rounded[-1] = sample_time
+	return rounded
+
+# Full Post-Processing of a Capture: Offsets, Zeroing, Gains, Noise Filter and Time Axis
+def processCapture(x, y, z, offsets, coefs, sample_time, zero_enabled=False, zero_setting=0,
+				   noise_enabled=False, noise_margin=0.0, cross_axis=None):
+	raw = np.vstack((x, y, z)).astype(np.float64)
+	zero_offsets = None
+	if (zero_enabled):
+		zero_offsets = zeroOffsets(raw, offsets, zero_setting)
+	data = calibrate(raw, offsets, coefs, zero_offsets, cross_axis)
+	if (noise_enabled):
+		for axis in range(len(data)):
+			data[axis] = holdFilter(data[axis], noise_margin)
+	return data[0], data[1], data[2], timeAxis(raw.shape[1], sample_time)
+
+##############################################################
+### ONLINE ZEROING ###
+##############################################################
+
+# Running Per-Axis Mean of Raw Readings for Zero Setting 1 Without a Second Pass
+#
+# "warmup" is Welford's mean and variance over the first `window` samples, merged one
+# block at a time (Chan's parallel update), then frozen. "ewma" keeps an exponentially
+# weighted mean and variance with a time constant of `window` samples, so it follows
+# slow drift. For the convergence report, "warmup" records the estimate after every block
+# until it freezes, and "ewma" after every block of the last ZERO_HISTORY, so memory stays
+# bounded however long a stream runs.
+class OnlineZero:
+	def __init__(self, mode="warmup", window=None):
+		if (mode not in ("warmup", "ewma")):
+			raise ValueError("Unknown online zero mode \"" + mode + "\" (choose warmup or ewma)")
+		self.mode = mode
+		self.window = window or (ZERO_WARMUP_SAMPLES if mode == "warmup" else ZERO_EWMA_SAMPLES)
+		self.alpha = 1.0/self.window
+		self.count = 0							# Samples Seen
+		self.used = 0							# Samples in the Estimate ("warmup" Stops at window)
+		self.mean = None
+		self.m2 = None							# Sum of Squared Deviations ("warmup") or Weighted Variance ("ewma")
+		self.history = collections.deque(maxlen=ZERO_HISTORY)	# (Samples Seen, Mean, Standard Error) After Each Block
+
+	# Add a (3, N) Raw Block; Returns the Current Per-Axis Mean
+	def update(self, raw):
+		raw = np.asarray(raw, dtype=np.float64)
+		self.count += raw.shape[1]
+		used = self.used
+		if (self.mode == "warmup"):
+			self._updateWelford(raw[:, :max(self.window - self.used, 0)])
+		else:
+			self._updateEwma(raw)
+		if (self.used > used):					# A Frozen Estimate Adds Nothing New
+			self.history.append((self.count, self.mean.copy(), self.stderr()))
+		return self.mean
+
+	def _updateWelford(self, raw):
+		count = raw.shape[1]
+		if (count == 0):
+			return
+		block_mean = raw.mean(axis=1)
+		block_m2 = ((raw - block_mean[:, None])**2).sum(axis=1)
+		if (self.mean is None):
+			self.mean, self.m2 = block_mean, block_m2
+		else:
+			total = self.used + count
+			delta = block_mean - self.mean
+			self.mean = self.mean + delta*count/total
+			self.m2 = self.m2 + block_m2 + delta**2*self.used*count/total
+		self.used += count
+
+	# Exact Block Form of mean += alpha*(x - mean), With the Matching Weighted Variance
+	def _updateEwma(self, raw):
+		count = raw.shape[1]
+		if (count == 0):
+			return
+		if (self.mean is None): # Start From the First Block's Plain Statistics
+			self.mean, self.m2 = raw.mean(axis=1), raw.var(axis=1)
+			self.used = count
+			return
+		kept = (1.0 - self.alpha)**count		# Weight Left on the Previous Estimate
+		weights = self.alpha*(1.0 - self.alpha)**np.arange(count-1, -1, -1)
+		mean = kept*self.mean + raw @ weights
+		self.m2 = kept*(self.m2 + (self.mean - mean)**2) + ((raw - mean[:, None])**2) @ weights
+		self.mean = mean
+		self.used += count
+
+	# Standard Error of the Mean (Raw Counts); "ewma" Uses its Effective Sample Count
+	def stderr(self):
+		if (self.mode == "warmup"):
+			if (self.used < 2):
+				return np.full(len(self.mean), np.inf)
+			return np.sqrt(self.m2/(self.used - 1)/self.used)
+		return np.sqrt(self.m2*self.alpha/(2.0 - self.alpha))
+
+	# Samples Seen When the Estimate Last Entered (and Then Stayed Within) tolerance of its Final Value
+	# ("ewma": Within the Kept History, so at Most ZERO_HISTORY Blocks Back)
+	def settledAfter(self, tolerance):
+		settled = np.zeros(len(self.mean), dtype=np.int64)
+		was_inside = np.zeros(len(self.mean), dtype=bool)
+		for count, mean, error in self.history:
+			inside = np.abs(mean - self.mean) <= tolerance
+			settled = np.where(inside & ~was_inside, count, settled)
+			was_inside = inside
+		return settled
+
+	def printConvergence(self, coefs, tolerance=ZERO_TOLERANCE):
+		if (self.mean is None):
+			print("Online Zero: No Samples")
+			return
+		coefs = np.asarray(coefs, dtype=np.float64)
+		settled = self.settledAfter(tolerance/coefs)
+		print("Online Zero ({}, {} of {} Samples Used):".format(self.mode, self.used, self.count))
+		for axis, name in enumerate(("X", "Y", "Z")):
+			print("\t{}: Mean {:.4f} Counts, Std Error {:.5f} m/s^2, Within {} m/s^2 After {} Samples".format(
+				  name, self.mean[axis], self.stderr()[axis]*coefs[axis], tolerance, settled[axis]))
+
+##############################################################
+### STREAMING PROCESSOR ###
+##############################################################
+
+# Block-by-Block Version of processCapture for Open-Ended Captures
+#
+# Zeroing offsets come from the first block (its first sample for zero setting 0, its
+# mean for zero setting 1), and the noise filter carries its last output across blocks.
+# With an OnlineZero estimator, zero setting 1 instead uses the running mean up to and
+# including each block.
+class StreamProcessor:
+	def __init__(self, offsets, coefs, sample_rate, zero_enabled=False, zero_setting=0,
+				 noise_enabled=False, noise_margin=0.0, online_zero=None, cross_axis=None):
+		self.offsets = offsets
+		self.coefs = coefs
+		self.sample_rate = sample_rate
+		self.zero_enabled = zero_enabled
+		self.zero_setting = zero_setting
+		self.noise_enabled = noise_enabled
+		self.noise_margin = noise_margin
+		self.online_zero = online_zero if (zero_enabled and zero_setting == 1) else None
+		self.cross_axis = cross_axis
+		self.zero_offsets = None
+		self.last = None						# Last Filtered Output per Axis
+		self.sample_count = 0
+
+	# Process an (N, 3) Raw Block, Return (time_arr, (3, N) Calibrated Data)
+	def process(self, block):
+		raw = np.asarray(block, dtype=np.float64).T
+		count = raw.shape[1]
+		if (count == 0):
+			return np.empty(0), np.empty((3, 0))
+		if (self.online_zero is not None):
+			self.zero_offsets = -(self.online_zero.update(raw) + np.asarray(self.offsets, dtype=np.float64))
+		elif (self.zero_enabled and self.zero_offsets is None):
+			self.zero_offsets = zeroOffsets(raw, self.offsets, self.zero_setting)
+		data = calibrate(raw, self.offsets, self.coefs, self.zero_offsets, self.cross_axis)
+		if (self.noise_enabled):
+			for axis in range(len(data)):
+				if (self.last is None):
+					data[axis] = holdFilter(data[axis], self.noise_margin)
+				else:
+					data[axis] = holdFilter(np.concatenate(([self.last[axis]], data[axis])), self.noise_margin)[1:]
+			self.last = data[:, -1].copy()
+		time_arr = (np.arange(count) + self.sample_count) / self.sample_rate
+		self.sample_count += count
+		return time_arr, data
+
+##############################################################
+### REGRESSION CHECK AND BENCHMARK ###
+##############################################################
+
+# Original Accelerometer_DAQ.py Post-Processing Loop
+def processLegacy(x, y, z, offsets, coefs, sample_time, zero_enabled, zero_setting, noise_enabled, noise_margin):
+	x, y, z = x.copy(), y.copy(), z.copy()
+	sample_num = len(x)
+	time_arr = np.empty(sample_num)
+	x_zero_offset = y_zero_offset = z_zero_offset = 0
+	if (zero_enabled):
+		if (zero_setting == 0):
+			x_zero_offset = -(x[0] + offsets[0])
+			y_zero_offset = -(y[0] + offsets[1])
+			z_zero_offset = -(z[0] + offsets[2])
+		if (zero_setting == 1):
+			x_zero_offset = -(np.average(x) + offsets[0])
+			y_zero_offset = -(np.average(y) + offsets[1])
+			z_zero_offset = -(np.average(z) + offsets[2])
+	for i in range(sample_num):
+		x[i] += offsets[0]
+		y[i] += offsets[1]
+		z[i] += offsets[2]
+		if (zero_enabled):
+			x[i] += x_zero_offset
+			y[i] += y_zero_offset
+			z[i] += z_zero_offset
+		x[i] *= coefs[0]
+		y[i] *= coefs[1]
+		z[i] *= coefs[2]
+		if (noise_enabled and i > 0):
+			if (abs(x[i] - x[i-1]) <= noise_margin):
+				x[i] = x[i-1]
+			if (abs(y[i] - y[i-1]) <= noise_margin):
+				y[i] = y[i-1]
+			if (abs(z[i] - z[i-1]) <= noise_margin):
+				z[i] = z[i-1]
+		time_arr[i] = round(i/sample_num*sample_time, 4)
+	time_arr[-1] = sample_time
+	return x, y, z, time_arr
+
+# Bit-for-Bit Comparison (Also Distinguishes -0.0 from 0.0)
+def _identical(a, b):
+	return a.shape == b.shape and np.array_equal(a.view(np.uint64), b.view(np.uint64))
+
+def verify(sample_num=20000, seed=0):
+	rng = np.random.default_rng(seed)
+	offsets = (-1.25, -0.5, 0.125)
+	coefs = (9.81/31.5, 9.81/31.75, 9.81/31)
+	ok = True
+	for sample_time in (2, 0.7, 13):
+		raw = np.round(rng.normal([0.0, 0.0, 31.0], 3.0, (sample_num, 3)), rng.integers(0, 3)).T.copy()
+		for zero_enabled in (False, True):
+			for zero_setting in (0, 1, 2):
+				for noise_enabled in (False, True):
+					for noise_margin in (0.0, 0.3, 1.0, 5.0):
+						settings = (offsets, coefs, sample_time, zero_enabled, zero_setting, noise_enabled, noise_margin)
+						expected = processLegacy(raw[0], raw[1], raw[2], *settings)
+						result = processCapture(raw[0], raw[1], raw[2], *settings)
+						if not all(_identical(a, b) for a, b in zip(expected, result)):
+							print("MISMATCH:", settings)
+							ok = False
+	print("Processing Matches Original Loop:", ok)
+	return ok
+
+# Online Zeroing Against the Two-Pass Average (Zero Setting 1) on a Drift-Free Capture
+def verifyOnlineZero(sample_num=3200*20, block_size=1600, seed=0):
+	rng = np.random.default_rng(seed)
+	offsets = (-1.25, -0.5, 0.125)
+	coefs = (9.81/31.5, 9.81/31.75, 9.81/31)
+	t = np.arange(sample_num) / 3200
+	raw = (np.array([1.25, 0.5, 31.0])[:, None] + 4.0*np.sin(2*np.pi*120.7*t)
+		   + rng.normal(0.0, 0.75, (3, sample_num)))
+	x, y, z, time_arr = processCapture(raw[0], raw[1], raw[2], offsets, coefs, sample_num/3200,
+									   zero_enabled=True, zero_setting=1)
+	two_pass = np.array((x, y, z))
+	ok = True
+	for mode, window in (("warmup", sample_num), ("warmup", ZERO_WARMUP_SAMPLES), ("ewma", ZERO_EWMA_SAMPLES)):
+		online_zero = OnlineZero(mode, window)
+		processor = StreamProcessor(offsets, coefs, 3200, zero_enabled=True, zero_setting=1, online_zero=online_zero)
+		streamed = np.concatenate([processor.process(raw[:, start:start+block_size].T)[1]
+								   for start in range(0, sample_num, block_size)], axis=1)
+		final_error = np.abs(online_zero.mean - raw.mean(axis=1))
+		last_block = np.abs(streamed[:, -block_size:] - two_pass[:, -block_size:]).max(axis=1)
+		bound = 4*online_zero.stderr()*np.asarray(coefs) + 1e-9
+		passed = bool(np.all(last_block <= bound))
+		if (mode == "warmup" and window == sample_num): # Whole Capture in the Warm-Up: Same Mean as the Two-Pass Average
+			passed = passed and bool(np.all(final_error < 1e-9))
+		print("{} ({} Samples): Final Mean Error {:.2e} Counts, Last Block vs Two-Pass {:.2e} m/s^2 (Bound {:.2e}): {}".format(
+			  mode, window, final_error.max(), last_block.max(), bound.max(), "OK" if passed else "FAIL"))
+		online_zero.printConvergence(coefs)
+		ok = ok and passed
+
+	# Long Streams: the Report History Stops at the Frozen Warm-Up and is Capped for "ewma"
+	for mode, window in (("warmup", 100), ("ewma", 100)):
+		online_zero = OnlineZero(mode, window)
+		for block in range(2*ZERO_HISTORY):
+			online_zero.update(raw[:, block:block+10])
+		expected = -(-window//10) if mode == "warmup" else ZERO_HISTORY
+		passed = len(online_zero.history) == expected
+		print("{} After {} Blocks: {} Estimates Kept (Expected {}): {}".format(mode, 2*ZERO_HISTORY,
+			  len(online_zero.history), expected, "OK" if passed else "FAIL"))
+		ok = ok and passed
+	print("Online Zeroing Matches Two-Pass Zeroing:", ok)
+	return ok
+
+def benchmark(sample_num=3200*600):
+	rng = np.random.default_rng(1)
+	raw = np.round(rng.normal([0.0, 0.0, 31.0], 2.0, (sample_num, 3)), 2).T.copy()
+	settings = ((-1.25, -0.5, 0.125), (9.81/31.5, 9.81/31.75, 9.81/31), sample_num/3200, True, 1, True, 1.0)
+	start = time.perf_counter()
+	processCapture(raw[0], raw[1], raw[2], *settings)
+	elapsed = time.perf_counter() - start
+	print("Vectorized: {} Samples in {:.4f} s ({:.0f} Samples/s)".format(sample_num, elapsed, sample_num/elapsed))
+	legacy_num = min(sample_num, 3200*20)
+	start = time.perf_counter()
+	processLegacy(raw[0][:legacy_num], raw[1][:legacy_num], raw[2][:legacy_num], *settings)
+	elapsed = time.perf_counter() - start
+	print("Original Loop: {} Samples in {:.4f} s ({:.0f} Samples/s)".format(legacy_num, elapsed, legacy_num/elapsed))
+
+if __name__ == '__main__':
+	verify()
+	verifyOnlineZero()
+	benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 3200*600)
@@ -0,0 +1,222 @@
+## Accelerometer Spectrum
+## Vibration frequency content (windowed FFT, Welch PSD, dominant peaks, band RMS) for Accelerometer_DAQ.py
+##
+## All spectra are computed for x, y and z together: data is a (3, N) array and every FFT
+## runs over the last axis in one call. analyze() handles a finished capture; StreamAnalyzer
+## accumulates the same Welch PSD block by block, carrying the overlap between blocks, so a
+## stream and a capture of the same samples give the same PSD. Run this file directly to
+## check both against a synthetic capture with known tones.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+##############################################################
+### SPECTRUM SETTINGS ###
+##############################################################
+
+WELCH_SEGMENT = 4096 							# Welch Segment Length (Samples). 3200 Hz --> 0.78 Hz Resolution
+WELCH_OVERLAP = 0.5 							# Fraction of Each Segment Shared with the Next
+WELCH_CHUNK = 64 								# Segments Transformed per FFT Call (Bounds Memory on Long Captures)
+PEAK_COUNT = 5 									# Dominant Peaks Reported per Axis
+BANDS = ((1, 10), (10, 50), (50, 200), (200, 800), (800, 1600)) # Band RMS Edges (Hz, Low Inclusive)
+AXIS_NAMES = ("X", "Y", "Z")
+
+##############################################################
+### SPECTRAL FUNCTIONS ###
+##############################################################
+
+# Periodic Hann Window (Exact Overlap-Add at 50%, Unlike the Symmetric np.hanning)
+def hannWindow(length):
+	return np.hanning(length + 1)[:-1]
+
+def _step(segment, overlap):
+	return max(1, int(round(segment*(1.0 - overlap))))
+
+# Sum of the Periodograms of Every Full Segment in a (3, N) Array; Returns (Power Sum, Segment Count)
+def _welchSum(data, segment, step, window):
+	data = np.asarray(data, dtype=np.float64)
+	power = np.zeros((len(data), segment//2 + 1))
+	count = (data.shape[1] - segment)//step + 1 if (data.shape[1] >= segment) else 0
+	if (count == 0):
+		return power, 0
+	windows = sliding_window_view(data, segment, axis=-1)[:, ::step][:, :count]
+	for start in range(0, count, WELCH_CHUNK):
+		chunk = windows[:, start:start+WELCH_CHUNK]
+		chunk = (chunk - chunk.mean(axis=-1, keepdims=True))*window
+		power += (np.abs(np.fft.rfft(chunk, axis=-1))**2).sum(axis=1)
+	return power, count
+
+# One-Sided PSD ((m/s^2)^2/Hz) from a Periodogram Sum
+def _scalePsd(power, count, sample_rate, segment, window):
+	psd = power / (max(count, 1)*sample_rate*np.sum(window**2))
+	psd[:, 1:(segment+1)//2] *= 2 # Every Bin but DC (and Nyquist for Even Lengths) Appears Twice in the Full Spectrum
+	return psd
+
+def welchPsd(data, sample_rate, segment=WELCH_SEGMENT, overlap=WELCH_OVERLAP):
+	window = hannWindow(segment)
+	power, count = _welchSum(data, segment, _step(segment, overlap), window)
+	return np.fft.rfftfreq(segment, 1.0/sample_rate), _scalePsd(power, count, sample_rate, segment, window)
+
+# Windowed FFT of the Whole (3, N) Array; Single-Sided Amplitude in m/s^2
+def amplitudeSpectrum(data, sample_rate):
+	data = np.asarray(data, dtype=np.float64)
+	window = hannWindow(data.shape[1])
+	spectrum = np.fft.rfft((data - data.mean(axis=1, keepdims=True))*window, axis=-1)
+	amplitude = 2*np.abs(spectrum)/np.sum(window)
+	amplitude[:, 0] /= 2
+	return np.fft.rfftfreq(data.shape[1], 1.0/sample_rate), amplitude
+
+# Largest Local Maxima per Row (Above DC); Frequencies Refined by Parabolic Interpolation
+#
+# Returns (3, count) frequency and value arrays, padded with NaN when a row has fewer peaks.
+def findPeaks(freqs, values, count=PEAK_COUNT):
+	if (values.shape[1] < 3): # No Bin Has a Neighbour on Both Sides
+		return np.full((len(values), count), np.nan), np.full((len(values), count), np.nan)
+	centre = values[:, 1:-1]
+	is_peak = (centre > values[:, :-2]) & (centre >= values[:, 2:])
+	is_peak[:, 0] = False # Bin 1 Holds Leakage From the Removed Mean and Slow Drift
+	ranked = np.argsort(np.where(is_peak, -centre, np.inf), axis=1)[:, :count]
+	rows = np.arange(len(values))[:, None]
+	index = ranked + 1
+	before, peak, after = values[rows, index-1], values[rows, index], values[rows, index+1]
+	curvature = before - 2*peak + after
+	shift = np.where(curvature != 0, 0.5*(before - after)/np.where(curvature != 0, curvature, 1), 0.0)
+	peak_freqs = freqs[index] + shift*(freqs[1] - freqs[0])
+	found = is_peak[rows, ranked]
+	return np.where(found, peak_freqs, np.nan), np.where(found, peak, np.nan)
+
+# RMS (m/s^2) of Each Row Within Each Band, From the PSD; Returns a (3, len(bands)) Array
+def bandRms(freqs, psd, bands=BANDS):
+	resolution = freqs[1] - freqs[0]
+	masks = np.array([(freqs >= low) & (freqs < high) for low, high in bands])
+	return np.sqrt(psd @ masks.T.astype(np.float64) * resolution)
+
+def _summarize(freqs, psd, segments, bands):
+	peak_freqs, peak_psd = findPeaks(freqs, psd)
+	return {
+		"freqs": freqs,
+		"psd": psd,
+		"segments": segments,
+		"peak_freqs": peak_freqs,
+		"peak_psd": peak_psd,
+		"bands": tuple(bands),
+		"band_rms": bandRms(freqs, psd, bands),
+		"rms": np.sqrt(psd[:, 1:].sum(axis=1)*(freqs[1] - freqs[0])),
+	}
+
+# Result With No Spectrum (No Peaks, NaN RMS), for Captures Too Short to Have One
+def _emptyResult(bands):
+	empty = np.empty((len(AXIS_NAMES), 0))
+	return {
+		"freqs": np.empty(0),
+		"psd": empty,
+		"segments": 0,
+		"peak_freqs": np.full((len(AXIS_NAMES), PEAK_COUNT), np.nan),
+		"peak_psd": np.full((len(AXIS_NAMES), PEAK_COUNT), np.nan),
+		"bands": tuple(bands),
+		"band_rms": np.full((len(AXIS_NAMES), len(bands)), np.nan),
+		"rms": np.full(len(AXIS_NAMES), np.nan),
+		"fft_freqs": np.empty(0),
+		"fft_amplitude": empty,
+	}
+
+##############################################################
+### ONE-SHOT AND STREAMING ANALYSIS ###
+##############################################################
+
+# Full Analysis of a Finished (3, N) Capture
+#
+# Peaks and band RMS come from the Welch PSD (as in streaming mode); the whole-capture
+# windowed FFT is added as fft_freqs/fft_amplitude for finer frequency resolution. Fewer
+# than 3 samples give no spectrum at all (_emptyResult).
+def analyze(data, sample_rate, segment=WELCH_SEGMENT, overlap=WELCH_OVERLAP, bands=BANDS):
+	data = np.asarray(data, dtype=np.float64)
+	if (data.shape[1] < 3):
+		return _emptyResult(bands)
+	segment = min(segment, data.shape[1])
+	freqs, psd = welchPsd(data, sample_rate, segment, overlap)
+	result = _summarize(freqs, psd, (data.shape[1] - segment)//_step(segment, overlap) + 1, bands)
+	result["fft_freqs"], result["fft_amplitude"] = amplitudeSpectrum(data, sample_rate)
+	return result
+
+# Welch PSD Accumulated Over Calibrated (3, N) Blocks of Any Size
+class StreamAnalyzer:
+	def __init__(self, sample_rate, segment=WELCH_SEGMENT, overlap=WELCH_OVERLAP, bands=BANDS):
+		self.sample_rate = sample_rate
+		self.segment = segment
+		self.step = _step(segment, overlap)
+		self.bands = bands
+		self.window = hannWindow(segment)
+		self.freqs = np.fft.rfftfreq(segment, 1.0/sample_rate)
+		self.power = np.zeros((len(AXIS_NAMES), segment//2 + 1))
+		self.segments = 0
+		self.tail = np.empty((len(AXIS_NAMES), 0))	# Samples Not Yet Covered by a Full Segment
+
+	# Add a Block; Returns the Number of New Segments Completed
+	def update(self, data):
+		data = np.concatenate((self.tail, np.asarray(data, dtype=np.float64)), axis=1)
+		power, count = _welchSum(data, self.segment, self.step, self.window)
+		self.power += power
+		self.segments += count
+		self.tail = data[:, count*self.step:]
+		return count
+
+	def psd(self):
+		return _scalePsd(self.power.copy(), self.segments, self.sample_rate, self.segment, self.window)
+
+	def result(self):
+		return _summarize(self.freqs, self.psd(), self.segments, self.bands)
+
+##############################################################
+### REPORT ###
+##############################################################
+
+def printSpectrum(result):
+	if (result["segments"] == 0):
+		print("Spectrum: Not Enough Samples for One Segment")
+		return
+	print("Spectrum ({} Segment(s), {:.2f} Hz Resolution):".format(result["segments"],
+		  result["freqs"][1] - result["freqs"][0]))
+	for axis, name in enumerate(AXIS_NAMES):
+		peaks = ["{:.1f} Hz".format(freq) for freq in result["peak_freqs"][axis] if not np.isnan(freq)]
+		print("  {}: RMS {:.3f} m/s^2, Peaks: {}".format(name, result["rms"][axis], ", ".join(peaks) or "None"))
+	print("  Band RMS (m/s^2):")
+	for band, (low, high) in enumerate(result["bands"]):
+		print("    {:>5}-{:<5} Hz  ".format(low, high)
+			  + "  ".join("{}: {:.3f}".format(name, result["band_rms"][axis][band]) for axis, name in enumerate(AXIS_NAMES)))
+
+##############################################################
+### SELF CHECK ###
+##############################################################
+
+def verify(sample_rate=3200, seconds=20):
+	rng = np.random.default_rng(0)
+	t = np.arange(int(sample_rate*seconds)) / sample_rate
+	tones = ((120.0, 2.0), (35.5, 1.0), (640.0, 0.5))
+	data = np.array([amplitude*np.sin(2*np.pi*freq*t) for freq, amplitude in tones])
+	data += rng.normal(0.0, 0.1, data.shape)
+	result = analyze(data, sample_rate)
+	for axis, (freq, amplitude) in enumerate(tones):
+		peak = result["peak_freqs"][axis][0]
+		fft_peak = result["fft_amplitude"][axis].max()
+		print("{}: Tone {:.1f} Hz / {:.2f} --> Peak {:.2f} Hz, FFT Amplitude {:.3f}, RMS {:.3f} (Expected {:.3f})".format(
+			  AXIS_NAMES[axis], freq, amplitude, peak, fft_peak, result["rms"][axis], np.std(data[axis])))
+		assert abs(peak - freq) < result["freqs"][1]
+		assert abs(fft_peak - amplitude) < 0.02*amplitude
+		assert abs(result["rms"][axis] - np.std(data[axis])) < 0.02*np.std(data[axis])
+
+	stream = StreamAnalyzer(sample_rate)
+	for start in range(0, data.shape[1], 1234): # Blocks Unrelated to the Segment Length
+		stream.update(data[:, start:start+1234])
+	assert stream.segments == result["segments"]
+	assert np.allclose(stream.psd(), result["psd"], rtol=1e-9, atol=0)
+	print("Streaming PSD Matches One-Shot PSD ({} Segments)".format(stream.segments))
+	printSpectrum(stream.result())
+
+	for length in (0, 1, 2, 3):
+		short = analyze(data[:, :length], sample_rate)
+		assert np.isnan(short["peak_freqs"]).all() and (length == 3 or np.isnan(short["band_rms"]).all())
+	print("Captures of 0-3 Samples --> No Peaks")
+
+if __name__ == '__main__':
+	verify()
@@ -0,0 +1,147 @@
+## Accelerometer Capture Store
+## Memory-mapped on-disk store for raw accelerometer samples
+##
+## File layout:
+##   bytes 0-7      magic (b"ACCSTORE")
+##   bytes 8-15     flushed sample count (uint64, little endian)
+##   bytes 16-19    metadata length (uint32, little endian)
+##   bytes 20-...   metadata (JSON: sample rate, calibration constants, ...)
+##   HEADER_SIZE-   raw samples, (capacity, 3) float64 rows of x, y, z
+##
+## The sample count is only advanced after the samples it covers have been flushed, so a
+## store left behind by a crash or a disconnect reopens at the last flushed sample.
+
+import os
+import json
+import numpy as np
+from Accelerometer_Processing import calibrate
+
+##############################################################
+### STORE SETTINGS ###
+##############################################################
+
+STORE_MAGIC = b"ACCSTORE"
+HEADER_SIZE = 4096 								# Bytes Reserved for the Header (Metadata Must Fit)
+GROWTH_SAMPLES = 3200*60 						# Minimum Samples Added Each Time the File Grows
+SAMPLE_DTYPE = np.dtype("<f8")
+AXES = 3
+
+##############################################################
+### CAPTURE STORE ###
+##############################################################
+
+class CaptureStore:
+	def __init__(self, path, mode, count, metadata):
+		self.path = path
+		self.mode = mode
+		self.count = count						# Samples Appended (Flushed or Not)
+		self.flushed = count					# Samples Recorded in the Header
+		self.metadata = metadata
+		self._header = np.memmap(path, dtype="<u8", mode=mode, offset=8, shape=(1,))
+		self._mapData()
+
+	# Create a New Store, Preallocating capacity Samples
+	@classmethod
+	def create(cls, path, sample_rate, metadata=None, capacity=GROWTH_SAMPLES):
+		metadata = dict(metadata or {})
+		metadata["sample_rate"] = sample_rate
+		encoded = json.dumps(metadata).encode()
+		if (20 + len(encoded) > HEADER_SIZE):
+			raise ValueError("Capture store metadata does not fit in the header")
+		with open(path, "wb") as store_file:
+			store_file.write(STORE_MAGIC)
+			store_file.write(np.array([0], dtype="<u8").tobytes())
+			store_file.write(np.array([len(encoded)], dtype="<u4").tobytes())
+			store_file.write(encoded)
+			store_file.truncate(HEADER_SIZE + max(capacity, 1)*AXES*SAMPLE_DTYPE.itemsize)
+		return cls(path, "r+", 0, metadata)
+
+	# Open an Existing Store ("r" for Analysis, "r+" to Keep Appending)
+	@classmethod
+	def open(cls, path, mode="r"):
+		with open(path, "rb") as store_file:
+			header = store_file.read(20)
+			if (header[:8] != STORE_MAGIC):
+				raise ValueError(path + " is not a capture store")
+			count = int(np.frombuffer(header, dtype="<u8", count=1, offset=8)[0])
+			length = int(np.frombuffer(header, dtype="<u4", count=1, offset=16)[0])
+			metadata = json.loads(store_file.read(length).decode())
+		return cls(path, mode, count, metadata)
+
+	def _mapData(self):
+		capacity = (os.path.getsize(self.path) - HEADER_SIZE) // (AXES*SAMPLE_DTYPE.itemsize)
+		self._data = np.memmap(self.path, dtype=SAMPLE_DTYPE, mode=self.mode, offset=HEADER_SIZE,
+							   shape=(capacity, AXES))
+
+	def __len__(self):
+		return self.count
+
+	@property
+	def capacity(self):
+		return len(self._data)
+
+	@property
+	def sample_rate(self):
+		return self.metadata["sample_rate"]
+
+	# Raw Samples as an (N, 3) Memory-Mapped View (Slicing Reads Only the Pages Touched)
+	@property
+	def samples(self):
+		return self._data[:self.count]
+
+	@property
+	def x(self):
+		return self._data[:self.count, 0]
+
+	@property
+	def y(self):
+		return self._data[:self.count, 1]
+
+	@property
+	def z(self):
+		return self._data[:self.count, 2]
+
+	# Time Axis (Seconds) for Samples start..stop
+	def time(self, start=0, stop=None):
+		stop = self.count if stop is None else min(stop, self.count)
+		return np.arange(start, stop) / self.sample_rate
+
+	# Calibrated (3, N) Data for Samples start..stop, Using the Calibration Constants in the Metadata
+	def calibrated(self, start=0, stop=None):
+		stop = self.count if stop is None else min(stop, self.count)
+		return calibrate(self._data[start:stop].T, self.metadata["offsets"], self.metadata["coefs"],
+						 cross_axis=self.metadata.get("cross_axis"))
+
+	# Append an (N, 3) Block of Raw Samples, Growing the File When Needed
+	def append(self, block):
+		block = np.asarray(block, dtype=SAMPLE_DTYPE)
+		needed = self.count + len(block)
+		if (needed > self.capacity):
+			self._data.flush()
+			del self._data
+			with open(self.path, "r+b") as store_file:
+				store_file.truncate(HEADER_SIZE + max(needed, self.count + GROWTH_SAMPLES)*AXES*SAMPLE_DTYPE.itemsize)
+			self._mapData()
+		self._data[self.count:needed] = block
+		self.count = needed
+
+	# Write Appended Samples to Disk, Then Record the New Count in the Header
+	def flush(self):
+		if (self.count == self.flushed):
+			return
+		self._data.flush()
+		self._header[0] = self.count
+		self._header.flush()
+		self.flushed = self.count
+
+	def close(self):
+		if (self.mode != "r"):
+			self.flush()
+		del self._data
+		del self._header
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
@@ -0,0 +1,416 @@
+## Accelerometer Stream Decoder
+## Bulk decoding of the Teensy "<x>y<y>z<z>" serial stream used by Accelerometer_DAQ.py
+##
+## Run this file directly to benchmark the decoder against the per-line readline() loop.
+
+import sys
+import time
+import threading
+import numpy as np
+
+##############################################################
+### DECODER SETTINGS ###
+##############################################################
+
+MALFORMED_HISTORY = 10 							# Number of Malformed Lines Kept for Diagnostics
+READER_TIMEOUT_SEC = 0.1 						# Serial Read Timeout for the Background Reader (Lets it Notice a Stop Request)
+
+## Timing Monitor
+GAP_SEC = 0.05 									# Silence Longer Than This (and Longer Than 5 Block Intervals) is a Gap
+BURST_FACTOR = 2.0 								# Blocks Arriving Faster Than This x Nominal Rate are Bursts (Backlog)
+INTERVAL_SMOOTHING = 0.05 						# Weight of Each New Interval in the Typical Block Interval
+
+##############################################################
+### STREAM DECODER ###
+##############################################################
+
+# Lines are "<x>y<y>z<z>", or "<x>y<y>z<z>n<count>" When the Firmware Sends a Sequence Counter
+class StreamDecoder:
+	def __init__(self, skip_partial=True, sequence=False):
+		self.pending = bytearray()				# Bytes Received After the Last Complete Line
+		self.skip_partial = skip_partial		# Drop Everything Before the First Newline (Partial Line)
+		self.separators = b"yzn" if sequence else b"yz"
+		self.fields = len(self.separators) + 1
+		self.translation = bytes.maketrans(self.separators + b"\r", b" "*(self.fields))
+		self.empty = np.empty((0, self.fields))
+		self.bytes_read = 0
+		self.lines_parsed = 0
+		self.malformed = 0
+		self.malformed_lines = []
+
+	# Read Everything Waiting on the Serial Port, Return Complete Samples as an (N, fields) Array
+	def read(self, ser):
+		return self.feed(self.receive(ser))
+
+	# Raw Bytes Waiting on the Serial Port (Blocks for at Least One); Lets Callers Time Reading and Parsing Apart
+	@staticmethod
+	def receive(ser):
+		waiting = ser.in_waiting
+		return ser.read(waiting if waiting > 0 else 1)
+
+	# Append Raw Bytes, Return Complete Samples as an (N, fields) Array (Columns: x, y, z[, count])
+	def feed(self, data):
+		self.bytes_read += len(data)
+		self.pending += data
+		if (self.skip_partial):
+			first = self.pending.find(b"\n")
+			if (first < 0):
+				return self.empty
+			del self.pending[:first+1]
+			self.skip_partial = False
+
+		# Records Split Across Reads Stay in the Pending Buffer Until Their Newline Arrives
+		last = self.pending.rfind(b"\n")
+		if (last < 0):
+			return self.empty
+		block = bytes(self.pending[:last+1])
+		del self.pending[:last+1]
+		return self.decodeBlock(block)
+
+	# Decode a Block of Complete Lines
+	def decodeBlock(self, block):
+		samples = self._decodeFast(block)
+		if (samples is None):
+			samples = self._decodeSlow(block)
+		self.lines_parsed += len(samples)
+		return samples
+
+	# Whole-Block Path: Validate Field Order with Vectorized Index Checks, Convert in One Call
+	def _decodeFast(self, block):
+		raw = np.frombuffer(block, dtype=np.uint8)
+		newlines = np.flatnonzero(raw == 10)
+		n = len(newlines)
+		if (n == 0):
+			return None
+		previous = np.empty(n, dtype=newlines.dtype)
+		previous[0] = -1
+		previous[1:] = newlines[:-1]
+		for separator in self.separators:
+			index = np.flatnonzero(raw == separator)
+			if (len(index) != n or not np.all(previous < index)):
+				return None
+			previous = index
+		if not np.all(previous < newlines):
+			return None
+		try:
+			values = np.array(block.translate(self.translation).split()).astype(np.float64)
+		except ValueError:
+			return None
+		if (values.size != self.fields*n):
+			return None
+		return values.reshape(n, self.fields)
+
+	# Line-by-Line Path: Used Only When a Block Contains Malformed or Empty Lines
+	def _decodeSlow(self, block):
+		rows = []
+		for line in block.split(b"\n"):
+			line = line.strip()
+			if (not line):
+				continue
+			try:
+				row = []
+				start = 0
+				for separator in self.separators:
+					index = line.index(separator, start)
+					row.append(float(line[start:index]))
+					start = index + 1
+				row.append(float(line[start:]))
+				rows.append(row)
+			except ValueError:
+				self.malformed += 1
+				self.malformed_lines.append(line)
+				del self.malformed_lines[:-MALFORMED_HISTORY]
+		if (len(rows) == 0):
+			return self.empty
+		return np.array(rows, dtype=np.float64)
+
+##############################################################
+### TIMING MONITOR ###
+##############################################################
+
+# Host Receive Timing per Block: Effective Sample Rate, Gaps, Bursts and Sequence Checks
+#
+# record() only updates a few running figures per block (first and last block, gap and burst
+# tallies, schedule extremes), so it costs the same whether a block holds one sample or
+# thousands, and memory and summary() stay the same however long a stream runs. A gap is an
+# interval longer than GAP_SEC and 5x the typical interval (a running average of the intervals
+# that were not gaps).
+#
+# first_sample_bound is the latest time the first sample can have been taken: a sample is
+# never received before it is taken, so every block bounds it from above by (receive time -
+# samples before the block's last one / rate), and the tightest bound is the block that
+# crossed USB with the least delay.
+class TimingMonitor:
+	def __init__(self, sample_rate):
+		self.sample_rate = sample_rate
+		self.total = 0
+		self.blocks = 0
+		self.first_time = None					# Receive Time of the First Block (perf_counter Seconds)
+		self.first_count = 0					# Samples in the First Block (Taken Before its Receive Time)
+		self.last_time = None
+		self.first_sample_bound = None
+		self.typical_interval = None			# Running Average of the Block Intervals That Were Not Gaps
+		self.gaps = 0
+		self.longest_gap = 0.0
+		self.bursts = 0
+		self.schedule = 0.0						# Receive Time Minus Nominal Schedule at the Latest Block
+		self.schedule_min = 0.0
+		self.schedule_max = 0.0
+		self.last_sequence = None
+		self.sequence_missing = 0				# Samples Skipped According to the Sequence Counter
+		self.sequence_gaps = 0
+		self.sequence_resets = 0
+
+	# Record a Decoded Block (A 4th Column is Treated as the Sequence Counter)
+	def record(self, block, timestamp=None):
+		if (len(block) == 0):
+			return
+		now = time.perf_counter() if timestamp is None else timestamp
+		self.total += len(block)
+		bound = now - (self.total - 1)/self.sample_rate
+		self.first_sample_bound = bound if (self.first_sample_bound is None) else min(self.first_sample_bound, bound)
+		if (self.first_time is None):
+			self.first_time = now
+			self.first_count = len(block)
+		else:
+			self._recordInterval(now - self.last_time, len(block))
+			self.schedule = (now - self.first_time) - (self.total - self.first_count)/self.sample_rate
+			self.schedule_min = min(self.schedule_min, self.schedule)
+			self.schedule_max = max(self.schedule_max, self.schedule)
+		self.last_time = now
+		self.blocks += 1
+		if (block.shape[1] > 3):
+			self._checkSequence(block[:, 3])
+
+	def _recordInterval(self, interval, received):
+		if (self.typical_interval is not None and interval > max(GAP_SEC, 5*self.typical_interval)):
+			self.gaps += 1
+			self.longest_gap = max(self.longest_gap, interval)
+		elif (self.typical_interval is None):
+			self.typical_interval = interval
+		else:
+			self.typical_interval += INTERVAL_SMOOTHING*(interval - self.typical_interval)
+		if (received > BURST_FACTOR*self.sample_rate*interval + 1):
+			self.bursts += 1
+
+	def _checkSequence(self, sequence):
+		sequence = sequence.astype(np.int64)
+		if (self.last_sequence is not None):
+			sequence = np.concatenate(([self.last_sequence], sequence))
+		steps = np.diff(sequence)
+		skipped = steps[steps > 1]
+		self.sequence_missing += int(np.sum(skipped - 1))
+		self.sequence_gaps += len(skipped)
+		self.sequence_resets += int(np.count_nonzero(steps < 1))
+		self.last_sequence = int(sequence[-1])
+
+	def summary(self):
+		result = {
+			"samples": self.total,
+			"blocks": self.blocks,
+			"nominal_rate_hz": self.sample_rate,
+			"sequence_missing": self.sequence_missing,
+			"sequence_gaps": self.sequence_gaps,
+			"sequence_resets": self.sequence_resets,
+		}
+		if (self.blocks < 2 or self.last_time <= self.first_time):
+			return result
+
+		# Rate Over the Receive Window (The First Block's Samples Arrived Before its Timestamp)
+		duration = self.last_time - self.first_time
+		effective_rate = (self.total - self.first_count) / duration
+		result.update({
+			"duration_sec": float(duration),
+			"effective_rate_hz": float(effective_rate),
+			"rate_error_pct": float((effective_rate/self.sample_rate - 1)*100),
+			"expected_samples": int(round(duration*self.sample_rate)) + self.first_count,
+			"gaps": self.gaps,
+			"longest_gap_sec": float(self.longest_gap),
+			"bursts": self.bursts,
+			# Receive Time Minus Nominal Schedule: Grows with Dropped Samples or Clock Drift
+			"drift_sec": float(self.schedule),
+			"max_backlog_sec": float(self.schedule_max - self.schedule_min),
+		})
+		return result
+
+	def printSummary(self):
+		result = self.summary()
+		print("\nTiming Summary:")
+		print("\tSamples Received:", result["samples"], "in", result["blocks"], "block(s)")
+		if ("effective_rate_hz" in result):
+			print("\tEffective Sample Rate: {:.1f} Hz (Nominal {} Hz, {:+.2f}%)".format(
+				  result["effective_rate_hz"], self.sample_rate, result["rate_error_pct"]))
+			print("\tExpected Samples at Nominal Rate: {}".format(result["expected_samples"]))
+			print("\tGaps: {} (Longest {:.3f} s), Bursts: {}".format(
+				  result["gaps"], result["longest_gap_sec"], result["bursts"]))
+			print("\tTiming Drift: {:+.4f} s at End of Run, {:.4f} s Max Backlog".format(
+				  result["drift_sec"], result["max_backlog_sec"]))
+		if (self.last_sequence is not None):
+			print("\tSequence Counter: {} Sample(s) Missing in {} Gap(s), {} Reset(s)".format(
+				  self.sequence_missing, self.sequence_gaps, self.sequence_resets))
+		return result
+
+##############################################################
+### RING BUFFER ###
+##############################################################
+
+# Fixed-Size (capacity, width) Sample Buffer Shared Between One Writer and One Reader Thread
+class RingBuffer:
+	def __init__(self, capacity, width=3):
+		self.data = np.empty((capacity, width))
+		self.capacity = capacity
+		self.written = 0						# Total Samples Accepted
+		self.consumed = 0						# Total Samples Handed to the Consumer
+		self.overruns = 0						# Samples Dropped Because the Buffer Was Full
+		self.lock = threading.Lock()
+		self.available = threading.Condition(self.lock)
+
+	def __len__(self):
+		with self.lock:
+			return self.written - self.consumed
+
+	# Copy Samples In; Anything That Does Not Fit is Dropped and Counted as Overrun
+	def write(self, samples):
+		with self.lock:
+			free = self.capacity - (self.written - self.consumed)
+			if (len(samples) > free):
+				self.overruns += len(samples) - free
+				samples = samples[:free]
+			count = len(samples)
+			start = self.written % self.capacity
+			first = min(count, self.capacity - start)
+			self.data[start:start+first] = samples[:first]
+			self.data[:count-first] = samples[first:]
+			self.written += count
+			self.available.notify()
+		return count
+
+	# Copy Up to max_count Samples Out, Waiting Up to timeout Seconds for at Least min_count
+	def read(self, max_count=None, min_count=1, timeout=None):
+		with self.available:
+			self.available.wait_for(lambda: self.written - self.consumed >= min_count, timeout)
+			count = self.written - self.consumed
+			if (max_count is not None):
+				count = min(count, max_count)
+			start = self.consumed % self.capacity
+			first = min(count, self.capacity - start)
+			out = np.empty((count, self.data.shape[1]))
+			out[:first] = self.data[start:start+first]
+			out[first:] = self.data[:count-first]
+			self.consumed += count
+		return out
+
+##############################################################
+### BACKGROUND READER ###
+##############################################################
+
+# Thread Draining the Serial Port Through a StreamDecoder into a RingBuffer
+class StreamReader(threading.Thread):
+	def __init__(self, ser, ring, decoder=None, monitor=None, read_timeout=READER_TIMEOUT_SEC):
+		super(StreamReader, self).__init__(daemon=True)
+		self.ser = ser
+		self.ring = ring
+		self.decoder = decoder if decoder is not None else StreamDecoder()
+		self.monitor = monitor
+		self.read_timeout = read_timeout
+		self.stop_event = threading.Event()
+		self.error = None
+		self.cpu_time = 0.0						# CPU Seconds Used by This Thread (Set When it Exits)
+
+	def run(self):
+		start = time.thread_time()
+		self.ser.timeout = self.read_timeout
+		while (not self.stop_event.is_set()):
+			try:
+				block = self.decoder.read(self.ser)
+			except Exception as e: # Teensy disconnected or port closed
+				self.error = e
+				break
+			if (len(block) > 0):
+				if (self.monitor is not None):
+					self.monitor.record(block)
+				self.ring.write(block[:, :3])
+		self.cpu_time = time.thread_time() - start
+
+	def stop(self):
+		self.stop_event.set()
+		self.join()
+
+##############################################################
+### BENCHMARK ###
+##############################################################
+
+# Generate Synthetic Teensy Output (ADC-Like Readings with Two Decimals)
+def syntheticStream(sample_num, seed=0):
+	rng = np.random.default_rng(seed)
+	readings = np.round(rng.normal([0.0, 0.0, 31.0], 2.0, (sample_num, 3)), 2)
+	lines = ["{}y{}z{}\r\n".format(*row) for row in readings.tolist()]
+	return "".join(lines).encode(), readings
+
+# Stand-In for serial.Serial Replaying a Byte String in Driver-Sized Chunks
+class ReplaySerial:
+	def __init__(self, data, chunk_size=4096):
+		self.data = data
+		self.position = 0
+		self.chunk_size = chunk_size
+
+	@property
+	def in_waiting(self):
+		return min(self.chunk_size, len(self.data) - self.position)
+
+	def read(self, size=1):
+		out = self.data[self.position:self.position+size]
+		self.position += len(out)
+		return out
+
+	def readline(self):
+		end = self.data.find(b"\n", self.position)
+		end = len(self.data) if end < 0 else end+1
+		out = self.data[self.position:end]
+		self.position = end
+		return out
+
+# Original Accelerometer_DAQ.py Read Loop
+def readLegacy(ser, sample_num):
+	x = np.empty(sample_num)
+	y = np.empty(sample_num)
+	z = np.empty(sample_num)
+	for i in range(sample_num):
+		incoming_str = ser.readline().decode()
+		index_y = incoming_str.index("y")
+		index_z = incoming_str.index("z")
+		x[i] = float(incoming_str[:index_y])
+		y[i] = float(incoming_str[index_y+1:index_z])
+		z[i] = float(incoming_str[index_z+1:])
+	return np.column_stack((x, y, z))
+
+def readBulk(ser, sample_num):
+	decoder = StreamDecoder(skip_partial=False)
+	samples = np.empty((sample_num, 3))
+	i = 0
+	while (i < sample_num):
+		block = decoder.read(ser)
+		count = min(len(block), sample_num - i)
+		samples[i:i+count] = block[:count]
+		i += count
+	return samples
+
+def benchmark(sample_num=3200*60, chunk_size=4096):
+	data, readings = syntheticStream(sample_num)
+	print("Synthetic Stream: {} Samples, {} Bytes, {} Byte Reads".format(sample_num, len(data), chunk_size))
+
+	start = time.perf_counter()
+	legacy = readLegacy(ReplaySerial(data, chunk_size), sample_num)
+	legacy_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	bulk = readBulk(ReplaySerial(data, chunk_size), sample_num)
+	bulk_time = time.perf_counter() - start
+
+	print("Per-Line Loop: {:.4f} s ({:.0f} Samples/s)".format(legacy_time, sample_num/legacy_time))
+	print("Bulk Decoder:  {:.4f} s ({:.0f} Samples/s)".format(bulk_time, sample_num/bulk_time))
+	print("Speedup: {:.1f}x".format(legacy_time/bulk_time))
+	print("Outputs Match:", np.array_equal(legacy, bulk) and np.array_equal(bulk, readings))
+
+if __name__ == '__main__':
+	benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 3200*60)
@@ -5,21 +5,22 @@
 ###########################################################################################################
 
 import sys
-import serial
-import serial.tools.list_ports
-import scipy
-import pandas as pd
-import numpy as np
 import time
-import cv2
-import traceback
+import threading
+import multiprocessing
+from Teensy_Connection import connectTeensy, commandHandshake
+from Run_Report import RunReport
+from Waveform_Encoder import encodeWaveforms, sheetColumns
+from Waveform_Cache import fileHash, sheetHash, cacheSettings, emptyCache, loadCache, cacheEntry, saveCache
+from Waveform_Loader import loadWorkbook
+from Teensy_Writer import CommandWriter
+from Teensy_Reader import LineReader
 
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-from pyqtgraph import PlotWidget, plot
-import pyqtgraph as pg
+#pandas is imported when loadWaveforms() reads the workbook (Waveform_Loader), so the splash window appears first
 
 ###########################################################################################################
 ### GLOBAL CONFIGURATION ###
@@ -56,196 +57,67 @@ EMPTY_WAVEFORM = "0c05000.500.50p010.505050f050050050a0.000.000.001000w0000ff000
 VERIFY_WAVEFORM = "1c01800.50" + EMPTY_WAVEFORM[10:]
 CONNECT_WAVEFORM = "2" + EMPTY_WAVEFORM[1:10]
 
+REPORT_ENABLED = False #Time waveform parsing and Teensy writes; saved to REPORT_FILE_NAME on exit
+REPORT_FILE_NAME = "driver_run_report.json"
+REPORT = RunReport("Driver_GUI", enabled=REPORT_ENABLED)
+
+WAVEFORM_CACHE_ENABLED = True #Reuse the waveform strings of an unchanged workbook instead of parsing it again
+WAVEFORM_CACHE_FILE_NAME = "waveform_cache.json"
+WAVEFORM_LOAD_WORKERS = 4 #Sheets of the workbook read at once (worker processes)
+
 ###########################################################################################################
 ### TEENSY CONNECTION ###
 ###########################################################################################################
-MANUAL_ATTEMPT = True
-TEENSY_CONNECTED = False
-TEENSY_SERIAL_PORT = ""
 TEENSY_BAUD_RATE = 9600
-try:
-	TEENSY_SERIAL_PORT = open("COM_PORT.txt").readline()
-except:
-	TEENSY_SERIAL_PORT = "<NO PORT SELECTED>"
-	print("COM_PORT.txt file not found --> No serial port will be selected.")
-	MANUAL_ATTEMPT = False
-
-try: # Manual Connection
-	if (not MANUAL_ATTEMPT or TEENSY_SERIAL_PORT == ""): # Intentionally send an error if manual attempt skipped
-		teensy = serial.Serial(
-			port="ERROR",
-			baudrate="ERROR"
-		)
-	print("Attempting manual connection to serial port " + TEENSY_SERIAL_PORT + "...")
-	teensy = serial.Serial(
-		port=TEENSY_SERIAL_PORT,
-		baudrate=TEENSY_BAUD_RATE
-	)
-	teensy.write(EMPTY_WAVEFORM.encode())
-	teensy.flush()
-	TEENSY_CONNECTED = True
-	print("Successfully connected to serial device at " + TEENSY_SERIAL_PORT + ".")
-except: # Automatic Connection
-	if (not MANUAL_ATTEMPT or TEENSY_SERIAL_PORT == ""):
-		print("No serial port selected. Ignoring manual connection attempt.")
-	else:
-		print("Manual connection attempt failed.")
-	print("\nAttempting automatic connection...")
-	myports = [tuple(p) for p in list(serial.tools.list_ports.comports())]
-	if (len(myports) == 0):
-		print("No serial ports detected.")
-		print("Automatic connection attempt failed.")
-	else:
-		print(str(len(myports)) + " serial port(s) detected:")
-		for port in myports:
-			print("\t", port)
-		port_index = 0
-		for port in myports:
-			print("\nAttempting connection to " + port[1] + "...")
-			port_index += 1
-			try:
-				teensy = serial.Serial(
-					port=port[0],
-					baudrate=TEENSY_BAUD_RATE
-				) # Send data to device and read back teensy confirmation message
-				print("Sending message: " + CONNECT_WAVEFORM)
-				teensy.write(CONNECT_WAVEFORM.encode())
-				teensy.flush()
-				line = teensy.readline().decode().rstrip() # This will be the CONNECT_WAVEFORM string
-				line = teensy.readline().decode().rstrip() # This will be the actual return message, so this is called twice
-				print("Received message: " + line)
-				if (line == "TEENSY CONNECTION CONFIRM" or line.__contains__("Initialization Complete")):
-					TEENSY_CONNECTED = True
-					print("Connection to " + port[1] + " succeeded.")
-					break
-				else:
-					print("Connection to " + port[1] + " failed.")
-					if (port_index >= len(myports)-1):
-						print("Automatic connection attempts failed.")
-			except:
-				print("Connection to " + port[1] + " failed.")
-				if (port_index >= len(myports)-1):
-					print("Automatic connection attempts failed.")
+teensy = None
+TEENSY_SERIAL_PORT = ""
+TEENSY_CONNECTED = False
+WRITER = None
+WRITER_SIGNALS = None
+READER = None
+READER_SIGNALS = None
+
+#Results of the writer thread, delivered to the GUI thread
+class WriterSignals(QObject):
+	written = pyqtSignal(str, float) #command, seconds from teensy_gui_write to flush
+	failed = pyqtSignal(str, str) #command, error
+
+#Lines from the reader thread, delivered to the GUI thread
+class ReaderSignals(QObject):
+	lines = pyqtSignal(list) #[(receive time, line), ...]
+	failed = pyqtSignal(str) #error
+
+#Startup: connect to the driver Teensy and pause any running waveform
+def connectDriver():
+	global teensy, TEENSY_SERIAL_PORT, TEENSY_CONNECTED, WRITER, WRITER_SIGNALS, READER, READER_SIGNALS
+	with REPORT.stage("connect"):
+		teensy, TEENSY_SERIAL_PORT = connectTeensy("COM_PORT.txt", TEENSY_BAUD_RATE,
+												   commandHandshake(CONNECT_WAVEFORM, ("TEENSY CONNECTION CONFIRM", "Initialization Complete")))
+	TEENSY_CONNECTED = (teensy is not None)
+	if (TEENSY_CONNECTED):
+		teensy.write(EMPTY_WAVEFORM.encode())
+		teensy.flush()
+		#every later write goes through the writer thread, so a slow port never blocks the GUI
+		WRITER_SIGNALS = WriterSignals()
+		WRITER = CommandWriter(teensy, EMPTY_WAVEFORM, WRITER_SIGNALS.written.emit,
+							   lambda command, error: WRITER_SIGNALS.failed.emit(command, str(error)))
+		WRITER.start()
+		#one reader thread for the whole session frames everything the Teensy sends
+		READER_SIGNALS = ReaderSignals()
+		READER = LineReader(teensy, READER_SIGNALS.lines.emit, lambda error: READER_SIGNALS.failed.emit(str(error)))
+		READER.start()
+	return TEENSY_CONNECTED
 
 ###########################################################################################################
 ### WAVEFORM PARSING FUNCTION ###
 ###########################################################################################################
-def parseWaveforms(sheet, sheet_name, waves, notes, numbers):
-	current_list = []
-	num = 0
-	temp_num = 0
-	note_num = []
-	notes_list = []
-
-	for i in range (len(sheet.index)):
-		if (sheet.iloc[num][0] == "Note:"):
-			current_note = sheet.iloc[num][1]
-			note_num.append(temp_num)
-			notes_list.append(current_note)
-			num += 1
-			continue
-
-		out = "1"
-
-		if (int(sheet.iloc[num][1]) < 0):
-			break
-		elif (int(sheet.iloc[num][1]) == 0):
-			VOLT_SCALER = 120.0/MAX_VOLTAGE
-		elif (int(sheet.iloc[num][1]) == 1):
-			VOLT_SCALER = 120.0/(MAX_VOLTAGE*DUAL_ACTUATOR_SCALER)
-
-		out += 'c'
-		out += str(sheet.iloc[num][1])
-		out += str(sheet.iloc[num][2]).zfill(3)
-		out += "0." + str(int(sheet.iloc[num][3]/VOLT_SCALER*100)).zfill(2)
-		out += "0." + str(int(sheet.iloc[num][4]*100)).zfill(2)
-
-		out += 'p'
-		if (int(sheet.iloc[num][5]) < 0):
-			out += "010.505050"
-		else:
-			out += '1'
-			out += str(sheet.iloc[num][5])
-			out += str(round(sheet.iloc[num][6], 2))
-			if (round(sheet.iloc[num][6], 2)*10 % 1 == 0):
-				out += '0'
-			out += str(sheet.iloc[num][7]).zfill(2)
-			out += str(sheet.iloc[num][8]).zfill(2)
-
-		out += 'f'
-		if (int(sheet.iloc[num][9]) < 0):
-			out += "050050050"
-		else:
-			if (int(sheet.iloc[num][9]) == 1 or int(sheet.iloc[num][9]) == 3):
-				out += '1'
-			else:
-				out += '0'
-			out += str(sheet.iloc[num][10]).zfill(3)
-			out += str(sheet.iloc[num][11]).zfill(3)
-			out += str(sheet.iloc[num][12]).zfill(2)
-			out += str(sheet.iloc[num][13]).zfill(4)
-
-		out += 'a'
-		if (int(sheet.iloc[num][9]) < 0):
-			out += "0.000.000.001000"
-		else:	
-			if (int(sheet.iloc[num][9]) == 2 or int(sheet.iloc[num][9]) == 3):
-				out += '1'
-			else:
-				out += '0'
-			out += "0." + str(int(sheet.iloc[num][14]/VOLT_SCALER*100)).zfill(2)
-			out += "0." + str(int(sheet.iloc[num][15]/VOLT_SCALER*100)).zfill(2)
-
-		out += 'w'
-		if (int(sheet.iloc[num][16]) < 0):
-			out += '0000'
-		else:
-			out += str(sheet.iloc[num][16]).zfill(4)
-
-		out += 'ff'
-		if not (int(sheet.iloc[num][17]) == 1 or int(sheet.iloc[num][17]) == 3
-				or int(sheet.iloc[num][17]) == 4 or int(sheet.iloc[num][17]) == 5):
-			out += "050000"
-		else:
-			out += '1'
-			out += str(sheet.iloc[num][18]).zfill(2)
-			out += str(sheet.iloc[num][19]).zfill(3)
-
-		out += "ww"
-		if not (int(sheet.iloc[num][17]) == 4 or int(sheet.iloc[num][17]) == 5):
-			out += "00.00"
-		else:
-			out += "1"
-			out += str(sheet.iloc[num][20]).zfill(4)
-
-		out += 'aa'
-		if not (int(sheet.iloc[num][17]) == 2 or int(sheet.iloc[num][17]) == 3
-				or int(sheet.iloc[num][17]) == 5):
-			out += "05000.50"
-		else:
-			out += '1'
-			out += str(sheet.iloc[num][21]).zfill(3)
-			out += "0." + str(int(sheet.iloc[num][22]/VOLT_SCALER*100)).zfill(2)
-
-		out += 'wav'
-		if (str(sheet.iloc[num][23]) ==  "-1"):
-			out += '0'
-		else:
-			out += '1'
-			out += str(sheet.iloc[num][24]).zfill(4)
-			out += str(sheet.iloc[num][23]).upper().rstrip()
-			#^^This isnt last in the Excel sheet because it's a necessary configuration
-			#But it should be the last string here because it allows for WAV filenames of various lengths
-		
-		num += 1
-		current_list.append(out)
-		temp_num += 1
-
-	note_num[0] = 0
-	note_num.append(temp_num)
-	waves[sheet_name] = current_list
-	notes[sheet_name] = notes_list
-	numbers[sheet_name] = note_num
+@REPORT.timed("parseWaveforms")
+def parseWaveforms(columns, sheet_name, waves, notes, numbers):
+	#the command fields are built column-wise from the sheet's columns (Waveform_Encoder.sheetColumns)
+	#(the row-by-row sheet.iloc[num][k] version is kept in Waveform_Encoder.py as the reference)
+	waves[sheet_name], notes[sheet_name], numbers[sheet_name] = encodeWaveforms(columns, MAX_VOLTAGE,
+																				DUAL_ACTUATOR_SCALER)
+	REPORT.count("waveforms_parsed", len(waves[sheet_name]))
 
 ###########################################################################################################
 ### WAVEFORM FILE CHECK ###
@@ -264,23 +136,70 @@ WAVEFORM_STRINGS = {}
 MESSAGE_NOTES = {}
 MESSAGE_NUMS = {}
 
-try:
-	waveform_file = pd.ExcelFile(WAVEFORM_FILE_NAME)
-	MAIN_SHEET_NAME = waveform_file.sheet_names[0]
-	for name in waveform_file.sheet_names:
-		SHEET_LIST.append(name)
-		sheet = waveform_file.parse(name)
-		sheet.fillna(-1, inplace = True)
-		sheet = sheet.iloc[2:]
-		WAVEFORM_SHEETS[name] = sheet
-		parseWaveforms(sheet, name, WAVEFORM_STRINGS, MESSAGE_NOTES, MESSAGE_NUMS)
-	WAVEFORM_CONNECTED = True
-except:
-	pass
+#Startup: read every sheet of the waveform workbook and build the waveform strings
+#An unchanged workbook is taken from the cache without opening it in pandas; otherwise only
+#the sheets whose cells changed are encoded again (WAVEFORM_SHEETS is only filled by a parse)
+def loadWaveforms():
+	global WAVEFORM_CONNECTED, MAIN_SHEET_NAME
+	try:
+		with REPORT.stage("cache_load"):
+			settings = cacheSettings(MAX_VOLTAGE, DUAL_ACTUATOR_SCALER)
+			workbook_hash = fileHash(WAVEFORM_FILE_NAME)
+			cache = loadCache(WAVEFORM_CACHE_FILE_NAME, settings) if WAVEFORM_CACHE_ENABLED else emptyCache(settings)
+		if (cache["workbook_hash"] == workbook_hash):
+			MAIN_SHEET_NAME = cache["sheet_list"][0]
+			for name in cache["sheet_list"]:
+				SHEET_LIST.append(name)
+				entry = cache["sheets"][name]
+				WAVEFORM_STRINGS[name], MESSAGE_NOTES[name], MESSAGE_NUMS[name] = entry["waves"], entry["notes"], entry["numbers"]
+			REPORT.count("cached_sheets", len(SHEET_LIST))
+			WAVEFORM_CONNECTED = True
+			return WAVEFORM_CONNECTED
+
+		#sheets are read concurrently, read-only, through column 24 and up to the row ending the tests
+		with REPORT.stage("workbook_read"):
+			loaded_sheets, load_times = loadWorkbook(WAVEFORM_FILE_NAME, WAVEFORM_LOAD_WORKERS)
+		REPORT.set("sheet_read_sec", load_times)
+		MAIN_SHEET_NAME = list(loaded_sheets)[0]
+		sheets = {}
+		for name, sheet in loaded_sheets.items():
+			print("\tSheet \"" + name + "\" loaded in " + str(round(load_times[name], 3)) + " s")
+			REPORT.add("sheet_read", load_times[name])
+			SHEET_LIST.append(name)
+			WAVEFORM_SHEETS[name] = sheet
+			columns = sheetColumns(sheet)
+			sheet_hash = sheetHash(columns)
+			entry = cache["sheets"].get(name)
+			if (entry is not None and entry["hash"] == sheet_hash):
+				WAVEFORM_STRINGS[name], MESSAGE_NOTES[name], MESSAGE_NUMS[name] = entry["waves"], entry["notes"], entry["numbers"]
+				REPORT.count("cached_sheets")
+			else:
+				parseWaveforms(columns, name, WAVEFORM_STRINGS, MESSAGE_NOTES, MESSAGE_NUMS)
+				REPORT.count("encoded_sheets")
+			sheets[name] = cacheEntry(sheet_hash, WAVEFORM_STRINGS[name], MESSAGE_NOTES[name], MESSAGE_NUMS[name])
+		WAVEFORM_CONNECTED = True
+		if (WAVEFORM_CACHE_ENABLED):
+			with REPORT.stage("cache_save"):
+				saveCache(WAVEFORM_CACHE_FILE_NAME, dict(cache, workbook_hash=workbook_hash, sheet_list=SHEET_LIST, sheets=sheets))
+	except:
+		pass
+	return WAVEFORM_CONNECTED
 
 ###########################################################################################################
 ### GUI FUNCTIONS AND CLASSES ###
 ###########################################################################################################
+#Shown while startup runs, so the GUI responds as soon as Qt is loaded
+def createSplash(text):
+	splash = QLabel(text)
+	splash.setStyleSheet("color: #538DD5;"
+						 "background-color: #17365D;"
+						 "font: 22pt Arial;"
+						 "padding: 40px;")
+	splash.setAlignment(Qt.AlignCenter)
+	splash.setWindowFlags(Qt.SplashScreen)
+	splash.show()
+	return splash
+
 def createLabel(label):
 	label = QLabel(label)
 
@@ -293,22 +212,6 @@ def createLabel(label):
 
 	return label
 
-class Worker(QRunnable):
-	def __init__(self, fn):
-		super(Worker, self).__init__()
-
-		# Store constructor arguments (re-used for processing)
-		self.fn = fn 
-
-	@pyqtSlot()
-	def run(self):
-		try:
-			result = self.fn()
-		except:
-			traceback.print_exc()
-			exctype, value = sys.exc_info()[:2]
-			self.signals.error.emit((exctype, value, traceback.format_exc()))
-
 class TabBar(QTabBar):
 	def tabSizeHint(self, index):
 		size = QTabBar.tabSizeHint(self, index)
@@ -321,8 +224,6 @@ class VerifyWindow(QFrame):
 
 		self.setContentsMargins(0, 0, 0, 0)
 
-		self.threadpool = QThreadPool()
-
 		self.verify_layout = QGridLayout()
 
 		self.title = QLabel("Verification")
@@ -364,37 +265,53 @@ class VerifyWindow(QFrame):
 							  	   "border: 1px solid #1F9ED4;"
 								   "font: 22pt Arial;}")
 		self.verify_layout.addWidget(self.current, 1, 3, 2, 3)
-	
-		self.current_timer = QTimer()
-		self.current_timer.setInterval(300)
-		self.current_timer.timeout.connect(self.createVerifyWorker)
+
+		#pyqtgraph is imported with the first panel, after the splash window
+		from Verify_Plot import CurrentPlot
+		self.plot = CurrentPlot()
+		self.plot.setStyleSheet("border: 0px;")
+		self.verify_layout.addWidget(self.plot, 3, 0, 3, 6)
+
+		self.verifying = False #this panel started the running verification, so the readings are its own
 
 		self.setLayout(self.verify_layout)
 
 	def startVerify(self):
 		if (self.verify_btn.isChecked()):
 			MainWindow.teensy_gui_write(MainWindow, VERIFY_WAVEFORM)
-			self.current_timer.start()
+			self.verifying = True
+			self.plot.clearReadings()
 			self.current.setText("Verification Running")
 			self.verify_btn.setText("STOP")
 		else:
 			MainWindow.teensy_gui_write(MainWindow, EMPTY_WAVEFORM)
-			self.current.setText("Verification Paused")
-			self.verify_btn.setText("START")
-			self.current_timer.stop()
-
-	def createVerifyWorker(self):
-		worker = Worker(self.updateWindow)
-		self.threadpool.start(worker)
+			self.pauseVerify()
+
+	#shown as paused without writing to the Teensy (also when another panel takes over verification)
+	def pauseVerify(self):
+		self.verifying = False
+		self.verify_btn.setChecked(False)
+		self.current.setText("Verification Paused")
+		self.verify_btn.setText("START")
+
+	#lines from the reader thread: current readings go to the label and plot while this panel is verifying,
+	#anything else (command echoes, firmware messages) to the console
+	def showLines(self, lines):
+		times = []
+		readings = []
+		for receive_time, line in lines:
+			try:
+				readings.append(float(line))
+				times.append(receive_time)
+			except ValueError:
+				if (line):
+					print("Teensy: " + line)
+		if (self.verifying and readings):
+			self.current.setText(str(readings[-1]) + " A")
+			self.plot.addReadings(times, readings) #drawn by the plot's own timer at up to 30 fps
 
-	def updateWindow(self):
-		global TEENSY_CONNECTED
-		if (TEENSY_CONNECTED):
-			ser_bytes = teensy.readline()
-			teensy_str = ser_bytes.decode("utf-8")
-			teensy.flush()
-		else:
-			self.current.setText("Teensy Disconnected")
+	def showDisconnected(self):
+		self.current.setText("Teensy Disconnected")
 
 
 class Label(QWidget):
@@ -467,6 +384,11 @@ class MainWindow(QWidget):
 		self.reset_timer.setInterval(TEST_TIME)
 		self.reset_timer.timeout.connect(self.stopWaveform)
 
+		WRITER_SIGNALS.written.connect(self.commandWritten)
+		WRITER_SIGNALS.failed.connect(self.writeFailed)
+		READER_SIGNALS.lines.connect(self.readLines)
+		READER_SIGNALS.failed.connect(self.readFailed)
+
 		self.setStyleSheet("background-color: #17365D;") 
 		self.setContentsMargins(0, 0, 0, 0)
 
@@ -492,6 +414,7 @@ class MainWindow(QWidget):
 								"}")
 		self.tabs.updateGeometry()
 		self.tab_array = []
+		self.verify_windows = [] #one per tab, in tab order
 
 		self.pause_buttons = []
 
@@ -649,6 +572,8 @@ class MainWindow(QWidget):
 
 
 			self.tab_layout.addWidget(self.verify, 0, 1, 1, 1)
+			self.verify_windows.append(self.verify)
+			self.verify.verify_btn.clicked.connect(lambda checked, verify=self.verify: checked and self.verifyStarted(verify))
 
 			self.tab_array.append(sheet_name)
 			self.tabs.addTab(self.new_tab, sheet_name)
@@ -679,55 +604,111 @@ class MainWindow(QWidget):
 		self.reset_timer.stop()
 		self.teensy_gui_write(EMPTY_WAVEFORM)
 
+	#every line the Teensy sends goes to the panel running verification, whichever tab is visible
+	#(to the visible one, for logging, when no verification is running)
+	def readLines(self, lines):
+		REPORT.count("lines_read", len(lines))
+		REPORT.add("line_latency", time.perf_counter() - lines[0][0])
+		verifying = [verify for verify in self.verify_windows if verify.verifying]
+		if (verifying):
+			verifying[0].showLines(lines)
+		elif (self.tabs.currentIndex() >= 0):
+			self.verify_windows[self.tabs.currentIndex()].showLines(lines)
+
+	#the Teensy runs one verification at a time, so starting it on one panel pauses the others
+	def verifyStarted(self, verify):
+		for other in self.verify_windows:
+			if (other is not verify and other.verifying):
+				other.pauseVerify()
+
+	def readFailed(self, error):
+		print("\nERROR: Cannot read from Teensy (" + error + ").")
+		for verify in self.verify_windows:
+			verify.showDisconnected()
+
+	#queues the command and returns at once; commandWritten or writeFailed follows from the writer thread
+	#waiting waveforms are replaced by newer ones and EMPTY_WAVEFORM (stop) is always written first
+	@REPORT.timed("teensy_gui_write")
 	def teensy_gui_write(self, waveform_str):
-		global TEENSY_CONNECTED, EMPTY_WAVEFORM
+		global TEENSY_CONNECTED
 		if (TEENSY_CONNECTED):
-			try:
-				teensy.write(waveform_str.encode())
-				teensy.flush()
-				if (waveform_str == EMPTY_WAVEFORM):
-					print("Waveform Paused")
-				elif (waveform_str == VERIFY_WAVEFORM):
-					print("Running Verification Waveform")
-				else:
-					print("Running Waveform: " + waveform_str)
-			except:
-				print("\nERROR: Cannot write to Teensy.")
-				print("RECOMMENDED FIX:")
-				print("\t1) Turn off power to the driver.")
-				print("\t2) Disconnect, then reconnect the USB cable.")
-				print("\t3) Relaunch the GUI.")
-				print("\t4) Turn the driver back on when GUI is open.")
-				TEENSY_CONNECTED = False
-				self.error_msg = QMessageBox();
-				self.error_msg.setWindowTitle("ERROR")
-				self.error_msg.setText("\rCannot write to Teensy\
-										\n\rRECOMMENDED FIX:\
-										\n\r\t1) Turn off power to the driver.\
-										\n\r\t2) Disconnect, then reconnect the USB cable.\
-										\n\r\t3) Relaunch the GUI.\
-										\n\r\t4) Turn the driver back on when the GUI is open.")
-				self.error_msg.exec()
+			WRITER.send(waveform_str)
+
+	def commandWritten(self, waveform_str, latency):
+		global EMPTY_WAVEFORM
+		REPORT.count("bytes_written", len(waveform_str))
+		REPORT.add("command_latency", latency)
+		if (waveform_str == EMPTY_WAVEFORM):
+			print("Waveform Paused")
+		elif (waveform_str == VERIFY_WAVEFORM):
+			print("Running Verification Waveform")
+		else:
+			print("Running Waveform: " + waveform_str)
+
+	def writeFailed(self, waveform_str, error):
+		global TEENSY_CONNECTED
+		REPORT.count("write_errors")
+		if (not TEENSY_CONNECTED): #already reported for an earlier command
+			return
+		print("\nERROR: Cannot write to Teensy.")
+		print("RECOMMENDED FIX:")
+		print("\t1) Turn off power to the driver.")
+		print("\t2) Disconnect, then reconnect the USB cable.")
+		print("\t3) Relaunch the GUI.")
+		print("\t4) Turn the driver back on when GUI is open.")
+		TEENSY_CONNECTED = False
+		for verify in self.verify_windows:
+			verify.showDisconnected()
+		self.error_msg = QMessageBox();
+		self.error_msg.setWindowTitle("ERROR")
+		self.error_msg.setText("\rCannot write to Teensy\
+								\n\rRECOMMENDED FIX:\
+								\n\r\t1) Turn off power to the driver.\
+								\n\r\t2) Disconnect, then reconnect the USB cable.\
+								\n\r\t3) Relaunch the GUI.\
+								\n\r\t4) Turn the driver back on when the GUI is open.")
+		self.error_msg.exec()
 
 ###########################################################################################################
 ### MAIN FUNCTION ###
 ###########################################################################################################
 if __name__ == '__main__':
+	multiprocessing.freeze_support() #sheet loading workers in the executable version
+	app = QApplication(sys.argv)
+	splash = createSplash("Connecting to Teensy and loading \"" + WAVEFORM_FILE_NAME + "\"...")
+	app.processEvents()
+
+	#Workbook parsing (mostly pandas) overlaps the serial handshake (mostly waiting)
+	loader = threading.Thread(target=loadWaveforms, daemon=True)
+	loader.start()
+	connectDriver()
+	while (loader.is_alive()):
+		app.processEvents()
+		loader.join(0.02)
+	splash.close()
+
 	if (TEENSY_CONNECTED and WAVEFORM_CONNECTED):
 		print("\nInitialization Successful! Starting GUI...")
-		app = QApplication(sys.argv)
 		player = MainWindow()
 		player.resize(WINDOW_WIDTH, WINDOW_HEIGHT)
 		player.showMaximized()
-		teensy.write(EMPTY_WAVEFORM.encode())
-		teensy.flush()
+		WRITER.send(EMPTY_WAVEFORM)
 		print("GUI Started")
-		sys.exit(app.exec_())
+		if ("--startup-benchmark" in sys.argv): #Quit once the window has been drawn (see Startup_Benchmark.py)
+			QTimer.singleShot(0, lambda: (print("WINDOW READY", flush=True), app.quit()))
+		exit_code = app.exec_()
+		READER.stop()
+		WRITER.close(1.0)
+		REPORT.set("command_writer", WRITER.latencySummary())
+		if (REPORT.write(REPORT_FILE_NAME)):
+			print("Run Report Saved to " + REPORT_FILE_NAME)
+		sys.exit(exit_code)
 	else:
 		print("\nERROR(s) FOUND:")
 		if (not TEENSY_CONNECTED):
 			print("\tTeensy not connected. Please connect or reconnect USB and restart program.")
 		if (not WAVEFORM_CONNECTED):
 			print("\tWaveform file either not present or contains an input error. Please acquire a working \"" + WAVEFORM_FILE_NAME + "\" and restart program.")
+		REPORT.write(REPORT_FILE_NAME)
 		if (EXE_ENABLED):
 			user_input = input() #Infinitely wait
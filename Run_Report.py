@@ -0,0 +1,180 @@
+## Run Report
+## Named stage timers and counters with a JSON run report, for Accelerometer_DAQ.py and Driver_GUI_1-3.py
+##
+## Usage:
+##   REPORT = RunReport("Accelerometer_DAQ", enabled=REPORT_ENABLED)
+##   with REPORT.stage("serial_read"):
+##       data = ser.read(...)
+##   REPORT.count("bytes_read", len(data))
+##
+##   @REPORT.timed("parseWaveforms")
+##   def parseWaveforms(...):
+##
+##   REPORT.write("run_report.json")
+##
+## A disabled report hands back one shared do-nothing context manager and leaves decorated
+## functions unwrapped, so instrumented code costs a method call per stage and nothing more.
+## Stage times use time.perf_counter; nested stages are timed independently. Run this file
+## directly to measure the per-stage overhead.
+
+import sys
+import json
+import time
+import datetime
+import functools
+import contextlib
+
+##############################################################
+### REPORT SETTINGS ###
+##############################################################
+
+REPORT_INDENT = 1 								# JSON Indentation (None for One Line)
+_NULL_STAGE = contextlib.nullcontext()			# Shared by Every Disabled stage() Call
+
+##############################################################
+### RUN REPORT ###
+##############################################################
+
+class _Stage:
+	__slots__ = ("totals", "name", "start")
+
+	def __init__(self, totals, name):
+		self.totals = totals
+		self.name = name
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc_info):
+		elapsed = time.perf_counter() - self.start
+		entry = self.totals.get(self.name)
+		if (entry is None):
+			self.totals[self.name] = [1, elapsed, elapsed]
+		else:
+			entry[0] += 1
+			entry[1] += elapsed
+			if (elapsed > entry[2]):
+				entry[2] = elapsed
+
+class RunReport:
+	def __init__(self, name, enabled=True):
+		self.name = name
+		self.enabled = enabled
+		self.started = datetime.datetime.now().isoformat()
+		self.start_time = time.perf_counter()
+		self.stages = {}						# Stage Name: [Calls, Total Seconds, Longest Call Seconds]
+		self.counters = {}
+		self.info = {}							# Free-Form Values Copied Into the Report (Settings, Paths, ...)
+
+	# Context Manager Timing One Pass Through a Stage
+	def stage(self, name):
+		if (not self.enabled):
+			return _NULL_STAGE
+		return _Stage(self.stages, name)
+
+	# Decorator Timing Every Call of a Function as a Stage (Returns the Function Itself When Disabled)
+	def timed(self, name=None):
+		def decorate(function):
+			if (not self.enabled):
+				return function
+			stage_name = name or function.__name__
+			@functools.wraps(function)
+			def wrapper(*args, **kwargs):
+				with _Stage(self.stages, stage_name):
+					return function(*args, **kwargs)
+			return wrapper
+		return decorate
+
+	# Record a Duration Measured Elsewhere (e.g. by a Reader Thread)
+	def add(self, name, seconds, calls=1):
+		if (not self.enabled):
+			return
+		entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+		entry[0] += calls
+		entry[1] += seconds
+		entry[2] = max(entry[2], seconds/max(calls, 1))
+
+	def count(self, name, amount=1):
+		if (self.enabled):
+			self.counters[name] = self.counters.get(name, 0) + amount
+
+	def set(self, key, value):
+		if (self.enabled):
+			self.info[key] = value
+
+	# Report as a Plain Dictionary (JSON-Ready)
+	def report(self):
+		wall = time.perf_counter() - self.start_time
+		return {
+			"name": self.name,
+			"started": self.started,
+			"wall_sec": round(wall, 6),
+			"stages": {name: {
+				"calls": calls,
+				"total_sec": round(total, 6),
+				"mean_ms": round(total/calls*1000, 4) if calls else 0.0,
+				"max_ms": round(longest*1000, 4),
+				"share_pct": round(total/wall*100, 2) if wall > 0 else 0.0,
+			} for name, (calls, total, longest) in self.stages.items()},
+			"counters": dict(self.counters),
+			"info": dict(self.info),
+		}
+
+	# Write the Report as JSON (Does Nothing When Disabled); Returns the Path or None
+	def write(self, path):
+		if (not self.enabled):
+			return None
+		with open(path, "w") as report_file:
+			json.dump(self.report(), report_file, indent=REPORT_INDENT, default=str)
+		return path
+
+	def printSummary(self):
+		if (not self.enabled):
+			return
+		result = self.report()
+		print("\nRun Report ({:.3f} s Wall):".format(result["wall_sec"]))
+		for name, stage in sorted(result["stages"].items(), key=lambda item: -item[1]["total_sec"]):
+			print("\t{:<20}{:>10.4f} s{:>8} Call(s){:>8.1f}%".format(name, stage["total_sec"], stage["calls"], stage["share_pct"]))
+		for name, value in result["counters"].items():
+			print("\t{}: {}".format(name, value))
+
+##############################################################
+### BENCHMARK ###
+##############################################################
+
+# Cost per Instrumented Call, Enabled and Disabled, Against the Bare Loop
+def benchmark(calls=1000000):
+	def work(value):
+		return value + 1
+
+	start = time.perf_counter()
+	for i in range(calls):
+		work(i)
+	bare = time.perf_counter() - start
+
+	print("Instrumentation Overhead ({} Calls):".format(calls))
+	for enabled in (False, True):
+		report = RunReport("benchmark", enabled=enabled)
+		start = time.perf_counter()
+		for i in range(calls):
+			with report.stage("work"):
+				work(i)
+		staged = time.perf_counter() - start
+		timed_work = report.timed("timed_work")(work)
+		start = time.perf_counter()
+		for i in range(calls):
+			timed_work(i)
+		decorated = time.perf_counter() - start
+		start = time.perf_counter()
+		for i in range(calls):
+			report.count("items")
+		counted = time.perf_counter() - start
+		print("\t{:<9} stage() {:.3f} us, timed() {:.3f} us, count() {:.3f} us per Call".format(
+			  "Enabled:" if enabled else "Disabled:", (staged - bare)/calls*1e6, (decorated - bare)/calls*1e6,
+			  counted/calls*1e6))
+	json.dump(report.report(), sys.stdout, indent=REPORT_INDENT)
+	print()
+
+if __name__ == '__main__':
+	benchmark()
@@ -0,0 +1,152 @@
+## Startup Benchmark
+## Import time and time to a usable program for Accelerometer_DAQ.py and Driver_GUI_1-3.py
+##
+## Usage:
+##   python Startup_Benchmark.py [--repeats 3] [--workbook Waveform_Excel_Vibration.xlsx]
+##
+## Every measurement runs in a fresh interpreter, from a temporary folder holding the port
+## files of Teensy_Simulator.py devices (and a copy of the waveform workbook for the GUI):
+##   import         loading the script without running its main block (runpy, run_name != "__main__")
+##   connect        import plus the script's startup connection to a simulated Teensy
+##   window         launching the GUI (offscreen Qt) until its main window has been drawn
+## The heavy modules each import left loaded are listed, so a regression to eager imports shows up.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+##############################################################
+### BENCHMARK SETTINGS ###
+##############################################################
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DAQ_SCRIPT = os.path.join(DIRECTORY, "Accelerometer_DAQ.py")
+GUI_SCRIPT = os.path.join(DIRECTORY, "Driver_GUI_1-3.py")
+SIMULATOR_SCRIPT = os.path.join(DIRECTORY, "Teensy_Simulator.py")
+DEFAULT_WORKBOOK = "Waveform_Excel_Vibration.xlsx" 	# Driver_GUI_1-3.py WAVEFORM_FILE_NAME_BUILD
+HEAVY_MODULES = ("matplotlib", "xlsxwriter", "pandas", "scipy", "cv2", "pyqtgraph", "pyarrow", "openpyxl")
+TIMEOUT_SEC = 60
+
+## Run in the Child Interpreter: Load the Script, Optionally Call its Startup Function, Report as JSON
+CHILD = """
+import os, sys, json, time, runpy
+start = time.perf_counter()
+sys.argv = [sys.argv[1]]
+sys.path.insert(0, os.path.dirname(sys.argv[0])) # As When the Script is Run Directly
+script = runpy.run_path(sys.argv[0], run_name="startup_benchmark")
+imported = time.perf_counter() - start
+result = {"import_sec": imported}
+if ("{startup}"):
+	result["connected"] = bool(script["{startup}"]())
+	result["startup_sec"] = time.perf_counter() - start
+result["heavy"] = [name for name in {heavy} if name in sys.modules]
+print("RESULT " + json.dumps(result), flush=True)
+"""
+
+##############################################################
+### MEASUREMENTS ###
+##############################################################
+
+def _runChild(script, startup, directory):
+	code = CHILD.replace("{startup}", startup).replace("{heavy}", repr(HEAVY_MODULES))
+	process = subprocess.run([sys.executable, "-c", code, script], cwd=directory, capture_output=True,
+							 text=True, timeout=TIMEOUT_SEC)
+	for line in process.stdout.splitlines():
+		if (line.startswith("RESULT ")):
+			return json.loads(line[7:])
+	lines = (process.stderr or process.stdout).strip().splitlines()
+	return {"error": lines[-1] if lines else "exit code " + str(process.returncode)}
+
+def _interpreterSec():
+	start = time.perf_counter()
+	subprocess.run([sys.executable, "-c", "pass"], check=True)
+	return time.perf_counter() - start
+
+# Launch the GUI Until it Prints "WINDOW READY" (Set Up by --startup-benchmark)
+def _windowSec(directory):
+	environment = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+	start = time.perf_counter()
+	process = subprocess.Popen([sys.executable, GUI_SCRIPT, "--startup-benchmark"], cwd=directory, env=environment,
+							   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+	output = []
+	try:
+		for line in process.stdout:
+			output.append(line.strip())
+			if (line.startswith("WINDOW READY")):
+				return {"window_sec": time.perf_counter() - start}
+	finally:
+		process.kill()
+		process.wait()
+	return {"error": output[-1] if output else "no output"}
+
+def _startSimulator(mode, port_file):
+	simulator = subprocess.Popen([sys.executable, SIMULATOR_SCRIPT, mode, "--port-file", port_file],
+								 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	deadline = time.perf_counter() + 10
+	while (not (os.path.exists(port_file) and os.path.getsize(port_file) > 0)):
+		if (simulator.poll() is not None or time.perf_counter() > deadline):
+			return simulator, False
+		time.sleep(0.05)
+	return simulator, True
+
+# Best of repeats for Each Numeric Field (Errors and Module Lists From the Last Run)
+def _best(runs):
+	result = dict(runs[-1])
+	for key in result:
+		if (key.endswith("_sec")):
+			result[key] = min(run[key] for run in runs if key in run)
+	return result
+
+##############################################################
+### MAIN FUNCTION ###
+##############################################################
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Measure startup time of the DAQ and driver GUI scripts")
+	parser.add_argument("--repeats", type=int, default=3)
+	parser.add_argument("--workbook", default=os.path.join(DIRECTORY, DEFAULT_WORKBOOK),
+						help="waveform workbook the GUI loads (default: " + DEFAULT_WORKBOOK + " next to this script)")
+	args = parser.parse_args()
+
+	results = {"interpreter": {"startup_sec": min(_interpreterSec() for repeat in range(args.repeats))}}
+	with tempfile.TemporaryDirectory() as directory:
+		simulators = []
+		try:
+			accelerometer, accelerometer_ok = _startSimulator("accelerometer", os.path.join(directory, "COM_PORT_2.txt"))
+			driver, driver_ok = _startSimulator("driver", os.path.join(directory, "COM_PORT.txt"))
+			simulators = [accelerometer, driver]
+			if (os.path.exists(args.workbook)):
+				shutil.copy(args.workbook, os.path.join(directory, DEFAULT_WORKBOOK))
+
+			results["Accelerometer_DAQ import"] = _best([_runChild(DAQ_SCRIPT, "", directory) for repeat in range(args.repeats)])
+			if (accelerometer_ok):
+				results["Accelerometer_DAQ connect"] = _best([_runChild(DAQ_SCRIPT, "connectAccelerometer", directory)
+															  for repeat in range(args.repeats)])
+			results["Driver_GUI import"] = _best([_runChild(GUI_SCRIPT, "", directory) for repeat in range(args.repeats)])
+			if ("error" in results["Driver_GUI import"]):
+				results["Driver_GUI window"] = {"error": "skipped, GUI cannot be imported"}
+			elif (not os.path.exists(args.workbook)):
+				results["Driver_GUI window"] = {"error": "skipped, no waveform workbook at " + args.workbook}
+			elif (driver_ok):
+				results["Driver_GUI window"] = _best([_windowSec(directory) for repeat in range(args.repeats)])
+		finally:
+			for simulator in simulators:
+				simulator.terminate()
+				simulator.wait()
+
+	print("Startup Benchmark (Best of {}):".format(args.repeats))
+	for name, result in results.items():
+		if ("error" in result):
+			print("\t{:<28} {}".format(name, "unavailable: " + result["error"]))
+			continue
+		times = ", ".join("{} {:.3f} s".format(key[:-4], value) for key, value in result.items() if key.endswith("_sec"))
+		line = "\t{:<28} {}".format(name, times)
+		if ("heavy" in result):
+			line += ", Heavy Modules Loaded: " + (", ".join(result["heavy"]) or "None")
+		if ("connected" in result):
+			line += ", Connected: " + str(result["connected"])
+		print(line)
@@ -0,0 +1,225 @@
+## Teensy Connection
+## Shared manual-then-automatic serial connection for Accelerometer_DAQ.py and Driver_GUI_1-3.py
+##
+## The automatic attempt probes every detected serial port at the same time, each with its
+## own deadline and identification handshake, and keeps the first port that answers.
+## Startup therefore takes about as long as one probe instead of the sum of all of them, and
+## never longer than the deadline: the baud rates share it, and every read is cut short by it.
+
+import time
+import threading
+import serial
+import serial.tools.list_ports
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+##############################################################
+### CONNECTION SETTINGS ###
+##############################################################
+
+PROBE_TIMEOUT_SEC = 2.0 						# Deadline for Opening and Identifying One Port (All Baud Rates)
+BAUD_CHECK_TIMEOUT_SEC = 0.5 					# Longest Read Timeout for the Read-Back Check at Each Baud Rate
+REPORT_GRACE_SEC = 0.1 							# Time for Probes Ending at the Deadline to Report Back
+CLEAN_FRAMES = 5 								# Consecutive Well-Formed Lines Needed to Accept a Baud Rate
+
+##############################################################
+### HANDSHAKES ###
+##############################################################
+
+# Handshakes Take the Open Port and an Optional Deadline (time.perf_counter Seconds) That
+# Every Read and Write Must End By; Past it They Give Up and Return False
+
+# One Line, Read Within the Port's Timeout and the Deadline (b"" Once the Deadline Has Passed)
+def _readLine(ser, deadline=None):
+	if (deadline is not None):
+		remaining = deadline - time.perf_counter()
+		if (remaining <= 0):
+			return b""
+		ser.timeout = remaining if ser.timeout is None else min(ser.timeout, remaining)
+	return ser.readline()
+
+def _isAccelerometerFrame(line):
+	try:
+		index_y = line.index(b"y")
+		index_z = line.index(b"z", index_y+1)
+		float(line[:index_y])
+		float(line[index_y+1:index_z])
+		float(line[index_z+1:].split(b"n")[0])
+		return True
+	except ValueError:
+		return False
+
+# Accelerometer Firmware Streams "<x>y<y>z<z>" Lines Without Being Asked
+def accelerometerHandshake(ser, deadline=None):
+	clean = 0
+	for attempt in range(CLEAN_FRAMES + 2): # The first line is usually partial
+		line = _readLine(ser, deadline)
+		if (not line.endswith(b"\n")):
+			return False
+		clean = clean + 1 if _isAccelerometerFrame(line) else 0
+		if (clean >= CLEAN_FRAMES):
+			return True
+	return False
+
+# Send a Command and Wait for One of the Expected Replies (Driver Firmware Echoes the Command First)
+def commandHandshake(command, replies):
+	def handshake(ser, deadline=None):
+		if (deadline is not None):
+			if (deadline <= time.perf_counter()):
+				return False
+			ser.write_timeout = deadline - time.perf_counter()
+		ser.write(command.encode())
+		ser.flush()
+		for attempt in range(2):
+			line = _readLine(ser, deadline).decode(errors="replace").rstrip()
+			if (any(reply in line for reply in replies)):
+				return True
+		return False
+	return handshake
+
+##############################################################
+### PORT PROBING ###
+##############################################################
+
+# Try Each Baud Rate (Fastest First) on an Open Port; Returns the First Rate Passing check, or None
+#
+# With a deadline, each rate gets an equal share of the time left (so a rate that fails fast
+# leaves more for the rest), and no rate is tried once the deadline has passed.
+def negotiateBaud(ser, baud_rates, check, timeout=BAUD_CHECK_TIMEOUT_SEC, deadline=None):
+	previous_timeout = ser.timeout
+	try:
+		for index, baud_rate in enumerate(baud_rates):
+			ser.timeout = timeout
+			rate_deadline = None
+			if (deadline is not None):
+				remaining = deadline - time.perf_counter()
+				if (remaining <= 0):
+					break
+				rate_deadline = time.perf_counter() + remaining/(len(baud_rates) - index)
+			try:
+				ser.baudrate = baud_rate
+				ser.reset_input_buffer()
+				if (check(ser, rate_deadline)):
+					return baud_rate
+			except Exception: # Rate not supported by the port or the adapter
+				continue
+		return None
+	finally:
+		ser.timeout = previous_timeout
+
+# Open a Port and Run the Handshake at Each Baud Rate Within timeout Seconds (or by deadline,
+# a time.perf_counter Time); Returns the Open Port or None
+def probePort(device, baud_rates, handshake=None, timeout=PROBE_TIMEOUT_SEC, deadline=None):
+	if (deadline is None):
+		deadline = time.perf_counter() + timeout
+	ser = None
+	try:
+		ser = serial.Serial(port=device, baudrate=baud_rates[0], timeout=timeout, write_timeout=timeout)
+		if (handshake is None):
+			return ser
+		if (negotiateBaud(ser, baud_rates, handshake, deadline=deadline) is not None):
+			return ser
+	except Exception: # Busy, missing or unresponsive device
+		pass
+	if (ser is not None):
+		ser.close()
+	return None
+
+# Probe All Ports Concurrently; Returns (Open Port, Port Info, {Device: (Seconds, Result)})
+#
+# Every probe shares one deadline, timeout seconds after starting, and discovery gives up
+# shortly after it even if a probe is stuck (e.g. opening the port); a port matched after
+# that is closed again.
+def discoverTeensy(baud_rates, handshake=None, timeout=PROBE_TIMEOUT_SEC, ports=None):
+	ports = list(serial.tools.list_ports.comports()) if ports is None else ports
+	timings = {}
+	winner = []
+	finished = threading.Event()
+	lock = threading.Lock()
+
+	def probe(port):
+		start = time.perf_counter()
+		ser = probePort(port.device, baud_rates, handshake, timeout, deadline)
+		with lock:
+			if (ser is not None and (winner or finished.is_set())): # Another port already won, or too late; release this one
+				ser.close()
+				result = "matched (unused)"
+			elif (ser is not None):
+				winner.append((ser, port))
+				result = "matched at {} baud".format(ser.baudrate)
+			else:
+				result = "no response"
+			timings[port.device] = (time.perf_counter() - start, result)
+		return ser is not None
+
+	if (len(ports) == 0):
+		return None, None, timings
+	deadline = time.perf_counter() + timeout
+	executor = ThreadPoolExecutor(max_workers=len(ports))
+	pending = set(executor.submit(probe, port) for port in ports)
+	while (pending and not winner and time.perf_counter() < deadline + REPORT_GRACE_SEC):
+		done, pending = wait(pending, timeout=deadline + REPORT_GRACE_SEC - time.perf_counter(), return_when=FIRST_COMPLETED)
+	executor.shutdown(wait=False) # Slower probes finish (and close their ports) in the background
+	with lock:
+		finished.set()
+		if (winner):
+			return winner[0][0], winner[0][1], dict(timings)
+	return None, None, dict(timings)
+
+##############################################################
+### MANUAL THEN AUTOMATIC CONNECTION ###
+##############################################################
+
+# Returns (Open Port or None, Port Name); the Port's baudrate is the Rate That Passed the Handshake
+#
+# baud_rate may be a single rate or a sequence tried from first (fastest) to last.
+def connectTeensy(port_filename, baud_rate, handshake=None, manual_port="", timeout=PROBE_TIMEOUT_SEC):
+	baud_rates = tuple(baud_rate) if isinstance(baud_rate, (list, tuple)) else (baud_rate,)
+
+	# Manual Connection
+	port_name = manual_port
+	if (port_name == ""):
+		try:
+			port_name = open(port_filename).readline().strip()
+		except:
+			print(port_filename + " file not found --> No serial port will be selected.")
+	if (port_name == ""):
+		print("No serial port selected. Ignoring manual connection attempt.")
+	else:
+		print("Attempting manual connection to serial port " + port_name + "...")
+		try:
+			ser = serial.Serial(port=port_name, baudrate=baud_rates[0])
+			print("Successfully connected to serial device at " + port_name + ".")
+			if (len(baud_rates) > 1 and handshake is not None):
+				if (negotiateBaud(ser, baud_rates, handshake) is None):
+					ser.baudrate = baud_rates[0]
+					print("No clean frames at any baud rate; keeping " + str(baud_rates[0]) + ".")
+				print("Using " + str(ser.baudrate) + " baud.")
+			return ser, port_name
+		except:
+			print("Manual connection attempt failed.")
+
+	# Automatic Connection
+	print("\nAttempting automatic connection...")
+	ports = list(serial.tools.list_ports.comports())
+	if (len(ports) == 0):
+		print("No serial ports detected.")
+		print("Automatic connection attempt failed.")
+		return None, "<NO PORT SELECTED>"
+	print(str(len(ports)) + " serial port(s) detected:")
+	for port in ports:
+		print("\t", tuple(port))
+	start = time.perf_counter()
+	ser, port, timings = discoverTeensy(baud_rates, handshake, timeout, ports)
+	for port_info in ports:
+		if (port_info.device in timings):
+			print("\t{}: {} ({:.3f} s)".format(port_info.device, *timings[port_info.device][::-1]))
+		else:
+			print("\t{}: still probing".format(port_info.device))
+	print("Probing took {:.3f} s.".format(time.perf_counter() - start))
+	if (ser is None):
+		print("Automatic connection attempts failed.")
+		return None, "<NO PORT SELECTED>"
+	ser.timeout = None # Later reads block, as with a manually opened port
+	ser.write_timeout = None
+	print("Connection to " + port.description + " succeeded.")
+	return ser, port.description
@@ -0,0 +1,147 @@
+## Teensy Reader
+## Long-lived serial line reader for the driver Teensy, for Driver_GUI_1-3.py
+##
+## One thread per device reads whatever the port has, frames it into lines (a partial line
+## is kept for the next read) and hands them over in batches: on_lines([(receive_time, text), ...]).
+## A batch goes out PUBLISH_INTERVAL_SEC after the last one at most, so at high line rates the
+## consumer gets a few dozen batches per second instead of one call per line, and a line
+## waits at most about two intervals. Run this file directly to check framing and latency.
+
+import sys
+import time
+import threading
+
+##############################################################
+### READER SETTINGS ###
+##############################################################
+
+PUBLISH_INTERVAL_SEC = 0.02 					# Longest Wait Before Received Lines are Handed Over
+MAX_LINE_BYTES = 4096 							# Longer Runs Without a Newline are Cut Into Lines
+
+##############################################################
+### LINE READER ###
+##############################################################
+
+# Thread Owning Every Read From the Port; on_lines(batch) and on_error(exception) are Called From it
+class LineReader(threading.Thread):
+	def __init__(self, ser, on_lines, on_error=None, interval=PUBLISH_INTERVAL_SEC):
+		super(LineReader, self).__init__(daemon=True)
+		self.ser = ser
+		self.on_lines = on_lines
+		self.on_error = on_error
+		self.interval = interval
+		self.stop_event = threading.Event()
+		self.partial = bytearray()
+		self.lines_read = 0
+		self.bytes_read = 0
+		self.batches = 0
+		self.error = None
+
+	# Complete Lines in data (Without Line Endings), Keeping the Unfinished Rest
+	def frame(self, data):
+		self.partial += data
+		lines = self.partial.split(b"\n")
+		self.partial = lines.pop()
+		if (len(self.partial) > MAX_LINE_BYTES):
+			lines.append(self.partial)
+			self.partial = bytearray()
+		return [line.rstrip(b"\r").decode("utf-8", errors="replace") for line in lines]
+
+	def run(self):
+		self.ser.timeout = self.interval
+		batch = []
+		last_publish = time.perf_counter()
+		while (not self.stop_event.is_set()):
+			try:
+				data = self.ser.read(max(1, self.ser.in_waiting))
+			except Exception as e: # Teensy disconnected or port closed
+				self.error = e
+				if (self.on_error is not None):
+					self.on_error(e)
+				break
+			now = time.perf_counter()
+			if (data):
+				self.bytes_read += len(data)
+				batch.extend((now, line) for line in self.frame(data))
+			if (batch and now - last_publish >= self.interval):
+				self.lines_read += len(batch)
+				self.batches += 1
+				self.on_lines(batch)
+				batch = []
+				last_publish = now
+			elif (not batch):
+				last_publish = now				# First Line After a Quiet Spell Waits One Interval at Most
+
+	def stop(self):
+		self.stop_event.set()
+		self.join()
+
+##############################################################
+### SELF CHECK ###
+##############################################################
+
+def verify(rate=1000, seconds=3.0):
+	import serial
+	from Teensy_Simulator import VirtualTeensy, DriverSimulator, VERIFY_WAVEFORM, EMPTY_WAVEFORM
+
+	# Lines Carrying Their Send Time, Written in Uneven Pieces
+	class TimedLines(VirtualTeensy):
+		def __init__(self):
+			super(TimedLines, self).__init__()
+			self.sent = 0
+			self._start(self._run)
+
+		def _run(self):
+			start = time.perf_counter()
+			pending = b""
+			while (not self.stop_event.is_set() and self.sent < rate*seconds):
+				now = time.perf_counter()
+				while (self.sent < (now - start)*rate):
+					pending += "{:.6f},{}\r\n".format(time.perf_counter(), self.sent).encode()
+					self.sent += 1
+				written = self._write(pending[:len(pending)//2 + 1])
+				pending = pending[written:]
+				time.sleep(0.001)
+			while (pending and not self.stop_event.is_set()):
+				pending = pending[self._write(pending):]
+
+	ok = True
+	with TimedLines() as source:
+		ser = serial.Serial(port=source.port, baudrate=9600)
+		batches = []
+		reader = LineReader(ser, lambda batch: batches.append((time.perf_counter(), batch)))
+		reader.start()
+		time.sleep(seconds + 0.5)
+		reader.stop()
+		ser.close()
+		lines = [text for published, batch in batches for received, text in batch]
+		in_order = [int(text.split(",")[1]) for text in lines] == list(range(source.sent))
+		latencies = sorted(published - float(text.split(",")[0]) for published, batch in batches for received, text in batch)
+		passed = in_order and latencies[-1] < 4*PUBLISH_INTERVAL_SEC
+		print("{} Lines at {} Hz --> {} Batches ({:.0f}/s), All Lines Once and In Order: {}, Latency Mean {:.1f} ms, "
+			  "Max {:.1f} ms --> {}".format(len(lines), rate, len(batches), len(batches)/seconds, in_order,
+			  sum(latencies)/len(latencies)*1000, latencies[-1]*1000, "OK" if passed else "FAIL"))
+		ok = ok and passed
+
+	# Driver Firmware: Command Echo, Then Verification Current Readings
+	with DriverSimulator(seed=0) as simulator:
+		ser = serial.Serial(port=simulator.port, baudrate=9600)
+		lines = []
+		reader = LineReader(ser, lambda batch: lines.extend(text for received, text in batch))
+		reader.start()
+		ser.write(VERIFY_WAVEFORM.encode())
+		time.sleep(1.0)
+		ser.write(EMPTY_WAVEFORM.encode())
+		time.sleep(0.2)
+		reader.stop()
+		ser.close()
+		readings = [float(line) for line in lines[1:-1]]
+		passed = lines[0] == VERIFY_WAVEFORM and lines[-1] == EMPTY_WAVEFORM and len(readings) >= 5
+		print("Driver Simulator --> Echo Framed: {}, {} Current Readings (Mean {:.3f}) --> {}".format(
+			  lines[0] == VERIFY_WAVEFORM, len(readings), sum(readings)/max(len(readings), 1), "OK" if passed else "FAIL"))
+		ok = ok and passed
+	print("Line Reader Verified:", ok)
+	return ok
+
+if __name__ == '__main__':
+	sys.exit(0 if verify() else 1)
@@ -0,0 +1,261 @@
+## Virtual Teensy Simulator
+## Emulates the accelerometer and driver Teensy firmware over a Linux pseudo-terminal
+##
+## Usage:
+##   python Teensy_Simulator.py accelerometer [--rate 3200] [--sequence] [--loss-rate 0.001] [--port-file COM_PORT_2.txt]
+##   python Teensy_Simulator.py driver [--current-rate 10] [--port-file COM_PORT.txt]
+##   python Teensy_Simulator.py benchmark [--rate 3200] [--seconds 5]
+##
+## The simulator writes the pty path into the port file, so Accelerometer_DAQ.py and
+## Driver_GUI_1-3.py pick it up through their normal manual connection attempt. A port file
+## that already exists (the real port configuration) is put back as it was on stop, and only a
+## file the simulator created is deleted. test_Teensy_Simulator.py runs the end-to-end tests (pytest).
+
+import os
+import sys
+import time
+import select
+import argparse
+import threading
+import numpy as np
+
+##############################################################
+### SIMULATOR SETTINGS ###
+##############################################################
+
+## Accelerometer Stream
+ACC_RATE_HZ = 3200 								# Lines per Second
+ACC_TICK_SEC = 0.005 							# Emission Interval (Lines are Sent in Bursts, Like USB Packets)
+ACC_REST_COUNTS = (1.25, 0.5, 31.0) 			# Mean ADC Reading per Axis (Z Axis Pointing Up, ~1g)
+ACC_NOISE_COUNTS = 0.75 						# Gaussian Noise (ADC Counts)
+ACC_VIBRATION_HZ = 120.0 						# Vibration Frequency Added to Every Axis
+ACC_VIBRATION_COUNTS = (4.0, 2.0, 6.0) 			# Vibration Amplitude per Axis (ADC Counts)
+ACC_BACKLOG_BYTES = 65536 						# Unread Bytes Allowed Before New Lines are Dropped
+ACC_LOSS_RATE = 0.0 							# Fraction of Lines Silently Lost (Tests Sample-Loss Detection)
+
+## Driver Protocol (Must Match Driver_GUI_1-3.py)
+EMPTY_WAVEFORM = "0c05000.500.50p010.505050f050050050a0.000.000.001000w0000ff000000ww0aa05000.50"
+VERIFY_WAVEFORM = "1c01800.50" + EMPTY_WAVEFORM[10:]
+CONNECT_WAVEFORM = "2" + EMPTY_WAVEFORM[1:10]
+CONNECT_REPLY = "TEENSY CONNECTION CONFIRM"
+COMMAND_GAP_SEC = 0.02 							# Idle Time that Ends a Command (Commands Have No Terminator)
+CURRENT_RATE_HZ = 10 							# Verification Current Reports per Second
+CURRENT_MEAN_AMPS = 0.55 						# Simulated Verification Current
+
+##############################################################
+### PSEUDO-TERMINAL ###
+##############################################################
+
+class VirtualTeensy:
+	def __init__(self, port_file=None):
+		try:
+			import tty
+		except ImportError:
+			raise OSError("The Teensy simulator needs a POSIX pseudo-terminal (Linux or macOS)")
+		self.master, self.slave = os.openpty()
+		tty.setraw(self.slave) # No echo or newline translation, like a real USB serial port
+		os.set_blocking(self.master, False)
+		self.port = os.ttyname(self.slave)
+		self.port_file = port_file
+		self.port_file_backup = None			# Contents of a Port File That Existed Before, Restored on stop()
+		self.stop_event = threading.Event()
+		self.threads = []
+		self.bytes_sent = 0
+		if (port_file is not None):
+			if (os.path.exists(port_file)):
+				with open(port_file, "rb") as port_in:
+					self.port_file_backup = port_in.read()
+			with open(port_file, "w") as port_out:
+				port_out.write(self.port)
+
+	def _start(self, target):
+		thread = threading.Thread(target=target, daemon=True)
+		thread.start()
+		self.threads.append(thread)
+
+	# Non-Blocking Write; Returns the Number of Bytes Accepted by the pty
+	def _write(self, data):
+		try:
+			written = os.write(self.master, data)
+		except BlockingIOError:
+			written = 0
+		self.bytes_sent += written
+		return written
+
+	def _read(self, timeout):
+		ready, _, _ = select.select([self.master], [], [], timeout)
+		if (not ready):
+			return b""
+		try:
+			return os.read(self.master, 4096)
+		except (BlockingIOError, OSError):
+			return b""
+
+	def stop(self):
+		self.stop_event.set()
+		for thread in self.threads:
+			thread.join()
+		os.close(self.master)
+		os.close(self.slave)
+		if (self.port_file is None):
+			return
+		if (self.port_file_backup is not None):
+			with open(self.port_file, "wb") as port_out:
+				port_out.write(self.port_file_backup)
+		elif (os.path.exists(self.port_file)):
+			os.remove(self.port_file)
+		self.port_file = None					# A Second stop() Leaves the File Alone
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+##############################################################
+### ACCELEROMETER FIRMWARE ###
+##############################################################
+
+class AccelerometerSimulator(VirtualTeensy):
+	def __init__(self, port_file=None, rate=ACC_RATE_HZ, seed=None, sequence=False, loss_rate=ACC_LOSS_RATE):
+		super(AccelerometerSimulator, self).__init__(port_file)
+		self.rate = rate
+		self.sequence = sequence				# Append "n<count>" to Every Line
+		self.loss_rate = loss_rate
+		self.rng = np.random.default_rng(seed)
+		self.lines_sent = 0
+		self.lines_dropped = 0
+		self.pending = bytearray()
+		self._start(self._run)
+
+	def _lines(self, first, count):
+		t = (np.arange(count) + first) / self.rate
+		vibration = np.sin(2*np.pi*ACC_VIBRATION_HZ*t)
+		readings = (np.asarray(ACC_REST_COUNTS)[:, None]
+					+ np.asarray(ACC_VIBRATION_COUNTS)[:, None]*vibration
+					+ self.rng.normal(0.0, ACC_NOISE_COUNTS, (3, count)))
+		readings = np.round(readings*4)/4 # Quarter-Count Resolution, Like the Averaged ADC Readings
+		rows = zip(*readings.tolist(), range(first, first+count))
+		line_format = "%.2fy%.2fz%.2fn%d\r\n" if self.sequence else "%.2fy%.2fz%.2f\r\n"
+		if (self.loss_rate > 0):
+			kept = (self.rng.random(count) >= self.loss_rate).tolist()
+			rows = [row for row, keep in zip(rows, kept) if keep]
+		return "".join([line_format % (row if self.sequence else row[:3]) for row in rows]).encode()
+
+	def _run(self):
+		start = time.perf_counter()
+		while (not self.stop_event.wait(ACC_TICK_SEC)):
+			self._read(0) # Discard anything the host sends
+			due = int((time.perf_counter() - start)*self.rate) - (self.lines_sent + self.lines_dropped)
+			if (due <= 0):
+				continue
+			if (len(self.pending) > ACC_BACKLOG_BYTES): # Host is not keeping up: drop this burst
+				self.lines_dropped += due
+			else:
+				self.pending += self._lines(self.lines_sent + self.lines_dropped, due)
+				self.lines_sent += due
+			del self.pending[:self._write(bytes(self.pending))]
+
+##############################################################
+### DRIVER FIRMWARE ###
+##############################################################
+
+class DriverSimulator(VirtualTeensy):
+	def __init__(self, port_file=None, seed=None, current_rate=CURRENT_RATE_HZ):
+		super(DriverSimulator, self).__init__(port_file)
+		self.rng = np.random.default_rng(seed)
+		self.current_rate = current_rate
+		self.commands = []						# (Receive Time, Command String) for Every Command
+		self.verifying = False
+		self._start(self._run)
+
+	def _send(self, line):
+		self._write((line + "\r\n").encode())
+
+	def _handle(self, command):
+		self.commands.append((time.perf_counter(), command))
+		self._send(command) # Firmware echoes every command before acting on it
+		if (command == CONNECT_WAVEFORM):
+			self._send(CONNECT_REPLY)
+		self.verifying = (command == VERIFY_WAVEFORM)
+
+	def _run(self):
+		buffer = bytearray()
+		last_byte = 0.0
+		next_report = time.perf_counter()
+		while (not self.stop_event.is_set()):
+			data = self._read(COMMAND_GAP_SEC/4)
+			now = time.perf_counter()
+			if (data):
+				buffer += data
+				last_byte = now
+			elif (buffer and now - last_byte >= COMMAND_GAP_SEC):
+				self._handle(buffer.decode(errors="replace").strip())
+				buffer.clear()
+			if (not self.verifying):
+				next_report = now
+			while (self.verifying and now >= next_report): # Catch Up After a Slow Loop at High Rates
+				self._send("%.3f" % self.rng.normal(CURRENT_MEAN_AMPS, 0.02))
+				next_report += 1.0/self.current_rate
+
+##############################################################
+### END-TO-END BENCHMARK ###
+##############################################################
+
+# Stream from the Simulator Through pyserial and the Bulk Decoder, Report Throughput and Losses
+def benchmark(rate=ACC_RATE_HZ, seconds=5.0, sequence=False, loss_rate=ACC_LOSS_RATE):
+	import serial
+	from Accelerometer_Stream import StreamDecoder, TimingMonitor
+	with AccelerometerSimulator(rate=rate, seed=0, sequence=sequence, loss_rate=loss_rate) as simulator:
+		ser = serial.Serial(port=simulator.port, baudrate=921600, timeout=0.1)
+		decoder = StreamDecoder(sequence=sequence)
+		monitor = TimingMonitor(rate)
+		received = 0
+		start = time.perf_counter()
+		while (time.perf_counter() - start < seconds):
+			block = decoder.read(ser)
+			monitor.record(block)
+			received += len(block)
+		elapsed = time.perf_counter() - start
+		ser.close()
+		print("Simulated Rate: {} Hz for {:.1f} s".format(rate, elapsed))
+		print("Samples Received: {} ({:.0f} Samples/s)".format(received, received/elapsed))
+		print("Lines Sent: {}, Dropped by Simulator: {}, Malformed: {}".format(
+			  simulator.lines_sent, simulator.lines_dropped, decoder.malformed))
+		monitor.printSummary()
+
+##############################################################
+### MAIN FUNCTION ###
+##############################################################
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Virtual Teensy over a pseudo-terminal")
+	parser.add_argument("mode", choices=["accelerometer", "driver", "benchmark"])
+	parser.add_argument("--rate", type=float, default=ACC_RATE_HZ, help="accelerometer lines per second")
+	parser.add_argument("--seconds", type=float, default=5.0, help="benchmark duration")
+	parser.add_argument("--sequence", action="store_true", help="append a sequence counter (n<count>) to each line")
+	parser.add_argument("--loss-rate", type=float, default=ACC_LOSS_RATE, help="fraction of lines silently lost")
+	parser.add_argument("--current-rate", type=float, default=CURRENT_RATE_HZ, help="driver verification current reports per second")
+	parser.add_argument("--port-file", default=None, help="file to receive the pty path (COM_PORT_2.txt / COM_PORT.txt)")
+	args = parser.parse_args()
+
+	if (args.mode == "benchmark"):
+		benchmark(args.rate, args.seconds, args.sequence, args.loss_rate)
+		sys.exit()
+
+	if (args.port_file is None):
+		args.port_file = "COM_PORT_2.txt" if args.mode == "accelerometer" else "COM_PORT.txt"
+	if (args.mode == "accelerometer"):
+		simulator = AccelerometerSimulator(args.port_file, rate=args.rate, sequence=args.sequence,
+										   loss_rate=args.loss_rate)
+	else:
+		simulator = DriverSimulator(args.port_file, current_rate=args.current_rate)
+	print("Virtual Teensy (" + args.mode + ") on " + simulator.port + " --> written to " + args.port_file
+		  + (" (Previous Contents Restored on Exit)" if simulator.port_file_backup is not None else ""))
+	print("Press Ctrl+C to stop.")
+	try:
+		while True:
+			time.sleep(1)
+	except KeyboardInterrupt:
+		pass
+	simulator.stop()
+	print("Stopped.")
@@ -0,0 +1,193 @@
+## Teensy Writer
+## Background command writer for the driver Teensy, for Driver_GUI_1-3.py
+##
+## The GUI thread only hands commands to send(); one writer thread does every write and
+## flush, so a slow or wedged USB link no longer freezes the window. Waiting commands
+## collapse to the latest one, and the stop command (EMPTY_WAVEFORM) goes out before any
+## waiting waveform and discards the ones sent before it. Commands are spaced at least
+## MIN_COMMAND_GAP_SEC apart, as the firmware tells unterminated commands apart by the idle
+## time between them. Latency is measured from send() until flush() returns. Run this file
+## directly to check the queue rules against Teensy_Simulator.py (driver mode).
+
+import sys
+import time
+import threading
+import collections
+
+##############################################################
+### WRITER SETTINGS ###
+##############################################################
+
+MIN_COMMAND_GAP_SEC = 0.05 						# Idle Time Between Commands (Simulator Needs 0.02)
+LATENCY_HISTORY = 1000 							# Latest Command Latencies Kept for latencySummary()
+
+##############################################################
+### COMMAND WRITER ###
+##############################################################
+
+# Thread Owning Every Write to the Port; on_written(command, latency_sec) and
+# on_error(command, exception) are Called From the Writer Thread
+class CommandWriter(threading.Thread):
+	def __init__(self, ser, stop_command, on_written=None, on_error=None, gap=MIN_COMMAND_GAP_SEC):
+		super(CommandWriter, self).__init__(daemon=True)
+		self.ser = ser
+		self.stop_command = stop_command
+		self.on_written = on_written
+		self.on_error = on_error
+		self.gap = gap
+		self.lock = threading.Lock()
+		self.pending = threading.Condition(self.lock)
+		self.stop_time = None					# send() Time of a Waiting Stop Command
+		self.command = None						# (Command, send() Time) of the Latest Waiting Waveform
+		self.closing = False
+		self.written = 0						# Commands Written
+		self.coalesced = 0						# Commands Replaced Before Being Written
+		self.latencies = collections.deque(maxlen=LATENCY_HISTORY)
+		self.error = None						# Last Write Error
+
+	def send(self, command):
+		with self.pending:
+			now = time.perf_counter()
+			if (command == self.stop_command):
+				if (self.command is not None):
+					self.coalesced += 1
+					self.command = None
+				if (self.stop_time is None):
+					self.stop_time = now
+				else:
+					self.coalesced += 1			# Latency Counted From the First of Several Stops
+			else:
+				if (self.command is not None):
+					self.coalesced += 1
+				self.command = (command, now)
+			self.pending.notify()
+
+	def _waiting(self):
+		return self.stop_time is not None or self.command is not None
+
+	# Next Command to Write (Stop First), Called With the Lock Held
+	def _next(self):
+		if (self.stop_time is not None):
+			item = (self.stop_command, self.stop_time)
+			self.stop_time = None
+		else:
+			item = self.command
+			self.command = None
+		return item
+
+	def run(self):
+		last_write = float("-inf")
+		while True:
+			with self.pending:
+				self.pending.wait_for(lambda: self.closing or self._waiting())
+				if (not self._waiting()):
+					break						# Closing With Nothing Left to Write
+			wait = last_write + self.gap - time.perf_counter()
+			if (wait > 0):
+				time.sleep(wait)				# Commands Sent Meanwhile Replace the Waiting One
+			with self.pending:
+				command, queued = self._next()
+			try:
+				self.ser.write(command.encode())
+				self.ser.flush()
+			except Exception as e: # Teensy disconnected or port closed
+				self.error = e
+				if (self.on_error is not None):
+					self.on_error(command, e)
+				continue
+			last_write = time.perf_counter()
+			latency = last_write - queued
+			self.written += 1
+			self.latencies.append(latency)
+			if (self.on_written is not None):
+				self.on_written(command, latency)
+
+	# Write Anything Still Waiting, Then End the Thread
+	def close(self, timeout=None):
+		with self.pending:
+			self.closing = True
+			self.pending.notify()
+		self.join(timeout)
+
+	def latencySummary(self):
+		latencies = sorted(self.latencies)
+		if (not latencies):
+			return {"written": self.written, "coalesced": self.coalesced}
+		return {
+			"written": self.written,
+			"coalesced": self.coalesced,
+			"mean_ms": round(sum(latencies)/len(latencies)*1000, 3),
+			"p95_ms": round(latencies[int(0.95*(len(latencies) - 1))]*1000, 3),
+			"max_ms": round(latencies[-1]*1000, 3),
+		}
+
+##############################################################
+### SELF CHECK ###
+##############################################################
+
+# Port Wrapper Making Every Write Take delay Seconds (a Slow USB Link)
+class _SlowPort:
+	def __init__(self, ser, delay):
+		self.ser = ser
+		self.delay = delay
+
+	def write(self, data):
+		time.sleep(self.delay)
+		return self.ser.write(data)
+
+	def flush(self):
+		self.ser.flush()
+
+def verify():
+	import serial
+	from Teensy_Simulator import DriverSimulator, EMPTY_WAVEFORM
+
+	def waveform(number):
+		return "1c0{:03d}0.500.50".format(number) + EMPTY_WAVEFORM[15:]
+
+	def received(simulator, since):
+		time.sleep(1.0)
+		return [command for received_time, command in simulator.commands if received_time > since]
+
+	ok = True
+	with DriverSimulator(seed=0) as simulator:
+		ser = serial.Serial(port=simulator.port, baudrate=9600, timeout=0.1)
+		writer = CommandWriter(_SlowPort(ser, 0.1), EMPTY_WAVEFORM)
+		writer.start()
+
+		# Rapid Selections: the GUI Thread Never Waits, and a Few Writes (Ending With the Latest) Cover All 30
+		start = time.perf_counter()
+		send_times = []
+		for number in range(1, 31):
+			before = time.perf_counter()
+			writer.send(waveform(number))
+			send_times.append(time.perf_counter() - before)
+			time.sleep(0.005)
+		commands = received(simulator, start)
+		passed = commands[:1] == [waveform(1)] and commands[-1:] == [waveform(30)] and len(commands) <= 4
+		print("30 Rapid Selections --> {} Written, Latest Last: {}, Longest send() {:.3f} ms --> {}".format(
+			  len(commands), commands[-1:] == [waveform(30)], max(send_times)*1000, "OK" if passed else "FAIL"))
+		ok = ok and passed
+
+		# Stop Replaces a Waiting Waveform, and Goes Before One Sent After it
+		for sequence, expected in (((1, 2, "stop"), [waveform(1), EMPTY_WAVEFORM]),
+								   ((1, "stop", 3), [waveform(1), EMPTY_WAVEFORM, waveform(3)])):
+			start = time.perf_counter()
+			for item in sequence:
+				writer.send(EMPTY_WAVEFORM if item == "stop" else waveform(item))
+				if (item == sequence[0]):
+					time.sleep(0.02)			# The Rest Arrive While the First is Being Written
+			commands = received(simulator, start)
+			passed = commands == expected
+			print("Sent {} --> Written {} --> {}".format(list(sequence), ["stop" if command == EMPTY_WAVEFORM else
+				  int(command[3:6]) for command in commands], "OK" if passed else "FAIL"))
+			ok = ok and passed
+
+		writer.close()
+		ser.close()
+		print("Latency:", writer.latencySummary())
+	print("Command Writer Verified:", ok)
+	return ok
+
+if __name__ == '__main__':
+	sys.exit(0 if verify() else 1)
@@ -0,0 +1,191 @@
+## Verify Plot
+## Live scrolling plot of the verification current for Driver_GUI_1-3.py
+##
+## Readings go into a fixed-size NumPy ring buffer (ReadingHistory), so memory stays the
+## same however long verification runs. Adding readings only marks the plot out of date; a
+## timer redraws it at most FRAME_RATE_HZ times per second, drawing the last
+## PLOT_WINDOW_SEC as a min/max envelope (Accelerometer_Plot.minMaxDecimate) of at most
+## 2*PLOT_BINS points, with the mean, RMS and peak of the last STATS_WINDOW_SEC.
+## Run this file directly to measure the frame rate at a 1 kHz reading rate (needs PyQt5 and pyqtgraph).
+
+import sys
+import time
+import collections
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QTimer
+from Accelerometer_Plot import minMaxDecimate
+
+##############################################################
+### PLOT SETTINGS ###
+##############################################################
+
+HISTORY_SAMPLES = 1 << 20 						# Readings Kept (About 17 Minutes at 1 kHz, 16 MB)
+PLOT_WINDOW_SEC = 30.0 							# Time Span Shown
+STATS_WINDOW_SEC = 10.0 						# Time Span of the Rolling Mean, RMS and Peak
+FRAME_RATE_HZ = 30 								# Redraws per Second at Most
+PLOT_BINS = 1000 								# Envelope Bins Across the Plot
+FRAME_HISTORY = 300 							# Latest Redraw Times Kept for frameSummary()
+
+##############################################################
+### READING HISTORY ###
+##############################################################
+
+# Fixed-Size Ring of (Time, Value) Readings; Times Must Not Decrease
+class ReadingHistory:
+	def __init__(self, capacity=HISTORY_SAMPLES):
+		self.times = np.zeros(capacity)
+		self.values = np.zeros(capacity)
+		self.capacity = capacity
+		self.count = 0							# Readings Added in Total
+
+	def __len__(self):
+		return min(self.count, self.capacity)
+
+	def append(self, times, values):
+		times = np.asarray(times, dtype=np.float64)[-self.capacity:]
+		values = np.asarray(values, dtype=np.float64)[-self.capacity:]
+		count = len(values)
+		start = self.count % self.capacity
+		first = min(count, self.capacity - start)
+		self.times[start:start+first] = times[:first]
+		self.values[start:start+first] = values[:first]
+		self.times[:count-first] = times[first:]
+		self.values[:count-first] = values[first:]
+		self.count += count
+
+	# Readings (Oldest First) From the Last seconds Before the Newest One
+	def latest(self, seconds):
+		if (self.count == 0):
+			return np.empty(0), np.empty(0)
+		end = self.count % self.capacity
+		if (self.count <= self.capacity):
+			segments = [slice(0, self.count)]
+		else:
+			segments = [slice(end, self.capacity), slice(0, end)]	# Older Part First
+		threshold = self.times[(self.count - 1) % self.capacity] - seconds
+		parts = []
+		for segment in reversed(segments):
+			times = self.times[segment]
+			first = np.searchsorted(times, threshold)
+			parts.insert(0, (times[first:], self.values[segment][first:]))
+			if (first > 0):
+				break
+		return np.concatenate([times for times, values in parts]), np.concatenate([values for times, values in parts])
+
+	def clear(self):
+		self.count = 0
+
+# Mean, RMS and Peak (Largest Magnitude) of values
+def rollingStats(values):
+	if (len(values) == 0):
+		return float("nan"), float("nan"), float("nan")
+	return float(values.mean()), float(np.sqrt(np.mean(values*values))), float(np.abs(values).max())
+
+##############################################################
+### LIVE PLOT ###
+##############################################################
+
+class CurrentPlot(pg.PlotWidget):
+	def __init__(self, parent=None, frame_rate=FRAME_RATE_HZ):
+		super(CurrentPlot, self).__init__(parent)
+		self.history = ReadingHistory()
+		self.start_time = None
+		self.dirty = False
+		self.frame_times = collections.deque(maxlen=FRAME_HISTORY)	# (Redraw Start, Redraw Seconds)
+		self.setBackground("#262626")
+		self.setLabel("bottom", "Time (s)")
+		self.setLabel("left", "Current (A)")
+		self.showGrid(x=True, y=True, alpha=0.3)
+		self.setMouseEnabled(x=False, y=False)
+		self.curve = self.plot(pen=pg.mkPen("#538DD5"))
+		self.stats = pg.TextItem(color="#538DD5", anchor=(0, 0))
+		self.stats.setParentItem(self.getPlotItem().getViewBox())
+		self.timer = QTimer(self)
+		self.timer.setInterval(int(1000/frame_rate))
+		self.timer.timeout.connect(self.redraw)
+		self.timer.start()
+
+	# Readings Arrive at Any Rate; Only the Next Timer Tick Draws Them
+	def addReadings(self, times, values):
+		if (len(values) == 0):
+			return
+		if (self.start_time is None):
+			self.start_time = times[0]
+		self.history.append(np.asarray(times) - self.start_time, values)
+		self.dirty = True
+
+	# Start Over (Not Named clear: PlotWidget Replaces That With PlotItem.clear, Which Removes the Curve)
+	def clearReadings(self):
+		self.history.clear()
+		self.start_time = None
+		self.dirty = False
+		self.curve.setData([], [])
+		self.stats.setText("")
+
+	def redraw(self):
+		if (not self.dirty):
+			return
+		start = time.perf_counter()
+		self.dirty = False
+		times, values = self.history.latest(PLOT_WINDOW_SEC)
+		if (len(times) == 0):
+			return
+		self.curve.setData(*minMaxDecimate(times, values, PLOT_BINS))
+		mean, rms, peak = rollingStats(values[np.searchsorted(times, times[-1] - STATS_WINDOW_SEC):])
+		self.stats.setText("Last {:.0f} s:  Mean {:.3f} A   RMS {:.3f} A   Peak {:.3f} A".format(
+						   STATS_WINDOW_SEC, mean, rms, peak))
+		self.frame_times.append((start, time.perf_counter() - start))
+
+	# Redraws per Second and Redraw Cost Over the Kept Frames
+	def frameSummary(self):
+		if (len(self.frame_times) < 2):
+			return {"frames": len(self.frame_times)}
+		starts = [start for start, seconds in self.frame_times]
+		costs = sorted(seconds for start, seconds in self.frame_times)
+		return {
+			"frames": len(costs),
+			"fps": round((len(starts) - 1)/(starts[-1] - starts[0]), 1),
+			"mean_ms": round(sum(costs)/len(costs)*1000, 3),
+			"p95_ms": round(costs[int(0.95*(len(costs) - 1))]*1000, 3),
+			"max_ms": round(costs[-1]*1000, 3),
+		}
+
+##############################################################
+### BENCHMARK ###
+##############################################################
+
+# Feed 1 kHz Readings in Reader-Sized Batches After Filling the History (Hours of Data at Most),
+# Then Check the Plot Keeps FRAME_RATE_HZ and Each Frame Leaves Most of its Time to the GUI
+def benchmark(rate=1000, seconds=10.0, batch_sec=0.02):
+	from Teensy_Reader import PUBLISH_INTERVAL_SEC
+	app = pg.mkQApp()
+	plot = CurrentPlot()
+	plot.resize(900, 400)
+	plot.show()
+	rng = np.random.default_rng(0)
+	prefill = np.arange(HISTORY_SAMPLES) / rate
+	plot.addReadings(prefill - prefill[-1] + time.perf_counter(), rng.normal(0.55, 0.02, HISTORY_SAMPLES))
+
+	feeder = QTimer()
+	fed = [0]
+	start = time.perf_counter()
+	def feed():
+		due = int((time.perf_counter() - start)*rate) - fed[0]
+		now = time.perf_counter()
+		plot.addReadings(now - np.arange(due)[::-1]/rate, rng.normal(0.55, 0.02, due))
+		fed[0] += due
+	feeder.timeout.connect(feed)
+	feeder.start(int(PUBLISH_INTERVAL_SEC*1000))
+	QTimer.singleShot(int(seconds*1000), app.quit)
+	app.exec_()
+
+	summary = plot.frameSummary()
+	passed = summary["fps"] >= FRAME_RATE_HZ*0.9 and summary["p95_ms"] < 1000/FRAME_RATE_HZ/2
+	print("{} Readings at {} Hz on Top of a Full {}-Reading History --> {} fps, Redraw Mean {} ms, "
+		  "p95 {} ms, Max {} ms --> {}".format(fed[0], rate, HISTORY_SAMPLES, summary["fps"], summary["mean_ms"],
+		  summary["p95_ms"], summary["max_ms"], "OK" if passed else "FAIL"))
+	return passed
+
+if __name__ == '__main__':
+	sys.exit(0 if benchmark() else 1)
@@ -0,0 +1,146 @@
+## Waveform Cache
+## Compiled waveform strings of a workbook, saved between Driver_GUI_1-3.py sessions
+##
+## Cache file (JSON):
+##   settings        encoder settings the strings were built with (format version, MAX_VOLTAGE,
+##                   DUAL_ACTUATOR_SCALER); any difference discards the whole cache
+##   workbook_hash   SHA-256 of the workbook file; a match means no Excel parsing at all
+##   sheet_list      sheet names in workbook order
+##   sheets          per sheet: hash of its cell values and the waves/notes/numbers encoded from them
+## When the workbook changed, its sheets are parsed again but only those whose cells differ
+## from the cached ones are re-encoded. The file is replaced atomically, so an interrupted
+## save leaves the previous cache. Run this file directly to time a launch with and without the cache.
+
+import os
+import sys
+import json
+import time
+import hashlib
+
+##############################################################
+### CACHE SETTINGS ###
+##############################################################
+
+CACHE_VERSION = 1 								# Increase When the Command Format Changes
+HASH_CHUNK = 1 << 20 							# Bytes Read per Step While Hashing the Workbook
+
+##############################################################
+### HASHES ###
+##############################################################
+
+def fileHash(path):
+	digest = hashlib.sha256()
+	with open(path, "rb") as workbook:
+		for chunk in iter(lambda: workbook.read(HASH_CHUNK), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+# Hash of a Sheet's Columns (From Waveform_Encoder.sheetColumns)
+#
+# The repr of numpy scalars names their type, so a cell changing from 1 to 1.0 (which
+# encodes differently) changes the hash too.
+def sheetHash(columns):
+	return hashlib.sha256(repr(columns).encode("utf-8")).hexdigest()
+
+def cacheSettings(max_voltage, dual_actuator_scaler):
+	return {"version": CACHE_VERSION, "max_voltage": max_voltage, "dual_actuator_scaler": dual_actuator_scaler}
+
+##############################################################
+### CACHE FILE ###
+##############################################################
+
+def emptyCache(settings):
+	return {"settings": settings, "workbook_hash": None, "sheet_list": [], "sheets": {}}
+
+# Cache Built With settings, or an Empty One if the File is Missing, Unreadable or Built Otherwise
+def loadCache(path, settings):
+	try:
+		with open(path, "r", encoding="utf-8") as cache_file:
+			cache = json.load(cache_file)
+		if (cache.get("settings") == settings and isinstance(cache.get("sheets"), dict)):
+			return cache
+	except (OSError, ValueError, AttributeError):
+		pass
+	return emptyCache(settings)
+
+def cacheEntry(sheet_hash, waves, notes, numbers):
+	return {"hash": sheet_hash, "waves": waves, "notes": notes, "numbers": numbers}
+
+# Write the Cache Atomically; Returns False (Keeping Any Previous File) if it Cannot be Saved
+def saveCache(path, cache):
+	temp_path = path + ".tmp"
+	try:
+		with open(temp_path, "w", encoding="utf-8") as cache_file:
+			json.dump(cache, cache_file, separators=(",", ":"))
+		os.replace(temp_path, path)
+		return True
+	except (OSError, TypeError, ValueError):	# TypeError: Notes That are not Text
+		if (os.path.exists(temp_path)):
+			os.remove(temp_path)
+		return False
+
+##############################################################
+### BENCHMARK ###
+##############################################################
+
+# Launch Time Spent on Waveforms: Full Excel Parse, Unchanged Workbook, One Sheet Edited
+def benchmark(sheet_count=4, row_num=2000, max_voltage=0.8, dual_actuator_scaler=1.0):
+	import tempfile
+	import pandas as pd
+	from Waveform_Encoder import encodeWaveforms, sheetColumns, syntheticSheet
+
+	settings = cacheSettings(max_voltage, dual_actuator_scaler)
+
+	# Same Steps as Driver_GUI_1-3.py loadWaveforms()
+	def launch(workbook_path, cache_path):
+		workbook_hash = fileHash(workbook_path)
+		cache = loadCache(cache_path, settings)
+		if (cache["workbook_hash"] == workbook_hash):
+			return {name: cache["sheets"][name]["waves"] for name in cache["sheet_list"]}, 0
+		waveform_file = pd.ExcelFile(workbook_path)
+		result, sheets, encoded = {}, {}, 0
+		for name in waveform_file.sheet_names:
+			sheet = waveform_file.parse(name)
+			sheet.fillna(-1, inplace = True)
+			columns = sheetColumns(sheet.iloc[2:])
+			sheet_hash = sheetHash(columns)
+			entry = cache["sheets"].get(name)
+			if (entry is None or entry["hash"] != sheet_hash):
+				entry = cacheEntry(sheet_hash, *encodeWaveforms(columns, max_voltage, dual_actuator_scaler))
+				encoded += 1
+			sheets[name] = entry
+			result[name] = entry["waves"]
+		saveCache(cache_path, dict(cache, workbook_hash=workbook_hash, sheet_list=waveform_file.sheet_names, sheets=sheets))
+		return result, encoded
+
+	def timed(*args):
+		start = time.perf_counter()
+		result, encoded = launch(*args)
+		return time.perf_counter() - start, result, encoded
+
+	with tempfile.TemporaryDirectory() as directory:
+		workbook_path = os.path.join(directory, "waveforms.xlsx")
+		cache_path = os.path.join(directory, "waveform_cache.json")
+		sheets = {"Sheet {}".format(i): syntheticSheet(pd, row_num, seed=i) for i in range(sheet_count)}
+		def writeWorkbook():
+			with pd.ExcelWriter(workbook_path) as writer:
+				for name, sheet in sheets.items():
+					header = pd.DataFrame([[-1]*sheet.shape[1]]*2, columns=sheet.columns) # The Two Rows Skipped by iloc[2:]
+					pd.concat((header, sheet)).to_excel(writer, sheet_name=name, index=False)
+		writeWorkbook()
+
+		first, built, first_encoded = timed(workbook_path, cache_path)
+		cached, loaded, cached_encoded = timed(workbook_path, cache_path)
+		sheets["Sheet 0"].iloc[5, 2] = 777
+		writeWorkbook()
+		edited, rebuilt, edited_encoded = timed(workbook_path, cache_path)
+
+		print("Waveform Cache ({} Sheets x {} Rows, Cache {:.0f} kB):".format(sheet_count, row_num, os.path.getsize(cache_path)/1e3))
+		print("\tNo Cache:           {:8.3f} s, {} Sheet(s) Encoded".format(first, first_encoded))
+		print("\tWorkbook Unchanged: {:8.3f} s, {} Sheet(s) Encoded, Same Strings: {}".format(cached, cached_encoded, loaded == built))
+		print("\tOne Sheet Edited:   {:8.3f} s, {} Sheet(s) Encoded, Edit Picked Up: {}".format(
+			  edited, edited_encoded, rebuilt["Sheet 0"] != built["Sheet 0"] and rebuilt["Sheet 1"] == built["Sheet 1"]))
+		return loaded == built and cached_encoded == 0 and edited_encoded == 1
+
+if __name__ == '__main__':
+	sys.exit(0 if benchmark() else 1)
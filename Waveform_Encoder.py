@@ -0,0 +1,347 @@
+## Waveform Encoder
+## Column-wise encoding of waveform workbook sheets into driver Teensy command strings
+##
+## Driver_GUI_1-3.py builds one command per test row:
+##   1 c<channel><frequency><amplitude><duty> p<pulse> f<fade> a<amplitudes> w<delay>
+##     ff<...> ww<...> aa<...> wav<wav file>
+## Every field is a fixed-width rendering of one or a few sheet columns. encodeWaveforms()
+## pulls each column out of the sheet once and renders every field for all rows in one
+## pass, instead of looking up each cell with sheet.iloc[num][k] several times per row.
+##
+## The output must be byte-identical to the row-by-row encoder it replaces (kept below as
+## encodeWaveformsLegacy), so the columns hold exactly the scalars row access returns:
+## numpy scalars for numeric columns, which round() and str() treat differently from
+## Python floats. numpy and pandas are left to the caller, so importing this module is free.
+## Run this file directly for the golden check and the benchmark (needs pandas).
+
+import sys
+import time
+
+##############################################################
+### ENCODER SETTINGS ###
+##############################################################
+
+NOTE_LABEL = "Note:" 							# Column 0 of a Row Holding a Message Instead of a Test
+COLUMNS = 25 									# Sheet Columns Used by the Command Format
+FADE_ON = (1, 3)								# Column 9 Modes With the Fade (f) Section Enabled
+AMPLITUDE_ON = (2, 3)							# Column 9 Modes With the Amplitude (a) Section Enabled
+FF_ON = (1, 3, 4, 5)							# Column 17 Modes With the ff Section Enabled
+WW_ON = (4, 5)									# Column 17 Modes With the ww Section Enabled
+AA_ON = (2, 3, 5)								# Column 17 Modes With the aa Section Enabled
+
+##############################################################
+### COLUMN EXTRACTION ###
+##############################################################
+
+# Every Column of a Sheet as the List of Scalars sheet.iloc[num][k] Would Return
+#
+# Row access converts a row to the common dtype of all columns: object when any column
+# holds text (numeric cells then stay numpy scalars of their column's dtype), otherwise
+# the shared numeric dtype.
+def sheetColumns(sheet):
+	row_dtype = sheet.iloc[0].dtype if len(sheet.index) > 0 else object
+	if (row_dtype == object):
+		return [list(sheet.iloc[:, k].to_numpy()) for k in range(sheet.shape[1])]
+	return [list(sheet.iloc[:, k].to_numpy(dtype=row_dtype)) for k in range(sheet.shape[1])]
+
+##############################################################
+### COLUMN-WISE ENCODER ###
+##############################################################
+
+# Encode One Sheet's Columns; Returns (Waveform Strings, Note Texts, Note Test Numbers)
+#
+# Rows up to the first with a negative column 1 are tests, apart from "Note:" rows. Like
+# the row-by-row encoder, a row with any other column 1 value keeps the previous row's
+# voltage scaler, and a sheet without notes is rejected (IndexError).
+def encodeWaveforms(columns, max_voltage, dual_actuator_scaler):
+	rows = []
+	modes = []
+	notes = []
+	note_nums = []
+	for num, (label, mode) in enumerate(zip(columns[0], columns[1])):
+		if (label == NOTE_LABEL):
+			note_nums.append(len(rows))
+			notes.append(mode)
+			continue
+		mode = int(mode)
+		if (mode < 0):
+			break
+		rows.append(num)
+		modes.append(mode)
+
+	scalers = []
+	scaler = None
+	for mode in modes:
+		if (mode == 0):
+			scaler = 120.0/max_voltage
+		elif (mode == 1):
+			scaler = 120.0/(max_voltage*dual_actuator_scaler)
+		if (scaler is None):
+			raise ValueError("First test row must use channel mode 0 or 1")
+		scalers.append(scaler)
+
+	def column(k):
+		values = columns[k]
+		return [values[num] for num in rows]
+
+	def percent(values, scalers=None):
+		if (scalers is None):
+			return ["0." + str(int(value*100)).zfill(2) for value in values]
+		return ["0." + str(int(value/scaler*100)).zfill(2) for value, scaler in zip(values, scalers)]
+
+	def zfill(values, width, enabled):
+		return [str(value).zfill(width) if on else "" for value, on in zip(values, enabled)]
+
+	c = ["c" + str(channel) + str(frequency).zfill(3) + amplitude + duty
+		 for channel, frequency, amplitude, duty in zip(column(1), column(2), percent(column(3), scalers), percent(column(4)))]
+
+	pulse = [int(value) >= 0 for value in column(5)]
+	rounded = [round(value, 2) if on else None for value, on in zip(column(6), pulse)]
+	p = ["p1" + str(value) + str(width) + ("0" if width*10 % 1 == 0 else "") + count + period
+		 if on else "p010.505050"
+		 for on, value, width, count, period in zip(pulse, column(5), rounded,
+													zfill(column(7), 2, pulse), zfill(column(8), 2, pulse))]
+
+	fade_modes = [int(value) for value in column(9)]
+	fade = [mode >= 0 for mode in fade_modes]
+	f = ["f" + ("1" if mode in FADE_ON else "0") + start + stop + steps + length if on else "f050050050"
+		 for on, mode, start, stop, steps, length in zip(fade, fade_modes, zfill(column(10), 3, fade),
+														 zfill(column(11), 3, fade), zfill(column(12), 2, fade),
+														 zfill(column(13), 4, fade))]
+	a = ["a" + ("1" if mode in AMPLITUDE_ON else "0") + "0." + str(int(low/scaler*100)).zfill(2)
+		 + "0." + str(int(high/scaler*100)).zfill(2) if mode >= 0 else "a0.000.000.001000"
+		 for mode, low, high, scaler in zip(fade_modes, column(14), column(15), scalers)]
+
+	w = ["w" + (str(delay).zfill(4) if int(delay) >= 0 else "0000") for delay in column(16)]
+
+	extra_modes = [int(value) for value in column(17)]
+	ff = ["ff1" + str(count).zfill(2) + str(period).zfill(3) if mode in FF_ON else "ff050000"
+		  for mode, count, period in zip(extra_modes, column(18), column(19))]
+	ww = ["ww1" + str(width).zfill(4) if mode in WW_ON else "ww00.00"
+		  for mode, width in zip(extra_modes, column(20))]
+	aa = ["aa1" + str(frequency).zfill(3) + "0." + str(int(amplitude/scaler*100)).zfill(2) if mode in AA_ON else "aa05000.50"
+		  for mode, frequency, amplitude, scaler in zip(extra_modes, column(21), column(22), scalers)]
+
+	# WAV File Name Last, as it is the Only Variable-Length Field
+	wav = ["wav0" if str(name) == "-1" else "wav1" + str(number).zfill(4) + str(name).upper().rstrip()
+		   for name, number in zip(column(23), column(24))]
+
+	waves = ["1" + "".join(fields) for fields in zip(c, p, f, a, w, ff, ww, aa, wav)]
+	note_nums[0] = 0
+	note_nums.append(len(waves))
+	return waves, notes, note_nums
+
+##############################################################
+### ROW-BY-ROW ENCODER (REFERENCE) ###
+##############################################################
+
+# The Original parseWaveforms Loop; Kept as the Reference for the Golden Check and Benchmark
+def encodeWaveformsLegacy(sheet, max_voltage, dual_actuator_scaler):
+	cell = lambda num, k: sheet.iloc[num].iloc[k] # sheet.iloc[num][k] (Positional) on Every pandas Version
+	current_list = []
+	num = 0
+	temp_num = 0
+	note_num = []
+	notes_list = []
+
+	for i in range (len(sheet.index)):
+		if (cell(num, 0) == "Note:"):
+			current_note = cell(num, 1)
+			note_num.append(temp_num)
+			notes_list.append(current_note)
+			num += 1
+			continue
+
+		out = "1"
+
+		if (int(cell(num, 1)) < 0):
+			break
+		elif (int(cell(num, 1)) == 0):
+			VOLT_SCALER = 120.0/max_voltage
+		elif (int(cell(num, 1)) == 1):
+			VOLT_SCALER = 120.0/(max_voltage*dual_actuator_scaler)
+
+		out += 'c'
+		out += str(cell(num, 1))
+		out += str(cell(num, 2)).zfill(3)
+		out += "0." + str(int(cell(num, 3)/VOLT_SCALER*100)).zfill(2)
+		out += "0." + str(int(cell(num, 4)*100)).zfill(2)
+
+		out += 'p'
+		if (int(cell(num, 5)) < 0):
+			out += "010.505050"
+		else:
+			out += '1'
+			out += str(cell(num, 5))
+			out += str(round(cell(num, 6), 2))
+			if (round(cell(num, 6), 2)*10 % 1 == 0):
+				out += '0'
+			out += str(cell(num, 7)).zfill(2)
+			out += str(cell(num, 8)).zfill(2)
+
+		out += 'f'
+		if (int(cell(num, 9)) < 0):
+			out += "050050050"
+		else:
+			if (int(cell(num, 9)) == 1 or int(cell(num, 9)) == 3):
+				out += '1'
+			else:
+				out += '0'
+			out += str(cell(num, 10)).zfill(3)
+			out += str(cell(num, 11)).zfill(3)
+			out += str(cell(num, 12)).zfill(2)
+			out += str(cell(num, 13)).zfill(4)
+
+		out += 'a'
+		if (int(cell(num, 9)) < 0):
+			out += "0.000.000.001000"
+		else:
+			if (int(cell(num, 9)) == 2 or int(cell(num, 9)) == 3):
+				out += '1'
+			else:
+				out += '0'
+			out += "0." + str(int(cell(num, 14)/VOLT_SCALER*100)).zfill(2)
+			out += "0." + str(int(cell(num, 15)/VOLT_SCALER*100)).zfill(2)
+
+		out += 'w'
+		if (int(cell(num, 16)) < 0):
+			out += '0000'
+		else:
+			out += str(cell(num, 16)).zfill(4)
+
+		out += 'ff'
+		if not (int(cell(num, 17)) == 1 or int(cell(num, 17)) == 3
+				or int(cell(num, 17)) == 4 or int(cell(num, 17)) == 5):
+			out += "050000"
+		else:
+			out += '1'
+			out += str(cell(num, 18)).zfill(2)
+			out += str(cell(num, 19)).zfill(3)
+
+		out += "ww"
+		if not (int(cell(num, 17)) == 4 or int(cell(num, 17)) == 5):
+			out += "00.00"
+		else:
+			out += "1"
+			out += str(cell(num, 20)).zfill(4)
+
+		out += 'aa'
+		if not (int(cell(num, 17)) == 2 or int(cell(num, 17)) == 3
+				or int(cell(num, 17)) == 5):
+			out += "05000.50"
+		else:
+			out += '1'
+			out += str(cell(num, 21)).zfill(3)
+			out += "0." + str(int(cell(num, 22)/VOLT_SCALER*100)).zfill(2)
+
+		out += 'wav'
+		if (str(cell(num, 23)) ==  "-1"):
+			out += '0'
+		else:
+			out += '1'
+			out += str(cell(num, 24)).zfill(4)
+			out += str(cell(num, 23)).upper().rstrip()
+
+		num += 1
+		current_list.append(out)
+		temp_num += 1
+
+	note_num[0] = 0
+	note_num.append(temp_num)
+	return current_list, notes_list, note_num
+
+##############################################################
+### GOLDEN CHECK AND BENCHMARK ###
+##############################################################
+
+## Hand-Checked Rows (Columns 0-24) and the Commands They Must Produce (MAX_VOLTAGE 120, so the Voltage Scaler is 1)
+GOLDEN_ROWS = (
+	(1, 0, 180, 0.5, 0.5, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, "-1", -1),
+	(2, 1, 90, 0.4, 0.25, 1, 0.5, 5, 10, 1, 20, 80, 5, 1000, 0.1, 0.6, 250, 5, 3, 120, 12.5, 60, 0.3, "hum.wav ", 7),
+	(3, 0, 45, 0.8, 1.0, 2, 0.25, 12, 3, 3, 5, 100, 10, 500, 0.2, 0.4, -1, 2, -1, -1, -1, 200, 0.75, -1, -1),
+)
+GOLDEN_WAVES = [
+	"1c01800.500.50p010.505050f050050050a0.000.000.001000w0000ff050000ww00.00aa05000.50wav0",
+	"1c10900.400.25p110.500510f1020080051000a00.100.60w0250ff103120ww112.5aa10600.30wav10007HUM.WAV",
+	"1c00450.800.100p120.251203f1005100100500a10.200.40w0000ff050000ww00.00aa12000.75wav0",
+]
+
+def _goldenSheet(pd):
+	rows = [("Note:", "Golden rows") + (-1,)*(COLUMNS - 2)] + [row for row in GOLDEN_ROWS] + [(-1,)*COLUMNS]
+	return pd.DataFrame(rows, columns=["Column {}".format(k) for k in range(COLUMNS)])
+
+# Random Sheets Shaped Like the Workbook: Notes, Unused Sections (-1), Floats in Integer Columns
+def syntheticSheet(pd, row_num, seed=0):
+	import numpy as np
+	rng = np.random.default_rng(seed)
+	rows = []
+	for i in range(row_num):
+		if (i % 25 == 0):
+			rows.append(["Note:", "Block {}".format(i//25)] + [-1]*(COLUMNS - 2))
+			continue
+		fade_mode = int(rng.choice([-1, 0, 1, 2, 3]))
+		extra_mode = int(rng.choice([-1, 0, 1, 2, 3, 4, 5]))
+		rows.append([
+			i, int(rng.integers(0, 2)), int(rng.integers(1, 999)), round(float(rng.uniform(0, 0.8)), 3), round(float(rng.uniform(0, 1)), 2),
+			int(rng.choice([-1, 1, 2])), round(float(rng.uniform(0, 1)), int(rng.integers(1, 4))), int(rng.integers(0, 99)), int(rng.integers(0, 99)),
+			fade_mode, int(rng.integers(0, 999)), int(rng.integers(0, 999)), int(rng.integers(0, 99)), int(rng.integers(0, 9999)),
+			round(float(rng.uniform(0, 0.8)), 3), round(float(rng.uniform(0, 0.8)), 3), int(rng.choice([-1, 50, 1500])),
+			extra_mode, int(rng.integers(0, 99)), int(rng.integers(0, 999)), round(float(rng.uniform(0, 99)), 1),
+			int(rng.integers(0, 999)), round(float(rng.uniform(0, 0.8)), 3),
+			rng.choice(["-1", "tone_a.wav", "Sweep B.wav  "]), int(rng.integers(0, 9999)),
+		])
+	rows.append([-1]*COLUMNS)
+	return pd.DataFrame(rows, columns=["Column {}".format(k) for k in range(COLUMNS)])
+
+def verify(max_voltage=0.8, dual_actuator_scaler=0.953):
+	try:
+		import pandas as pd
+	except ImportError:
+		print("Golden check needs pandas (pip install pandas)")
+		return False
+	import numpy as np
+	golden = encodeWaveforms(sheetColumns(_goldenSheet(pd)), 120.0, 1.0)[0]
+	golden_ok = golden == GOLDEN_WAVES and encodeWaveformsLegacy(_goldenSheet(pd), 120.0, 1.0)[0] == GOLDEN_WAVES
+	print("Golden Rows Match:", golden_ok)
+	ok = golden_ok
+	for seed in range(5):
+		sheet = syntheticSheet(pd, 2000, seed)
+		if (seed % 2): # No Text Columns: Row Access Returns float64 Rows (and, Without Notes, Both Reject the Sheet)
+			sheet = sheet[sheet.iloc[:, 0] != "Note:"].copy()
+			sheet.iloc[:, 23] = -1
+			sheet = sheet.astype(np.float64)
+		columns = sheetColumns(sheet)
+		scalars_match = all(type(columns[k][i]) is type(sheet.iloc[i].iloc[k]) for i in range(0, len(sheet.index), 97)
+							for k in range(COLUMNS))
+		try:
+			expected = encodeWaveformsLegacy(sheet, max_voltage, dual_actuator_scaler)
+		except IndexError: # No Notes: Both Encoders Must Reject the Sheet
+			expected = None
+		try:
+			result = encodeWaveforms(columns, max_voltage, dual_actuator_scaler)
+		except IndexError:
+			result = None
+		identical = result == expected
+		print("Sheet {}: {} Rows, Row Access Scalars Match: {}, Identical Output: {}".format(
+			  seed, len(sheet.index), scalars_match, identical))
+		ok = ok and scalars_match and identical
+	print("Waveform Encoder Verified:", ok)
+	return ok
+
+def benchmark(row_counts=(100, 1000, 5000), max_voltage=0.8, dual_actuator_scaler=0.953):
+	import pandas as pd
+	print("{:>8}{:>16}{:>18}{:>10}".format("Rows", "Row-by-Row (s)", "Column-Wise (s)", "Speedup"))
+	for row_num in row_counts:
+		sheet = syntheticSheet(pd, row_num)
+		start = time.perf_counter()
+		encodeWaveformsLegacy(sheet, max_voltage, dual_actuator_scaler)
+		legacy = time.perf_counter() - start
+		start = time.perf_counter()
+		encodeWaveforms(sheetColumns(sheet), max_voltage, dual_actuator_scaler)
+		columnwise = time.perf_counter() - start
+		print("{:>8}{:>16.4f}{:>18.4f}{:>9.0f}x".format(row_num, legacy, columnwise, legacy/columnwise))
+
+if __name__ == '__main__':
+	ok = verify()
+	benchmark()
+	sys.exit(0 if ok else 1)
@@ -0,0 +1,186 @@
+## Waveform Loader
+## Reads the sheets of a waveform workbook concurrently, for Driver_GUI_1-3.py
+##
+## Each sheet is streamed from the workbook in openpyxl's read-only mode, limited to the
+## columns the command format uses (0-24), and reading stops at the row that ends
+## parseWaveforms (first non-note row with a negative channel, after the two skipped rows).
+## The rows are then handed to pandas' TextParser exactly as pandas.read_excel does, so a
+## sheet comes out as the same DataFrame (values and column types) as
+##   sheet = pd.ExcelFile(path).parse(name).fillna(-1).iloc[2:]
+## as long as the rows after the end row do not change a column's type. Sheets are read by
+## a pool of worker processes (threads when processes are not available, e.g. one core).
+## Run this file directly to compare it against pandas and time it.
+
+import os
+import sys
+import time
+import concurrent.futures
+
+##############################################################
+### LOADER SETTINGS ###
+##############################################################
+
+COLUMNS = 25 									# Columns Read per Row (Waveform_Encoder.COLUMNS)
+SKIPPED_ROWS = 2 								# Rows Under the Header Dropped by iloc[2:]
+NOTE_LABEL = "Note:"							# Waveform_Encoder.NOTE_LABEL
+LOAD_WORKERS = 4 								# Sheets Read at Once (Capped by Sheet and CPU Count)
+
+##############################################################
+### SHEET READING ###
+##############################################################
+
+# Cell Value as pandas' openpyxl Reader Returns it: Whole Numbers as int, Blanks as ""
+def _convertCell(cell, numeric, error):
+	if (cell.value is None):
+		return ""
+	if (cell.data_type == error):
+		return float("nan")
+	if (cell.data_type == numeric):
+		value = int(cell.value)
+		return value if value == cell.value else float(cell.value)
+	return cell.value
+
+# Row Ending parseWaveforms: Not a Note and a Channel Below 0 (a Blank Channel Becomes -1)
+def _endsSheet(row):
+	if (row and row[0] == NOTE_LABEL):
+		return False
+	channel = row[1] if len(row) > 1 else ""
+	if (channel == ""):
+		return True
+	try:
+		return int(channel) < 0
+	except (TypeError, ValueError):
+		return False							# Left for the Encoder to Reject
+
+# Rows of One Sheet (Header First) up to and Including the End Row, as pandas Would Read Them
+def readSheetRows(path, name):
+	from openpyxl import load_workbook
+	from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+	workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+	try:
+		sheet = workbook[name]
+		sheet.reset_dimensions()
+		rows = []
+		last_row_with_data = -1
+		for number, cells in enumerate(sheet.iter_rows(max_col=COLUMNS)):
+			row = [_convertCell(cell, TYPE_NUMERIC, TYPE_ERROR) for cell in cells]
+			while (row and row[-1] == ""):
+				row.pop()
+			if (row):
+				last_row_with_data = number
+			rows.append(row)
+			if (number > SKIPPED_ROWS and _endsSheet(row)):
+				break
+	finally:
+		workbook.close()
+
+	rows = rows[:last_row_with_data + 1]
+	width = max((len(row) for row in rows), default=0)
+	return [row + [""]*(width - len(row)) for row in rows]
+
+# One Sheet as the DataFrame parseWaveforms Takes, and the Seconds it Took
+def loadSheet(path, name):
+	import pandas as pd
+	from pandas.io.parsers import TextParser
+
+	start = time.perf_counter()
+	rows = readSheetRows(path, name)
+	if (rows):
+		sheet = TextParser(rows, header=0, skip_blank_lines=False).read()
+	else:
+		sheet = pd.DataFrame()
+	sheet.fillna(-1, inplace = True)
+	return sheet.iloc[SKIPPED_ROWS:], time.perf_counter() - start
+
+def sheetNames(path):
+	from openpyxl import load_workbook
+	workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+	try:
+		return [sheet.title for sheet in workbook.worksheets]
+	finally:
+		workbook.close()
+
+##############################################################
+### WORKBOOK LOADING ###
+##############################################################
+
+# Every Sheet of the Workbook; Returns ({Name: Sheet}, {Name: Load Seconds}) in Workbook Order
+def loadWorkbook(path, workers=LOAD_WORKERS, processes=True):
+	names = sheetNames(path)
+	workers = max(1, min(workers, len(names), os.cpu_count() or 1))
+	if (workers == 1):
+		results = [loadSheet(path, name) for name in names]
+	else:
+		pool = concurrent.futures.ProcessPoolExecutor if processes else concurrent.futures.ThreadPoolExecutor
+		try:
+			with pool(max_workers=workers) as executor:
+				results = list(executor.map(loadSheet, [path]*len(names), names))
+		except (OSError, concurrent.futures.process.BrokenProcessPool):
+			with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+				results = list(executor.map(loadSheet, [path]*len(names), names))
+	sheets = {name: sheet for name, (sheet, seconds) in zip(names, results)}
+	times = {name: seconds for name, (sheet, seconds) in zip(names, results)}
+	return sheets, times
+
+##############################################################
+### SELF CHECK AND BENCHMARK ###
+##############################################################
+
+# Synthetic Workbook: Two Skipped Rows, Notes and Tests, the End Row, then Rows That are Never Used
+def writeWorkbook(path, sheet_count, row_num, trailing_rows=0):
+	import pandas as pd
+	from Waveform_Encoder import syntheticSheet
+	with pd.ExcelWriter(path) as writer:
+		for i in range(sheet_count):
+			sheet = syntheticSheet(pd, row_num, seed=i)
+			header = pd.DataFrame([[-1]*sheet.shape[1]]*SKIPPED_ROWS, columns=sheet.columns)
+			trailing = pd.concat([sheet.iloc[1:2]]*trailing_rows) if trailing_rows else None
+			pd.concat((header, sheet, trailing)).to_excel(writer, sheet_name="Sheet {}".format(i), index=False)
+
+def verify(path):
+	import pandas as pd
+	from Waveform_Encoder import encodeWaveforms, sheetColumns
+	sheets, times = loadWorkbook(path)
+	waveform_file = pd.ExcelFile(path)
+	ok = list(sheets) == waveform_file.sheet_names
+	for name in waveform_file.sheet_names:
+		expected = waveform_file.parse(name)
+		expected.fillna(-1, inplace = True)
+		expected = expected.iloc[SKIPPED_ROWS:]
+		columns = sheetColumns(sheets[name])
+		expected_columns = sheetColumns(expected)
+		same_rows = all(column == expected_column[:len(column)] and
+						[type(value) for value in column] == [type(value) for value in expected_column[:len(column)]]
+						for column, expected_column in zip(columns, expected_columns))
+		same_waves = encodeWaveforms(columns, 0.8, 1.0) == encodeWaveforms(expected_columns, 0.8, 1.0)
+		print("\t{}: {} of {} Rows Read in {:.3f} s, Same Values and Types: {}, Same Waveforms: {}".format(
+			  name, len(sheets[name].index), len(expected.index), times[name], same_rows, same_waves))
+		ok = ok and same_rows and same_waves
+	print("Waveform Loader Verified:", ok)
+	return ok
+
+def benchmark(path):
+	import pandas as pd
+	start = time.perf_counter()
+	waveform_file = pd.ExcelFile(path)
+	for name in waveform_file.sheet_names:
+		waveform_file.parse(name)
+	sequential = time.perf_counter() - start
+	print("\tpandas, One Sheet at a Time:        {:.3f} s".format(sequential))
+	for label, workers, processes in (("Loader, 1 Worker:", 1, False), ("Loader, Threads:", LOAD_WORKERS, False),
+									  ("Loader, Processes:", LOAD_WORKERS, True)):
+		start = time.perf_counter()
+		loadWorkbook(path, workers, processes)
+		elapsed = time.perf_counter() - start
+		print("\t{:<35}{:.3f} s ({:.1f}x)".format(label, elapsed, sequential/elapsed))
+
+if __name__ == '__main__':
+	import tempfile
+	with tempfile.TemporaryDirectory() as directory:
+		path = os.path.join(directory, "waveforms.xlsx")
+		writeWorkbook(path, sheet_count=6, row_num=3000, trailing_rows=1000)
+		print("Workbook: 6 Sheets x 3000 Rows, 1000 Rows After the End Row")
+		ok = verify(path)
+		benchmark(path)
+	sys.exit(0 if ok else 1)
@@ -0,0 +1,67 @@
+## Teensy Simulator Tests
+## End-to-end checks of the connection and decoding code against Teensy_Simulator.py (pytest)
+##
+## Usage:
+##   python -m pytest -q test_Teensy_Simulator.py
+##
+## Needs pyserial and a POSIX pseudo-terminal; elsewhere the tests are skipped.
+
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip("tty")
+pytest.importorskip("serial")
+
+from Teensy_Simulator import (AccelerometerSimulator, DriverSimulator, ACC_REST_COUNTS,
+							  CONNECT_WAVEFORM, CONNECT_REPLY, VERIFY_WAVEFORM)
+from Teensy_Connection import connectTeensy, probePort, accelerometerHandshake, commandHandshake
+from Accelerometer_Stream import StreamDecoder
+
+BAUD_RATES = (921600, 460800, 115200) 			# Rates Tried, Fastest First (as in Accelerometer_DAQ.py)
+
+# Samples Decoded From ser Until count Arrive or timeout Seconds Pass, as One (N, 3) Array
+def _readSamples(ser, decoder, count, timeout=5.0):
+	blocks = []
+	received = 0
+	deadline = time.perf_counter() + timeout
+	while (received < count and time.perf_counter() < deadline):
+		block = decoder.read(ser)
+		blocks.append(block[:, :3])
+		received += len(block)
+	return np.concatenate(blocks) if blocks else np.empty((0, 3))
+
+def test_accelerometer_stream(tmp_path):
+	port_file = tmp_path / "COM_PORT_2.txt"
+	with AccelerometerSimulator(str(port_file), rate=3200, seed=0) as simulator:
+		ser, port_name = connectTeensy(str(port_file), BAUD_RATES, accelerometerHandshake)
+		assert ser is not None and port_name == simulator.port
+		ser.timeout = 0.1
+		decoder = StreamDecoder()
+		samples = _readSamples(ser, decoder, 3200)
+		ser.close()
+	assert len(samples) >= 3200
+	assert decoder.malformed == 0
+	assert np.allclose(samples.mean(axis=0), ACC_REST_COUNTS, atol=0.5)
+
+def test_driver_handshake():
+	with DriverSimulator(seed=0) as simulator:
+		ser = probePort(simulator.port, (9600,), commandHandshake(CONNECT_WAVEFORM, (CONNECT_REPLY,)))
+		assert ser is not None
+		ser.timeout = 0.5
+		ser.write(VERIFY_WAVEFORM.encode())
+		lines = [ser.readline().decode().strip() for line in range(3)]
+		ser.close()
+	assert lines[0] == VERIFY_WAVEFORM
+	assert all(float(line) > 0 for line in lines[1:])
+
+# The Simulator Must Never Delete or Keep Overwriting the User's Real Port Configuration
+def test_port_file_restored(tmp_path):
+	existing = tmp_path / "COM_PORT.txt"
+	existing.write_text("COM5\n")
+	created = tmp_path / "COM_PORT_2.txt"
+	with DriverSimulator(str(existing)) as driver, AccelerometerSimulator(str(created)) as accelerometer:
+		assert existing.read_text() == driver.port
+		assert created.read_text() == accelerometer.port
+	assert existing.read_text() == "COM5\n"
+	assert not created.exists()